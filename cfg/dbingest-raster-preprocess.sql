@@ -20,5 +20,7 @@ ALTER TABLE !SCHEMA!.measurement ADD UNIQUE (pid, name);
 
 CREATE TABLE IF NOT EXISTS !SCHEMA!.cat ( id serial NOT NULL PRIMARY KEY, fdate TIMESTAMP NOT NULL, fid INT NOT NULL, pid INT NOT NULL, pathname VARCHAR(255) NOT NULL, hull GEOMETRY ); 
 
+CREATE INDEX IF NOT EXISTS !SCHEMA!_cat_pid_pathname_idx ON !SCHEMA!.cat ( pid, pathname );
+
 CREATE SEQUENCE IF NOT EXISTS fid_!SCHEMA!_!PRODUCT!_seq;
 END;
@@ -0,0 +1,30 @@
+import io
+import pytest
+
+from src.utility.gsclient import GsClient
+
+
+@pytest.fixture
+def client( tmp_path ):
+
+    """
+    gs client over local directory backend - bucket created under temporary root
+    """
+
+    ( tmp_path / 'storage' / 'bucket' ).mkdir( parents=True )
+    return GsClient( 'bucket', endpoint=str( tmp_path / 'storage' ) )
+
+
+@pytest.fixture
+def put( client ):
+
+    """
+    upload named blobs with contents derived from name
+    """
+
+    def upload( names, metadata=None ):
+        for name in names:
+            client.uploadStream( io.BytesIO( name.encode() ), name, metadata=metadata )
+        return names
+
+    return upload
@@ -148,12 +148,16 @@ class Repository:
         bucket, prefix = GsClient.parseUri( path )
         if bucket is not None:
 
-            # add credential variables to environment
+            # gdal /vsigs/ reads during load take credentials from environment
             if self._obj[ 'credentials' ] is not None:
                 GsClient.updateCredentials( self._obj[ 'credentials' ] )
 
-            # create client and get image list                
-            client = GsClient( bucket )
+            # shared client per credentials and bucket - optional persistent listing cache
+            cache_ttl = self._obj[ 'cache_ttl' ] if 'cache_ttl' in self._obj else None
+
+            # optional local directory or emulator standing in for cloud storage
+            endpoint = self._obj[ 'endpoint' ] if 'endpoint' in self._obj else None
+            client = GsClient.getClient( bucket, credentials=self._obj[ 'credentials' ], cache_ttl=cache_ttl, endpoint=endpoint )
             images = client.getImageUriList( prefix, pattern=product.getPattern() )
 
         else:
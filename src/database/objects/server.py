@@ -1,11 +1,59 @@
 import os
 import tempfile
+import threading
 import psycopg2 
 
+from contextlib import contextmanager
+from psycopg2 import pool
+
 from src.utility import ps
 from src.utility import fs
 
 
+class CopyStream:
+
+
+    def __init__( self, fp ):
+
+        """
+        constructor - wraps raster2pgsql stdout positioned at first COPY data row
+        """
+
+        self._fp = fp
+        self._done = False
+        return
+
+
+    def read( self, size=-1 ):
+
+        """
+        read whole rows up to size bytes - stop at end of copy marker
+        """
+
+        chunks = []; count = 0
+        while not self._done and ( size < 0 or count < size ):
+
+            # end of stream or end of copy data
+            line = self._fp.readline()
+            if not line or line.rstrip( b'\r\n' ) == b'\\.':
+                self._done = True
+                break
+
+            chunks.append( line )
+            count += len( line )
+
+        return b''.join( chunks )
+
+
+    def readline( self, size=-1 ):
+
+        """
+        read single row
+        """
+
+        return self.read( 1 )
+
+
 class Server:
 
 
@@ -16,8 +64,38 @@ class Server:
         """
 
         self._obj = obj
-        self._bin_path = 'C:\\Program Files\\PostgreSQL\\12\\bin'
+        self._bin_path = obj[ 'bin_path' ] if 'bin_path' in obj else 'C:\\Program Files\\PostgreSQL\\12\\bin'
         self._default_port = 5432
+
+        # connection pool - created on first use
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_slots = None
+
+        # tcp keepalive settings applied to every connection
+        self._keepalives = {    'keepalives' : 1,
+                                'keepalives_idle' : 30,
+                                'keepalives_interval' : 10,
+                                'keepalives_count' : 5 }
+        return
+
+
+    def __getstate__( self ):
+
+        """
+        pickle configuration only - connection pool and locks are process local
+        """
+
+        return { '_obj' : self._obj }
+
+
+    def __setstate__( self, state ):
+
+        """
+        rebuild server with fresh connection pool in receiving process
+        """
+
+        self.__init__( state[ '_obj' ] )
         return
 
 
@@ -105,14 +183,65 @@ class Server:
         return ps.execute( os.path.join( self._bin_path, 'psql.exe' ), args )
 
 
-    def getConnection( self ):
+    def getPoolSize( self ):
 
         """
-        get psycopg arguments
+        get min / max connection pool size
+        """
+
+        # optional pool section in server yaml
+        obj = self._obj[ 'pool' ] if 'pool' in self._obj and self._obj[ 'pool' ] is not None else {}
+        min_size = int( obj[ 'min' ] ) if 'min' in obj else 1
+        max_size = int( obj[ 'max' ] ) if 'max' in obj else 8
+
+        return min_size, max( min_size, max_size )
+
+
+    def getPoolRetries( self ):
+
+        """
+        get number of reconnection attempts on unhealthy connection
+        """
+
+        obj = self._obj[ 'pool' ] if 'pool' in self._obj and self._obj[ 'pool' ] is not None else {}
+        return int( obj[ 'retries' ] ) if 'retries' in obj else 3
+
+
+    def getLoadMode( self ):
+
+        """
+        get raster load mode - psql (temp file + psql client), stream (pooled copy) or native (in-process tiler)
+        """
+
+        return self._obj[ 'load_mode' ] if 'load_mode' in self._obj else 'psql'
+
+
+    def getLoadThreads( self ):
+
+        """
+        get number of tile encoding threads used by native loader
+        """
+
+        return int( self._obj[ 'load_threads' ] ) if 'load_threads' in self._obj else 4
+
+
+    def getIngestThreads( self, default ):
+
+        """
+        get number of concurrent ingest workers for this server
+        """
+
+        return int( self._obj[ 'ingest_threads' ] ) if 'ingest_threads' in self._obj else default
+
+
+    def getConnectionString( self ):
+
+        """
+        get psycopg connection string
         """
 
         # create connection string for psycopg
-        cfg = "dbname='{}' host='{}'".format( self.getDatabase(), self.getHost() )
+        cfg = "dbname='{}' host='{}' port='{}'".format( self.getDatabase(), self.getHost(), self.getPort() )
 
         # optional user
         if self.getUser() is not None:
@@ -122,8 +251,152 @@ class Server:
         if self.getPassword() is not None:
             cfg += " password='{}'".format( self.getPassword() )
 
+        return cfg
+
+
+    def getConnection( self ):
+
+        """
+        get new unpooled psycopg connection
+        """
+
         # get connection
-        return psycopg2.connect( cfg )
+        return psycopg2.connect( self.getConnectionString(), **self._keepalives )
+
+
+    def getPool( self ):
+
+        """
+        get thread-safe connection pool - created on first call
+        """
+
+        # double checked creation - pool shared by all threads
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+
+                    # semaphore blocks borrowers when pool exhausted rather than raising
+                    min_size, max_size = self.getPoolSize()
+                    self._pool_slots = threading.BoundedSemaphore( max_size )
+                    self._pool = pool.ThreadedConnectionPool(   min_size, 
+                                                                max_size, 
+                                                                self.getConnectionString(), 
+                                                                **self._keepalives )
+
+        return self._pool
+
+
+    def closePool( self ):
+
+        """
+        close all pooled connections
+        """
+
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+        return
+
+
+    def isHealthy( self, conn ):
+
+        """
+        check pooled connection is alive
+        """
+
+        # closed by client or server
+        if conn.closed != 0:
+            return False
+
+        try:
+            # lightweight round trip
+            cur = conn.cursor()
+            cur.execute( 'SELECT 1' )
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+
+        # broken connection
+        except psycopg2.Error:
+            return False
+
+        return True
+
+
+    def acquireConnection( self ):
+
+        """
+        borrow healthy connection from pool
+        """
+
+        conn_pool = self.getPool()
+        self._pool_slots.acquire()
+
+        try:
+            # reconnect on stale or broken connections
+            for attempt in range( self.getPoolRetries() + 1 ):
+
+                conn = conn_pool.getconn()
+                if self.isHealthy( conn ):
+                    return conn
+
+                # discard broken connection - pool creates replacement
+                conn_pool.putconn( conn, close=True )
+
+        except Exception:
+            self._pool_slots.release()
+            raise
+
+        self._pool_slots.release()
+        raise psycopg2.OperationalError( 'Unable to obtain healthy connection: {}'.format( self.getHost() ) )
+
+
+    def releaseConnection( self, conn ):
+
+        """
+        return borrowed connection to pool
+        """
+
+        close = conn.closed != 0
+        if not close:
+
+            try:
+                # discard pending transaction
+                conn.rollback()
+
+                # drop session temp tables and settings - discard cannot run inside transaction block
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute( 'DISCARD ALL' )
+                cur.close()
+
+                # restore default transactional session
+                conn.autocommit = False
+                conn.set_isolation_level( psycopg2.extensions.ISOLATION_LEVEL_DEFAULT )
+
+            # connection unusable
+            except psycopg2.Error:
+                close = True
+
+        self.getPool().putconn( conn, close=close )
+        self._pool_slots.release()
+        return
+
+
+    @contextmanager
+    def borrowConnection( self ):
+
+        """
+        context manager wrapping acquire / release of pooled connection
+        """
+
+        conn = self.acquireConnection()
+        try:
+            yield conn
+        finally:
+            self.releaseConnection( conn )
 
 
     def getRecords( self, query ):
@@ -134,22 +407,20 @@ class Server:
 
         records = []
 
-        # get connection
-        conn = self.getConnection()
-        cur = conn.cursor()
+        # borrow pooled connection
+        with self.borrowConnection() as conn:
+            cur = conn.cursor()
         
-        try:
-            # execute query
-            cur.execute( query )        
-            records = cur.fetchall()
+            try:
+                # execute query
+                cur.execute( query )        
+                records = cur.fetchall()
 
-        # handle exception
-        except psycopg2.Error as e:
+            # handle exception
+            except psycopg2.Error as e:
 
-            print ( e.pgerror )
+                print ( e.pgerror )
 
-        # close connection
-        conn.close()
         return records
 
 
@@ -161,27 +432,25 @@ class Server:
 
         error = None
 
-        # get connection
-        conn = self.getConnection()
+        # borrow pooled connection
+        with self.borrowConnection() as conn:
 
-        if isolation_level is not None:
-            conn.set_isolation_level(isolation_level)
+            if isolation_level is not None:
+                conn.set_isolation_level(isolation_level)
 
-        cur = conn.cursor()
+            cur = conn.cursor()
         
-        try:
-            # execute query
-            cur.execute( command )
-            conn.commit()
+            try:
+                # execute query
+                cur.execute( command )
+                conn.commit()
 
-        # handle exception
-        except psycopg2.Error as e:
+            # handle exception
+            except psycopg2.Error as e:
 
-            print ( e.pgerror )
-            error = e.pgerror
+                print ( e.pgerror )
+                error = e.pgerror
 
-        # close connection
-        conn.close()
         return error
 
 
@@ -193,22 +462,20 @@ class Server:
 
         count = None
 
-        # get connection
-        conn = self.getConnection()
-        cur = conn.cursor()
+        # borrow pooled connection
+        with self.borrowConnection() as conn:
+            cur = conn.cursor()
         
-        try:
-            # execute query
-            cur.execute( 'SELECT COUNT(*) FROM {schema}.{table}'.format( schema=schema, table=table ) )
-            count = int ( cur.fetchone()[0] )
+            try:
+                # execute query
+                cur.execute( 'SELECT COUNT(*) FROM {schema}.{table}'.format( schema=schema, table=table ) )
+                count = int ( cur.fetchone()[0] )
 
-        # handle exception
-        except psycopg2.Error as e:
+            # handle exception
+            except psycopg2.Error as e:
 
-            print ( e.pgerror )
+                print ( e.pgerror )
 
-        # close connection
-        conn.close()
         return count
 
 
@@ -218,6 +485,17 @@ class Server:
         load raster into database using raster2pgsql
         """
 
+        # pipe raster2pgsql output directly into database
+        if self.getLoadMode() == 'stream':
+            return self.streamRaster( parameters )
+
+        # in-process tiler - no raster2pgsql binary required
+        if self.getLoadMode() == 'native':
+
+            # imported on demand - gdal and numpy only required by native loader
+            from src.database.raster.loader import Loader
+            return Loader( self, threads=self.getLoadThreads() ).load( parameters )
+
         # standard argument list - tile size configurable
         # args = [ '-R', '-C', '-d', '-F' ]
         args = [ '-R', '-d', '-F', '-Y' ]
@@ -227,16 +505,15 @@ class Server:
         args.append( parameters[ 'PATHNAME' ] )
         args.append( '{}.{}'.format( parameters[ 'SCHEMA' ], parameters[ 'TEMP_TABLE' ] ) )
 
-        #  execute raster2pgsql with argument list
-        out, error, code = ps.execute( os.path.join( self._bin_path, 'raster2pgsql.exe' ), args )
-        if code == 0:
+        # create temp path            
+        with tempfile.TemporaryDirectory() as tmp_path:
 
-            # create temp path            
-            with tempfile.TemporaryDirectory() as tmp_path:
+            #  execute raster2pgsql with argument list - output streamed to file, not held in memory
+            with open( os.path.join( tmp_path, 'raster2pgsql.sql' ), "wb" ) as fp:
+                result = ps.executeStreaming( os.path.join( self._bin_path, 'raster2pgsql.exe' ), args, on_stdout=fp.write )
 
-                # write raster2pgsql to file
-                with open( os.path.join( tmp_path, 'raster2pgsql.sql' ), "wb" ) as fp:
-                    fp.write( out  )
+            out, error, code = result.out, result.err, result.code
+            if code == 0:
 
                 # execute raster2pgsql commands 
                 out, error, code = self.executeTransactionFromFile( os.path.join( tmp_path, 'raster2pgsql.sql' ) )
@@ -244,6 +521,103 @@ class Server:
         return out, error, code
 
 
+    def streamRaster( self, parameters ):
+
+        """
+        load raster into database by streaming raster2pgsql copy output over pooled connection
+        """
+
+        # same table contract as psql mode - rid, rast, filename
+        args = [ '-R', '-d', '-F', '-Y' ]
+
+        args.extend( [ '-t', parameters[ 'TILE_SIZE' ] ] )
+        args.append( parameters[ 'PATHNAME' ] )
+        args.append( '{}.{}'.format( parameters[ 'SCHEMA' ], parameters[ 'TEMP_TABLE' ] ) )
+
+        # start raster2pgsql - stderr drained on separate thread to avoid pipe deadlock
+        process = ps.stream( os.path.join( self._bin_path, 'raster2pgsql.exe' ), args )
+        stderr = []
+        drain = threading.Thread( target=lambda: stderr.append( process.stderr.read() ) )
+        drain.start()
+
+        error = None; code = None
+        with self.borrowConnection() as conn:
+            cur = conn.cursor()
+
+            try:
+                # replay sql statements - hand copy blocks to server without buffering
+                statement = b''
+                for line in iter( process.stdout.readline, b'' ):
+
+                    statement += line
+                    if not line.rstrip().endswith( b';' ):
+                        continue
+
+                    # transaction owned by connection - skip explicit begin / end
+                    command = statement.decode().strip(); statement = b''
+                    if command.upper() in [ 'BEGIN;', 'END;', 'COMMIT;' ]:
+                        continue
+
+                    if command.upper().startswith( 'COPY' ):
+                        cur.copy_expert( command.rstrip( ';' ), CopyStream( process.stdout ) )
+                    else:
+                        cur.execute( command )
+
+                # commit only complete output - partial table discarded
+                code = process.wait()
+                if code == 0:
+                    conn.commit()
+                else:
+                    conn.rollback()
+
+            # record error - rolled back on release
+            except Exception as e:
+
+                message = e.pgerror if isinstance( e, psycopg2.Error ) and e.pgerror is not None else str( e )
+                print ( message )
+                error = 'ERROR: {}'.format( message )
+
+        # stop raster2pgsql on failure - otherwise already exited
+        if code is None:
+            process.kill()
+            code = process.wait()
+
+        drain.join()
+
+        out = b''.join( stderr )
+        if error is None and code != 0:
+            error = 'ERROR: raster2pgsql {}'.format( out )
+
+        return out, error, code
+
+
+    def executeScript( self, script ):
+
+        """
+        execute multi-statement sql script over pooled connection
+        """
+
+        error = None
+
+        # borrow pooled connection - script manages own transaction
+        with self.borrowConnection() as conn:
+
+            conn.autocommit = True
+            cur = conn.cursor()
+
+            try:
+                # execute script
+                cur.execute( script )
+
+            # handle exception
+            except psycopg2.Error as e:
+
+                print ( e.pgerror )
+                error = 'ERROR: {}'.format( e.pgerror if e.pgerror is not None else str( e ) )
+
+        return None, error, 0 if error is None else 1
+
+
     def executeTemplateOperation( self, template, parameters ):
 
         """
@@ -257,6 +631,10 @@ class Server:
             label = '!' + key.upper() + '!'
             template = template.replace( label, value )
 
+        # execute over pooled connection - no psql client
+        if self.getLoadMode() in [ 'stream', 'native' ]:
+            return self.executeScript( template )
+
         # execute transposed template from file 
         with tempfile.TemporaryDirectory() as tmp_path:
             pathname = os.path.join( tmp_path, 'script.sql' )
@@ -1,10 +1,14 @@
 import os
 import copy
+import time
 import asyncio
+import multiprocessing
 import tempfile
 import argparse
 
-from threading import Thread
+from queue import Queue, Empty
+from threading import Thread, Lock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from progressbar import ProgressBar
  
 from src.utility import parser
@@ -14,7 +18,7 @@ from src.database.objects.manager import Manager
 class Ingester:
 
 
-    def __init__( self, repo, threads=6 ):
+    def __init__( self, repo, threads=6, retries=2, backoff=5.0, backend='thread', server_threads=None ):
 
         """
         constructor
@@ -22,6 +26,10 @@ class Ingester:
 
         # members
         self._threads = threads
+        self._retries = retries
+        self._backoff = backoff
+        self._backend = backend
+        self._server_threads = server_threads
         self._repo = repo
         return
 
@@ -53,108 +61,291 @@ class Ingester:
             return parameters
 
 
-        # 1 or more servers
-        for server in self._repo.getServerList():
+        def processServer( server, images ):
+
+            """
+            ingest shared image list into single server
+            """
 
             # compile list of product-specific core values to specialise sql scripts
             parameters = getCoreParameterList( server )
 
             # execute preprocess operation
             out, error, code = server.executeTemplateOperation( self._repo.getTemplate( 'ingest-preprocess' ), parameters )
-            if 'ERROR' not in str( error ):
+            if 'ERROR' in str( error ):
+                return None, [ ( 'preprocess', error ) ]
+
+            # get images not yet loaded into this server
+            images = self.getTaskList( server, product, images )
+            progress = { 'count' : 0, 'lock' : Lock(), 'bar' : None, 'total' : len( images ), 'host' : server.getHost() }
+
+            # execute tasks with selected backend - concurrency configurable per server
+            backend = self.getBackend()
+            if len( servers ) > 1:
+
+                # concurrent servers report progress as log lines - bars garble shared terminal
+                failures = backend( server, product, images, parameters, progress, server.getIngestThreads( self._threads ) )
+
+            else:
+                with ProgressBar( max_value=len( images ), prefix='{}: '.format( server.getHost() ) ) as bar:
+                    progress[ 'bar' ] = bar
+                    failures = backend( server, product, images, parameters, progress, server.getIngestThreads( self._threads ) )
 
-                # get ingestion task list - split across multiple threads
-                tasks, task_count = self.getTaskList( server, product )
-                with ProgressBar( max_value=task_count ) as bar:
-        
-                    # execute tasks        
-                    threads = []; 
-                    for task in tasks:
+            return len( images ), failures
 
-                        # start thread
-                        process = Thread(target=self.executeTask, args=[ task, parameters.copy(), bar ] )
-                        process.start()
-                        threads.append(process)
 
-                    # pause main thread until all child threads complete
-                    for process in threads:
-                        process.join()
+        def processServerSafe( server, images ):
+
+            """
+            isolate server failure - remaining servers continue
+            """
+
+            try:
+                return processServer( server, images )
+
+            # unreachable database or catalog query failure
+            except Exception as e:
+                return None, [ ( 'preprocess', e ) ]
+
+
+        # list product images once - shared by all servers
+        servers = self._repo.getServerList()
+        images = self._repo.getProductImageList( product )
+
+        # 1 or more servers ingested concurrently
+        max_workers = self._server_threads if self._server_threads is not None else len( servers )
+        with ThreadPoolExecutor( max_workers=max( 1, max_workers ) ) as executor:
+            results = list( executor.map( lambda server: processServerSafe( server, images ), servers ) )
+
+        # report per-server summary
+        for server, ( count, failures ) in zip( servers, results ):
+            self.reportFailures( server, count, failures )
 
         return
 
 
-    def getTaskList( self, server, product ):
+    def getTaskList( self, server, product, images=None ):
 
         """
-        get task list
+        get list of images not yet loaded into database
         """
 
-        tasks = []
-        images = self._repo.getProductImageList( product )
+        if images is None:
+            images = self._repo.getProductImageList( product )
+
+        # single catalog query replaces per-image lookups
+        loaded = self.getLoadedImageSet( server, product )
+        return [ image for image in images if image not in loaded ]
+
+
+    def getLoadedImageSet( self, server, product ):
 
-        # initialise loop variables
-        step = int ( round ( len ( images ) / self._threads ) )
-        start = 0
-        
-        # equally allocate tile ids between threads
-        for thread in range( 0, self._threads ):
-          
-            #  update subset of records to process
-            end = start + step
-            if thread == self._threads - 1:
-                end = len( images )
+        """
+        get set of image pathnames already recorded in catalog for product
+        """
 
-            #  append a new task
-            tasks.append ( {    'index' : thread, 
-                                'server' : server,
-                                'product' : product,
-                                'images' : images[ start : end ] 
-                            } )
-            start = end
+        # query pathnames in catalog table
+        records = server.getRecords( """
+                                    SELECT cat.pathname FROM {repository}.cat cat, {repository}.product p 
+                                        WHERE cat.pid = p.id AND p.name = '{product}'
+                                    """.format( repository=self._repo.getName(), product=product.getName() ) )
 
-        return tasks, len ( images )
+        return set( record[ 0 ] for record in records )
 
 
-    def executeTask( self, task, parameters, bar ):
+    def getBackend( self ):
 
         """
-        entry point into ingestion thread function
+        get execution backend function
         """
 
-        async def threadFunc ():
+        backends = {    'thread' : self.executeThreads,
+                        'process' : self.executeProcesses,
+                        'async' : self.executeAsync }
+
+        return backends[ self._backend ]
+
+
+    def executeThreads( self, server, product, images, parameters, progress, threads ):
+
+        """
+        execute ingestion with worker threads pulling from shared queue
+        """
+
+        # single queue consumed by all workers - no static partitioning
+        queue = Queue()
+        for image in images:
+            queue.put( image )
+
+        failures = []; workers = []
+        for index in range( threads ):
+
+            # start worker thread
+            task = { 'index' : index, 'server' : server, 'product' : product, 'queue' : queue }
+            process = Thread(target=self.executeTask, args=[ task, parameters.copy(), progress, failures ] )
+            process.start()
+            workers.append(process)
+
+        # pause main thread until all child threads complete
+        for process in workers:
+            process.join()
+
+        return failures
+
+
+    def executeProcesses( self, server, product, images, parameters, progress, threads ):
+
+        """
+        execute ingestion in process pool - each worker owns its database connections
+        """
+
+        failures = []
+        index = self._repo.getServerList().index( server )
+
+        # spawned workers unpickle ingester copy - servers rebuild connection pools rather than inherit parent sockets
+        context = multiprocessing.get_context( 'spawn' )
+        with ProcessPoolExecutor( max_workers=threads, mp_context=context, initializer=initProcessWorker, initargs=( self, ) ) as executor:
+
+            futures = [ executor.submit( executeProcessImage, index, parameters, image ) for image in images ]
+            for future in as_completed( futures ):
+
+                # aggregate results in parent progress bar
+                image, error = future.result()
+                if error is not None:
+                    failures.append( ( image, error ) )
+
+                self.updateProgress( progress )
+
+        return failures
+
+
+    def executeAsync( self, server, product, images, parameters, progress, threads ):
+
+        """
+        execute ingestion as asyncio tasks - blocking database work bounded by semaphore
+        """
+
+        async def executeImages():
 
             """
-            iterate through image list
+            schedule all images on event loop
             """
 
-            # iterate through images
-            task [ 'parameters' ] = parameters
-            for image in task[ 'images' ]:
-    
-                try:
-                    # ingest image into database
-                    self.ingestImage( task, image )
-                    bar.update()
-                
-                # report error
-                except Exception as e:
-                    print ( 'Ingestion Error: {}'.format( e.args ) )
-                    break
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore( threads )
+            failures = []
 
-            return
-                               
+            async def executeImage( image ):
+
+                # bounded concurrency - blocking ingest runs in executor thread
+                async with semaphore:
+                    task = { 'index' : 0, 'server' : server, 'product' : product, 'parameters' : parameters.copy() }
+                    error = await loop.run_in_executor( executor, self.ingestImageWithRetry, task, image )
+
+                if error is not None:
+                    failures.append( ( image, error ) )
 
-        # create new asynch event loop and execute
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+                self.updateProgress( progress )
+                return
 
-        # wait until sub function complete - close loop
-        loop.run_until_complete( threadFunc () )
-        loop.close()
+            await asyncio.gather( *[ executeImage( image ) for image in images ] )
+            return failures
+
+        with ThreadPoolExecutor( max_workers=threads ) as executor:
+            failures = asyncio.run( executeImages() )
+
+        return failures
+
+
+    def updateProgress( self, progress ):
+
+        """
+        increment shared progress - bar for single server, log lines otherwise
+        """
+
+        with progress[ 'lock' ]:
+            progress[ 'count' ] += 1
+
+            if progress[ 'bar' ] is not None:
+                progress[ 'bar' ].update( progress[ 'count' ] )
+
+            # log line every 5% and on completion
+            elif progress[ 'count' ] % max( 1, progress[ 'total' ] // 20 ) == 0 or progress[ 'count' ] == progress[ 'total' ]:
+                print ( '{}: {}/{} images'.format( progress[ 'host' ], progress[ 'count' ], progress[ 'total' ] ) )
+
+        return
+
+
+    def executeTask( self, task, parameters, progress, failures ):
+
+        """
+        entry point into ingestion worker - pull images until queue empty
+        """
+
+        task [ 'parameters' ] = parameters
+        while True:
+
+            # get next image
+            try:
+                image = task[ 'queue' ].get_nowait()
+            except Empty:
+                break
+
+            # ingest with retry - failures recorded and processing continues
+            error = self.ingestImageWithRetry( task, image )
+            if error is not None:
+                failures.append( ( image, error ) )
+
+            # update shared progress
+            self.updateProgress( progress )
 
         return 
 
 
+    def ingestImageWithRetry( self, task, image ):
+
+        """
+        ingest image - retry with exponential backoff on error
+        """
+
+        error = None
+        for attempt in range( self._retries + 1 ):
+
+            try:
+                # ingest image into database
+                self.ingestImage( task, image )
+                return None
+            
+            # report error
+            except Exception as e:
+                print ( 'Ingestion Error (attempt {}): {}'.format( attempt + 1, e.args ) )
+                error = e
+
+            # back off before next attempt
+            if attempt < self._retries:
+                time.sleep( self._backoff * ( 2 ** attempt ) )
+
+        return error
+
+
+    def reportFailures( self, server, count, failures ):
+
+        """
+        print per-server summary of images that failed ingestion
+        """
+
+        # preprocess failed - nothing scheduled
+        if count is None:
+            print ( 'Ingestion aborted on {}: {}'.format( server.getHost(), failures[ 0 ][ 1 ] ) )
+            return
+
+        print ( 'Ingestion summary on {}: {} scheduled, {} failed'.format( server.getHost(), count, len( failures ) ) )
+        for image, error in failures:
+            print ( '{}: {}'.format( image, error ) )
+
+        return
+
+
     def ingestImage( self, task, pathname ):
 
         """
@@ -179,46 +370,61 @@ class Ingester:
             return parameters
 
 
-        # raster already in database                
+        # already loaded images removed from schedule by getTaskList
         code = 0
         print ( pathname )
-        if not self.isLoaded( task[ 'server' ], pathname ):
 
-            # create temp path            
-            with tempfile.TemporaryDirectory() as tmp_path:
+        # create temp path            
+        with tempfile.TemporaryDirectory() as tmp_path:
 
-                # compile list of product-specific parameter values to specialise sql scripts
-                task[ 'parameters' ] = { **task[ 'parameters' ], **getProductParameterList() }
-                task[ 'parameters' ][ 'TEMP_TABLE' ] = os.path.basename( tmp_path )
+            # compile list of product-specific parameter values to specialise sql scripts
+            task[ 'parameters' ] = { **task[ 'parameters' ], **getProductParameterList() }
+            task[ 'parameters' ][ 'TEMP_TABLE' ] = os.path.basename( tmp_path )
 
-                # load raster as tiles into database table
-                out, error, code = task[ 'server' ].loadRaster( task[ 'parameters' ] )
-                if 'ERROR' not in str( error ):
+            # load raster as tiles into database table
+            out, error, code = task[ 'server' ].loadRaster( task[ 'parameters' ] )
+            if 'ERROR' not in str( error ):
 
-                    # execute post-process                    
-                    task[ 'server' ].executeTemplateOperation( self._repo.getTemplate( 'ingest-postprocess' ), 
-                                                                task[ 'parameters' ] )
+                # execute post-process - uncatalogued image treated as failure
+                out, error, code = task[ 'server' ].executeTemplateOperation( self._repo.getTemplate( 'ingest-postprocess' ), 
+                                                                                task[ 'parameters' ] )
 
-                # raise exception on error
-                if 'ERROR' in str( error ):
-                    raise ValueError ( pathname, out, error, code )
-                    
+            # raise exception on error - drop partial temp table so retries do not accumulate tables
+            if 'ERROR' in str( error ):
+                task[ 'server' ].executeTemplateOperation( 'DROP TABLE IF EXISTS !SCHEMA!.!TEMP_TABLE!;', task[ 'parameters' ] )
+                raise ValueError ( pathname, out, error, code )
+                
         return
 
 
-    def isLoaded(self, server, pathname ):
+# ingester instance owned by process pool worker
+worker = None
 
-        """
-        check image already loaded in database
-        """
 
-        # query pathname in catalog table
-        records = server.getRecords( "SELECT pathname FROM {repository}.cat WHERE pathname = '{pathname}'".format(  repository=self._repo.getName(), 
-                                                                                                                    pathname=pathname ) )
-        if len( records ) == 1:
-            return True
+def initProcessWorker( ingester ):
+
+    """
+    initialise process pool worker with copy of ingester
+    """
+
+    global worker
+    worker = ingester
+    return
+
+
+def executeProcessImage( server_index, parameters, image ):
+
+    """
+    ingest single image in process pool worker
+    """
+
+    # resolve server in worker copy - connection pool private to this process
+    server = worker._repo.getServerList()[ server_index ]
+    task = { 'index' : os.getpid(), 'server' : server, 'product' : None, 'parameters' : parameters }
 
-        return False
+    # errors returned as strings - exceptions may not pickle
+    error = worker.ingestImageWithRetry( task, image )
+    return image, str( error ) if error is not None else None
 
 
 def parseArguments(args=None):
@@ -232,6 +438,11 @@ def parseArguments(args=None):
     parser.add_argument('config_file', action="store") # 'C:\\Users\\Chris.Williams\Desktop\\ingest.yml'
     parser.add_argument('repository', action="store")
     parser.add_argument('product', action="store")
+    parser.add_argument('-threads', default=6, action="store", type=int )
+    parser.add_argument('-retries', default=2, action="store", type=int )
+    parser.add_argument('-backoff', default=5.0, action="store", type=float )
+    parser.add_argument('-backend', default='thread', choices=[ 'thread', 'process', 'async' ], action="store" )
+    parser.add_argument('-server_threads', default=None, action="store", type=int )
 
     return parser.parse_args(args)
 
@@ -255,7 +466,7 @@ def main():
         if product is not None:
 
             # ingest images
-            obj = Ingester( repo )
+            obj = Ingester( repo, threads=args.threads, retries=args.retries, backoff=args.backoff, backend=args.backend, server_threads=args.server_threads )
             obj.process ( product )
             
     return
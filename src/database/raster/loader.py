@@ -0,0 +1,264 @@
+import os
+import gdal
+import struct
+import threading
+import psycopg2
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TileStream:
+
+
+    def __init__( self, rows ):
+
+        """
+        constructor - wraps iterator of encoded binary copy tuples
+        """
+
+        # binary copy header: signature, flags, header extension length
+        self._rows = rows
+        self._buffer = bytearray( b'PGCOPY\n\xff\r\n\x00' + struct.pack( '!ii', 0, 0 ) )
+        self._done = False
+        return
+
+
+    def read( self, size=-1 ):
+
+        """
+        read encoded tuples up to size bytes - trailer appended when exhausted
+        """
+
+        # fill buffer from row iterator
+        while not self._done and ( size < 0 or len( self._buffer ) < size ):
+
+            row = next( self._rows, None )
+            if row is None:
+                self._buffer += struct.pack( '!h', -1 )
+                self._done = True
+            else:
+                self._buffer += row
+
+        # slice off requested chunk
+        if size < 0:
+            size = len( self._buffer )
+
+        chunk = bytes( self._buffer[ : size ] ); del self._buffer[ : size ]
+        return chunk
+
+
+    def readline( self, size=-1 ):
+
+        """
+        copy from binary does not use line semantics
+        """
+
+        return self.read( size )
+
+
+class Loader:
+
+    # gdal data type to postgis pixel type and little-endian numpy dtype
+    pixel_types = { gdal.GDT_Byte : ( 4, '<u1' ),
+                    gdal.GDT_Int16 : ( 5, '<i2' ),
+                    gdal.GDT_UInt16 : ( 6, '<u2' ),
+                    gdal.GDT_Int32 : ( 7, '<i4' ),
+                    gdal.GDT_UInt32 : ( 8, '<u4' ),
+                    gdal.GDT_Float32 : ( 10, '<f4' ),
+                    gdal.GDT_Float64 : ( 11, '<f8' ) }
+
+
+    def __init__( self, server, threads=4 ):
+
+        """
+        constructor
+        """
+
+        # members
+        self._server = server
+        self._threads = threads
+        self._local = threading.local()
+        return
+
+
+    def load( self, parameters ):
+
+        """
+        load raster into database as tiled postgis raster objects - mirrors raster2pgsql -R -d -F
+        """
+
+        out = None; error = None
+
+        # open image and compute tile windows
+        pathname = parameters[ 'PATHNAME' ]
+        src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+        if src_ds is None:
+            return out, 'ERROR: unable to open {}'.format( pathname ), 1
+
+        outdb = parameters[ 'OUTDB' ] if 'OUTDB' in parameters else True
+        srid = int( parameters[ 'SRID' ] ) if 'SRID' in parameters else 0
+        windows = self.getTileWindows( src_ds, parameters[ 'TILE_SIZE' ] )
+
+        table = '{}.{}'.format( parameters[ 'SCHEMA' ], parameters[ 'TEMP_TABLE' ] )
+        with self._server.borrowConnection() as conn:
+            cur = conn.cursor()
+
+            try:
+                # temp table contract as raster2pgsql: rid, rast, filename - rast staged as bytea
+                cur.execute( 'DROP TABLE IF EXISTS {table}'.format( table=table ) )
+                cur.execute( 'CREATE TABLE {table} ( rid serial PRIMARY KEY, rast bytea, filename text )'.format( table=table ) )
+
+                # bulk copy tiles in binary format
+                rows = self.getTupleIterator( pathname, src_ds, windows, srid, outdb )
+                cur.copy_expert( 'COPY {table} ( rast, filename ) FROM STDIN WITH ( FORMAT binary )'.format( table=table ),
+                                    TileStream( rows ) )
+
+                # raster type has no binary receive function - convert wkb in place
+                cur.execute( 'ALTER TABLE {table} ALTER COLUMN rast TYPE raster USING ST_RastFromWKB( rast )'.format( table=table ) )
+                conn.commit()
+
+                out = 'tiles loaded: {}'.format( len( windows ) )
+
+            # record error - rolled back on release
+            except psycopg2.Error as e:
+
+                print ( e.pgerror )
+                error = 'ERROR: {}'.format( e.pgerror if e.pgerror is not None else str( e ) )
+
+        return out, error, 0 if error is None else 1
+
+
+    def getTileWindows( self, src_ds, tile_size ):
+
+        """
+        get list of tile pixel windows - edge tiles truncated as raster2pgsql
+        """
+
+        # parse tile size string e.g. 512x512
+        tile_x, tile_y = [ int( x ) for x in str( tile_size ).lower().split( 'x' ) ]
+
+        windows = []
+        for y in range( 0, src_ds.RasterYSize, tile_y ):
+            for x in range( 0, src_ds.RasterXSize, tile_x ):
+
+                windows.append( (   x, y,
+                                    min( tile_x, src_ds.RasterXSize - x ),
+                                    min( tile_y, src_ds.RasterYSize - y ) ) )
+
+        return windows
+
+
+    def getTupleIterator( self, pathname, src_ds, windows, srid, outdb ):
+
+        """
+        yield binary copy tuples - in-db tiles encoded in parallel batches
+        """
+
+        filename = os.path.basename( pathname ).encode()
+        field = struct.pack( '!i', len( filename ) ) + filename
+
+        def getTuple( wkb ):
+            return struct.pack( '!hi', 2, len( wkb ) ) + wkb + field
+
+        # out-db tiles reference source file - header only, no pixel reads
+        if outdb:
+            for window in windows:
+                yield getTuple( self.getTileWkb( src_ds, window, srid, pathname=pathname ) )
+            return
+
+        # bounded batches keep memory flat while workers read and encode pixels
+        batch_size = self._threads * 4
+        with ThreadPoolExecutor( max_workers=self._threads ) as executor:
+
+            for start in range( 0, len( windows ), batch_size ):
+                batch = windows[ start : start + batch_size ]
+                for wkb in executor.map( lambda w: self.getTileWkb( self.getDataset( pathname ), w, srid ), batch ):
+                    yield getTuple( wkb )
+
+        return
+
+
+    def getDataset( self, pathname ):
+
+        """
+        get per-thread gdal dataset handle - datasets are not thread safe
+        """
+
+        if getattr( self._local, 'pathname', None ) != pathname:
+            self._local.ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+            self._local.pathname = pathname
+
+        return self._local.ds
+
+
+    @staticmethod
+    def getNoDataValue( nodata, dtype ):
+
+        """
+        clamp nodata to range of pixel type as raster2pgsql - none when not representable
+        """
+
+        if nodata is None:
+            return None
+
+        dtype = np.dtype( dtype )
+        if dtype.kind in 'iu':
+
+            # nan / infinite nodata has no integer equivalent
+            if not np.isfinite( nodata ):
+                return None
+
+            info = np.iinfo( dtype )
+            return int( np.clip( round( nodata ), info.min, info.max ) )
+
+        info = np.finfo( dtype )
+        return float( np.clip( nodata, info.min, info.max ) ) if np.isfinite( nodata ) else nodata
+
+
+    def getTileWkb( self, src_ds, window, srid, pathname=None ):
+
+        """
+        encode tile window as postgis raster wkb (little endian) - out-db when pathname given
+        """
+
+        x, y, width, height = window
+        gt = src_ds.GetGeoTransform()
+
+        # raster header: endian, version, band count, scale, origin, skew, srid, dimensions
+        wkb = struct.pack( '<BHHddddddiHH',
+                            1, 0, src_ds.RasterCount,
+                            gt[ 1 ], gt[ 5 ],
+                            gt[ 0 ] + x * gt[ 1 ] + y * gt[ 2 ],
+                            gt[ 3 ] + x * gt[ 4 ] + y * gt[ 5 ],
+                            gt[ 2 ], gt[ 4 ],
+                            srid, width, height )
+
+        for idx in range( 1, src_ds.RasterCount + 1 ):
+
+            band = src_ds.GetRasterBand( idx )
+            pixtype, dtype = self.pixel_types[ band.DataType ]
+
+            # band flags + nodata value in pixel type
+            flags = pixtype
+            nodata = self.getNoDataValue( band.GetNoDataValue(), dtype )
+            if nodata is not None:
+                flags |= 0x40
+
+            value = np.array( [ nodata if nodata is not None else 0 ], dtype=dtype ).tobytes()
+
+            if pathname is not None:
+
+                # offline band: 0-based band number and null-terminated path
+                wkb += struct.pack( '<B', flags | 0x80 ) + value + struct.pack( '<B', idx - 1 ) + pathname.encode() + b'\x00'
+
+            else:
+
+                # in-db band: flag all-nodata tiles and append pixel block
+                data = band.ReadAsArray( x, y, width, height ).astype( dtype, copy=False )
+                if nodata is not None and np.all( data == np.frombuffer( value, dtype=dtype )[ 0 ] ):
+                    flags |= 0x20
+
+                wkb += struct.pack( '<B', flags ) + value + data.tobytes()
+
+        return wkb
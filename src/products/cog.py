@@ -5,51 +5,140 @@ import shutil
 import argparse
 
 from src.utility import parser
+from src.utility import converter
 from src.utility.gsclient import GsClient
+from src.utility.pipeline import Pipeline, ScratchBudget
 
 
-def convertToCog( pathname, out_pathname, creationOptions ):
+def setVsiOptions( cache_mb=256, chunk_kb=4096, sidecars=False ):
 
     """
-    convert image to COG with gdal translate functionality
+    tune gdal /vsigs/ range reads, block caching and direct writes - sidecars probes .aux.xml written by nodata sidecar mode
     """
 
-    # open existing image
-    src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
-    if src_ds is not None:
+    # avoid directory listing on open and merge adjacent range requests - empty dir hides .aux.xml sidecars
+    options = { 'GDAL_DISABLE_READDIR_ON_OPEN' : 'TRUE' if sidecars else 'EMPTY_DIR',
+                'CPL_VSIL_CURL_ALLOWED_EXTENSIONS' : '.TIF,.tif,.tiff,.ovr,.msk',
+                'GDAL_HTTP_MULTIRANGE' : 'YES',
+                'GDAL_HTTP_MERGE_CONSECUTIVE_RANGES' : 'YES',
+                'CPL_VSIL_CURL_CHUNK_SIZE' : str( chunk_kb * 1024 ),
+                'VSI_CACHE' : 'TRUE',
+                'CPL_VSIL_USE_TEMP_FILE_FOR_RANDOM_WRITE' : 'YES',
+                'VSI_CACHE_SIZE' : str( cache_mb * 1024 * 1024 ) }
 
-        # create out path if required
-        out_path = os.path.dirname( out_pathname )
-        if not os.path.exists( out_path ):
-            os.makedirs( out_path )
+    for key, value in options.items():
+        gdal.SetConfigOption( key, value )
 
-        # execute translation - report error to log
-        gdal.Translate( out_pathname, src_ds, format='COG', creationOptions=creationOptions )
-                
     return
 
 
-def checkOutputExists( blobs, client ):
+def streamToCog( client, blob, upload_path, profile, metadata=None ):
+
+    """
+    convert blob read through gdal uri into cog written straight to bucket - no local download
+    """
+
+    # source read with range requests - output written sequentially, random writes spilled to local temp file
+    name = os.path.basename( blob ).replace( 'ard', 'cog' )
+    dst_name = '{}/{}'.format( upload_path, name )
+
+    print ( 'generating: {}'.format( dst_name ) )
+    converter.convertToCog( client.getUri( blob ), client.getUri( dst_name ), profile )
+
+    # source md5 recorded once object written
+    client.setMetadata( dst_name, metadata )
+    return dst_name
+
+
+def getProfile( profiles, name, pathname ):
+
+    """
+    select cog profile - explicit name or inferred from pan / ms filename
+    """
+
+    if name is None:
+        name = 'pan' if '_PAN_' in os.path.basename( pathname ) else 'ms'
+
+    return profiles[ name ]
+
+
+def checkOutputExists( blobs, client, compare=None, records=None ):
+
+    """
+    remove blobs whose output directory + files already exist - records of input listing reused for compare
+    """
+
+    # single listing of output prefix replaces per-blob listing
+    return client.getMissingOutputs( blobs, 'ard', 'cog', '.*TIF$', compare=compare, inputs=records )
+
+
+def processBlobs( client, blobs, bucket_path, args, profiles, records ):
 
     """
-    remove blobs whose output directory + files already exist
+    overlap download, conversion and upload of blobs in staged pipeline - input records reserve scratch space, md5 recorded on output
     """
 
-    # for each blob name
-    results = []
-    for blob in blobs:
+    budget = ScratchBudget( int( args.scratch_gb * 1024 ** 3 ) )
 
-        # get blobs in output directory
-        path = os.path.dirname( blob ).replace( 'ard', 'cog' )
-        out_blobs = client.getBlobNameList( path, '.*TIF' )
+    def download( item ):
 
-        # no blobs - no output
-        if len ( out_blobs ) == 0:
-            results.append( blob )
-        else:
-            print ( 'output exists: {}', path )
+        # wait for scratch space then download blob to local file system
+        item[ 'reserved' ] = budget.acquire( 2 * ( records.get( item[ 'blob' ], {} ).get( 'size' ) or 0 ) )
 
-    return results
+        print ( 'downloading: {}'.format ( item[ 'blob' ] ) )
+        item[ 'pathname' ] = client.downloadBlob( item[ 'blob' ], args.download_path )
+        return item
+
+    def convert( item ):
+
+        # convert to cog - input removed once converted
+        item[ 'out_pathname' ] = item[ 'pathname' ].replace( 'ard', 'cog' )  
+
+        print ( 'generating: {}'.format( item[ 'out_pathname' ] ) )
+        converter.convertToCog( item[ 'pathname' ],  
+                                item[ 'out_pathname' ],
+                                getProfile( profiles, args.profile, item[ 'pathname' ] ) )
+
+        os.remove( item[ 'pathname' ] )
+        return item
+
+    def upload( item ):
+
+        # upload cog to bucket                       
+        upload_path = '{}/{}'.format( bucket_path, parser.getDateTimeString( item[ 'out_pathname' ] ) )
+        upload_path = upload_path.replace( 'ard', 'cog' ) 
+
+        print( 'uploading: {}'.format( item[ 'out_pathname' ] ) )
+        client.uploadFile( item[ 'out_pathname' ], prefix=upload_path, flatten=True, metadata=GsClient.getSourceMetadata( records.get( item[ 'blob' ] ) ) )
+
+        # free scratch space
+        drop( item )
+        return item
+
+    def drop( item ):
+
+        # remove local files and return scratch space
+        for key in [ 'pathname', 'out_pathname' ]:
+            if item.get( key ) is not None and os.path.exists( item[ key ] ):
+                os.remove( item[ key ] )
+
+        budget.release( item.pop( 'reserved', 0 ) )
+        return
+
+    # bounded queues between stages - worker count configurable per stage
+    pipeline = Pipeline( [  ( 'download', download, args.download_workers ),
+                            ( 'convert', convert, args.convert_workers ),
+                            ( 'upload', upload, args.upload_workers ) ], 
+                            on_drop=drop )
+
+    completed, failures = pipeline.run( { 'blob' : blob } for blob in blobs )
+    print( 'blobs completed: {} failed: {}'.format( len( completed ), len( failures ) ) )
+
+    # remove download directory
+    if os.path.exists( args.download_path ):
+        shutil.rmtree( args.download_path )
+
+    return completed, failures
 
 
 def parseArguments(args=None):
@@ -65,7 +154,18 @@ def parseArguments(args=None):
     parser.add_argument( 'download_path', action="store" )
     parser.add_argument('-t','--tles', nargs='+', help='tles', type=int, required=True )
     parser.add_argument('-chunk_size', default=None, action="store", type=int )
-
+    parser.add_argument('-cache_ttl', default=None, action="store", type=int )
+    parser.add_argument('-endpoint', default=None, action="store", help='local directory or emulator url - google cloud storage by default' )
+    parser.add_argument('-compare', default=None, choices=[ 'md5', 'updated' ], action="store" )
+    parser.add_argument('-download_workers', default=2, action="store", type=int )
+    parser.add_argument('-convert_workers', default=1, action="store", type=int )
+    parser.add_argument('-upload_workers', default=2, action="store", type=int )
+    parser.add_argument('-scratch_gb', default=50.0, action="store", type=float )
+    parser.add_argument('-vsi', action="store_true", help='read from /vsigs/ and stream output - no local download' )
+    parser.add_argument('-vsi_cache_mb', default=256, action="store", type=int )
+    parser.add_argument('-sidecars', action="store_true", help='probe .aux.xml sidecars on /vsigs/ open - required for nodata sidecar mode' )
+    parser.add_argument('-profiles', default=None, action="store", help='repository or profiles yaml with cog-profiles section' )
+    parser.add_argument('-profile', default=None, action="store", help='cog profile name - pan / ms inferred from filename by default' )
 
     return parser.parse_args(args)
 
@@ -83,46 +183,45 @@ def main():
     bucket, prefix = GsClient.parseUri( args.uri )
     if bucket is not None:
 
-        # update credentials
-        if os.path.exists( args.key_pathname ):
-            GsClient.updateCredentials( args.key_pathname )
+        # explicit client credentials - environment also updated for gdal /vsigs/ reads
+        credentials = args.key_pathname if os.path.exists( args.key_pathname ) else None
+        if credentials is not None:
+            GsClient.updateCredentials( credentials )
 
-        # open client
-        client = GsClient( bucket, chunk_size=args.chunk_size )
+        # open shared client
+        client = GsClient.getClient( bucket, credentials=credentials, chunk_size=args.chunk_size, cache_ttl=args.cache_ttl, endpoint=args.endpoint )
+
+        # named cog encoding profiles
+        profiles = converter.getProfiles( args.profiles )
+        converter.setCacheMax( profiles )
         for tle in args.tles:
 
-            # retrieve list of blobs in prefix + tle directory            
+            # single listing of prefix + tle directory - names, compare metadata and source md5
             bucket_path = '{}/{}'.format( prefix, str( tle ) ).lstrip('/')
-            blobs = client.getBlobNameList( bucket_path, '.*TIF' )
+            records = { record[ 'name' ] : record for record in client.getBlobRecords( bucket_path ) }
+            blobs = GsClient.getRecordNames( records.values(), '.*TIF$' )
             print( 'blobs found: {}'.format( str( len( blobs ) ) ) )
 
             # check output files already exist
-            blobs = checkOutputExists( blobs, client )
+            blobs = checkOutputExists( blobs, client, compare=args.compare, records=records )
             print( 'blobs after output check: {}'.format( str( len( blobs ) ) ) )
 
-            for blob in blobs:
-
-                # download blob to local file system
-                print ( 'downloading: {}'.format ( blob ) )
-
-                pathname = client.downloadBlob( blob, args.download_path )
-                out_pathname = pathname.replace( 'ard', 'cog' )  
+            # zero-download conversion - concurrent conversions bounded by convert workers
+            if args.vsi:
 
-                # convert to cog
-                print ( 'generating: {}'.format( out_pathname ) )
-                convertToCog(   pathname,  
-                                out_pathname,
-                                ['BIGTIFF=YES', 'COMPRESS=DEFLATE', 'NUM_THREADS=ALL_CPUS' ] )
+                setVsiOptions( cache_mb=args.vsi_cache_mb, sidecars=args.sidecars )
+                upload_path = lambda blob: '{}/{}'.format( bucket_path, parser.getDateTimeString( blob ) ).replace( 'ard', 'cog' )
 
-                # upload cog to bucket                       
-                upload_path = '{}/{}'.format( bucket_path, parser.getDateTimeString( out_pathname ) )
-                upload_path = upload_path.replace( 'ard', 'cog' ) 
+                pipeline = Pipeline( [ ( 'convert', lambda blob: streamToCog( client, blob, upload_path( blob ), 
+                                                                                getProfile( profiles, args.profile, blob ),
+                                                                                metadata=GsClient.getSourceMetadata( records.get( blob ) ) ),
+                                                                                args.convert_workers ) ] )
+                completed, failures = pipeline.run( blobs )
+                print( 'blobs completed: {} failed: {}'.format( len( completed ), len( failures ) ) )
+                continue
 
-                print( 'uploading: {}'.format( out_pathname ) )
-                client.uploadFile( out_pathname, prefix=upload_path, flatten=True )
-                
-                # remove download directory
-                shutil.rmtree( args.download_path )
+            # download, convert and upload in overlapping stages
+            processBlobs( client, blobs, bucket_path, args, profiles, records )
                 
     return
 
@@ -130,4 +229,3 @@ def main():
 # execute main
 if __name__ == '__main__':
     main()
-
@@ -1,10 +1,14 @@
 import os
 import pdb
 import gdal
+import io
 import shutil
 import argparse
 import numpy as np
 
+from xml.etree import ElementTree
+
+from src.utility import tiff
 from src.utility import parser
 from src.utility.gsclient import GsClient
 
@@ -29,28 +33,92 @@ def setNoData( pathname, nodata=0 ):
     return
 
 
-def checkOutputExists( blobs, client ):
+def getTiffLayout( client, blob ):
+
+    """
+    read tiff header and first ifd with ranged reads
+    """
+
+    read = lambda offset, size: client.readRange( blob, offset, size )
+
+    layout = tiff.getLayout( read( 0, 16 ) )
+    entries, next_offset = tiff.readIfd( layout, read )
+
+    return layout, entries, next_offset
+
+
+def setNoDataSidecar( client, blob, nodata=0, metadata=None ):
+
+    """
+    write nodata value for every band into .aux.xml sidecar next to blob - not read by gdal with readdir disabled as empty dir
+    """
+
+    # band count from samples per pixel tag
+    layout, entries, next_offset = getTiffLayout( client, blob )
+    bands = 1
+    for entry in entries:
+        if entry[ 0 ] == tiff.SAMPLES_PER_PIXEL:
+            bands = tiff.getInlineValue( layout, entry )
+
+    # merge with existing sidecar - preserves statistics / histograms
+    name = blob + '.aux.xml'
+    sidecar = client.getBlob( name )
+    root = ElementTree.fromstring( sidecar.download_as_bytes() ) if sidecar.exists() else ElementTree.Element( 'PAMDataset' )
+
+    for idx in range( 1, bands + 1 ):
+
+        band = root.find( "PAMRasterBand[@band='{}']".format( idx ) )
+        if band is None:
+            band = ElementTree.SubElement( root, 'PAMRasterBand', { 'band' : str( idx ) } )
+
+        value = band.find( 'NoDataValue' )
+        if value is None:
+            value = ElementTree.SubElement( band, 'NoDataValue' )
+
+        value.text = str( nodata )
+
+    client.uploadStream( io.BytesIO( ElementTree.tostring( root ) ), name, metadata=metadata )
+    return name
+
+
+def patchNoData( client, blob, dst_name, nodata=0, metadata=None ):
+
+    """
+    set gdal nodata tag by patching tiff header and appending new ifd - no local copy or gdal rewrite
+    """
+
+    layout, entries, next_offset = getTiffLayout( client, blob )
+
+    # new ifd appended to end of file - header redirected to it
+    src = client.getBlob( blob )
+    src.reload()
+    header, tail = tiff.getNoDataPatch( layout, entries, next_offset, src.size, nodata )
+
+    return client.patchBlob( blob, header, tail, dst_name=dst_name, metadata=metadata )
+
+
+def checkOutputExists( blobs, client, records, compare=None, mode='download' ):
 
     """
-    remove blobs whose output directory + files already exist
+    remove blobs whose output directory + files already exist - sidecar mode checks .aux.xml next to blob in input records
     """
 
-    # for each blob name
-    results = []
-    for blob in blobs:
+    if mode == 'sidecar':
 
-        # get blobs in output directory
-        path = os.path.dirname( blob ).replace( 'ard', 'ard_update' )
-        out_blobs = client.getBlobNameList( path, '.*_MS_.*TIF' )
+        results = []
+        for blob in blobs:
 
-        # no blobs - no output
-        if len ( out_blobs ) == 0:
-            results.append( blob )
-        else:
-            print ( 'output exists: {}', path )
+            # no sidecar or stale sidecar
+            sidecar = records.get( blob + '.aux.xml' )
+            if sidecar is None or ( compare is not None and client.isStale( records.get( blob ), { sidecar[ 'name' ] : sidecar }, compare ) ):
+                results.append( blob )
+            else:
+                print ( 'output exists: {}'.format( sidecar[ 'name' ] ) )
 
-    return results
+        return results
 
+    # single listing of output prefix replaces per-blob listing
+    return client.getMissingOutputs( blobs, 'ard', 'ard_update', '.*_MS_.*TIF$', compare=compare, inputs=records )
 
 
 def parseArguments(args=None):
@@ -66,6 +134,11 @@ def parseArguments(args=None):
     parser.add_argument( 'download_path', action="store" )
     parser.add_argument('-t','--tles', nargs='+', help='tles', type=int, required=True )
     parser.add_argument('-chunk_size', default=None, action="store", type=int )
+    parser.add_argument('-cache_ttl', default=None, action="store", type=int )
+    parser.add_argument('-endpoint', default=None, action="store", help='local directory or emulator url - google cloud storage by default' )
+    parser.add_argument('-compare', default=None, choices=[ 'md5', 'updated' ], action="store" )
+    parser.add_argument('-mode', default='download', choices=[ 'download', 'sidecar', 'patch' ], action="store", 
+                            help='sidecar nodata ignored by /vsigs/ readers with GDAL_DISABLE_READDIR_ON_OPEN=EMPTY_DIR - use cog -sidecars' )
 
     return parser.parse_args(args)
 
@@ -83,21 +156,38 @@ def main():
     bucket, prefix = GsClient.parseUri( args.uri )
     if bucket is not None:
 
-        # update credentials
-        if os.path.exists( args.key_pathname ):
-            GsClient.updateCredentials( args.key_pathname )
+        # explicit client credentials
+        credentials = args.key_pathname if os.path.exists( args.key_pathname ) else None
 
-        # open client
-        client = GsClient( bucket, chunk_size=args.chunk_size )
+        # open shared client
+        client = GsClient.getClient( bucket, credentials=credentials, chunk_size=args.chunk_size, cache_ttl=args.cache_ttl, endpoint=args.endpoint )
         for tle in args.tles:
 
-            # retrieve list of blobs in prefix + tle directory            
+            # single listing of prefix + tle directory - names, sidecars, compare metadata and source md5
             bucket_path = '{}/{}'.format( prefix, str( tle ) ).lstrip('/')
-            blobs = client.getBlobNameList( bucket_path, '.*_MS_.*TIF' )
+            records = { record[ 'name' ] : record for record in client.getBlobRecords( bucket_path ) }
+            blobs = GsClient.getRecordNames( records.values(), '.*_MS_.*TIF$' )
             print( 'blobs found: {}'.format( str( len( blobs ) ) ) )
 
+            # check output files already exist
+            blobs = checkOutputExists( blobs, client, records, compare=args.compare, mode=args.mode )
+            print( 'blobs after output check: {}'.format( str( len( blobs ) ) ) )
+
             for blob in blobs:
 
+                # nodata metadata in .aux.xml sidecar next to blob
+                if args.mode == 'sidecar':
+                    print ( 'sidecar: {}'.format( setNoDataSidecar( client, blob, metadata=GsClient.getSourceMetadata( records.get( blob ) ) ) ) )
+                    continue
+
+                # patch tiff header / ifd into output blob
+                if args.mode == 'patch':
+                    upload_path = '{}/{}'.format( bucket_path, parser.getDateTimeString( blob ) ).replace( 'ard', 'ard_update' )
+                    dst_name = '{}/{}'.format( upload_path, os.path.basename( blob ) )
+                    print ( 'patching: {}'.format( dst_name ) )
+                    patchNoData( client, blob, dst_name, metadata=GsClient.getSourceMetadata( records.get( blob ) ) )
+                    continue
+
                 # download blob to local file system
                 print ( 'downloading: {}'.format ( blob ) )
                 pathname = client.downloadBlob( blob, args.download_path )
@@ -108,7 +198,7 @@ def main():
                 upload_path = upload_path.replace( 'ard', 'ard_update' ) 
 
                 print( 'uploading: {}'.format( pathname ) )
-                client.uploadFile( pathname, prefix=upload_path, flatten=True )
+                client.uploadFile( pathname, prefix=upload_path, flatten=True, metadata=GsClient.getSourceMetadata( records.get( blob ) ) )
                 
                 # remove download directory
                 shutil.rmtree( args.download_path )
@@ -3,69 +3,249 @@ import pdb
 import gdal, ogr
 import shutil
 import argparse
+import threading
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+
 from src.utility import parser
+from src.utility import converter
 from src.utility.gsclient import GsClient
 
 
-def convertToCog( pathname, out_pathname, creationOptions ):
+def getCounts( data ):
 
     """
-    convert image to COG with gdal translate functionality
+    count integer values of block in 65536 buckets - signed / float data rounded and clipped to 16-bit range
     """
 
-    # open existing image
-    src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
-    if src_ds is not None:
+    # unsigned 8 / 16-bit counted directly
+    if data.dtype.kind == 'u' and data.dtype.itemsize <= 2:
+        return np.bincount( data.ravel(), minlength=65536 )[ : 65536 ]
 
-        # create out path if required
-        out_path = os.path.dirname( out_pathname )
-        if not os.path.exists( out_path ):
-            os.makedirs( out_path )
+    values = data.ravel()
+    if values.dtype.kind == 'f':
+        values = np.around( values[ np.isfinite( values ) ] )
 
-        # execute translation - report error to log
-        gdal.Translate( out_pathname, src_ds, format='COG', creationOptions=creationOptions )
-                
-    return
+    return np.bincount( np.clip( values, 0, 65535 ).astype( np.int64 ), minlength=65536 )[ : 65536 ]
+
+
+def getHistograms( pathname, band_idxs=[1,2,3], approx=False, cache=True, cache_pathname=None ):
+
+    """
+    compute integer histograms of all bands in single pass - cached in .aux.xml sidecar or persistent npz file
+    """
+
+    histograms = {}
+
+    # persistent cache outlives local download - keyed by caller on source identity
+    if cache and cache_pathname is not None and os.path.exists( cache_pathname ):
+        with np.load( cache_pathname ) as cached:
+            histograms = { idx : cached[ str( idx ) ] for idx in band_idxs if str( idx ) in cached }
+
+    # reuse histograms cached in sidecar
+    src = gdal.Open( pathname, gdal.GA_ReadOnly )
+    for idx in band_idxs:
+
+        if idx in histograms:
+            continue
+
+        cached = src.GetRasterBand( idx ).GetDefaultHistogram( force=0 ) if cache and not approx else None
+        if cached is not None and cached[ 0 ] == -0.5 and cached[ 1 ] == cached[ 2 ] - 0.5:
+            histograms[ idx ] = np.pad( np.array( cached[ 3 ], dtype=np.int64 ), ( 0, 65536 - cached[ 2 ] ) )
+
+    missing = [ idx for idx in band_idxs if idx not in histograms ]
+    if len( missing ) > 0:
+
+        exact = []
+        for idx in missing:
+
+            histograms[ idx ] = np.zeros( 65536, dtype=np.int64 )
+
+            # approximate - whole of coarsest overview with at least 1024 columns
+            band = src.GetRasterBand( idx )
+            overview = None
+            if approx:
+                for ovr in range( band.GetOverviewCount() ):
+                    if band.GetOverview( ovr ).XSize >= 1024:
+                        overview = band.GetOverview( ovr )
+
+            # no usable overview - exact block pass avoids full resolution read
+            if overview is None:
+                exact.append( idx )
+            else:
+                histograms[ idx ] += getCounts( overview.ReadAsArray() )
+
+        if len( exact ) > 0:
 
+            # exact - stream block-aligned windows, all bands per window
+            band = src.GetRasterBand( exact[ 0 ] )
+            for row, rows in getWindows( band.YSize, band.GetBlockSize()[ 1 ], band.XSize ):
+                for idx in exact:
+                    histograms[ idx ] += getCounts( src.GetRasterBand( idx ).ReadAsArray( 0, row, band.XSize, rows ) )
 
-def getPercentiles( pathname, band_idxs=[1,2,3], nbuckets=1000, percentiles=[2.0, 98.0] ):
+        for idx in missing:
+
+            # exclude nodata as gdal histograms
+            nodata = src.GetRasterBand( idx ).GetNoDataValue()
+            if nodata is not None and float( nodata ).is_integer() and 0 <= nodata < 65536:
+                histograms[ idx ][ int( nodata ) ] = 0
+
+            # cache exact histogram trimmed to largest value
+            if cache and idx in exact:
+                buckets = int( np.max( np.nonzero( histograms[ idx ] )[ 0 ], initial=0 ) ) + 1
+                src.GetRasterBand( idx ).SetDefaultHistogram( -0.5, buckets - 0.5, histograms[ idx ][ : buckets ].tolist() )
+
+        # persist histograms of all requested bands
+        if cache and cache_pathname is not None:
+            if not os.path.exists( os.path.dirname( cache_pathname ) ):
+                os.makedirs( os.path.dirname( cache_pathname ) )
+            np.savez_compressed( cache_pathname, **{ str( idx ) : histograms[ idx ] for idx in band_idxs } )
+
+    # close dataset - flushes sidecar
+    src = None
+    return histograms
+
+
+def getPercentileValues( histogram, percentiles=[ 2.0, 98.0 ] ):
+
+    """
+    get values at percentiles from integer histogram - no image access
+    """
+
+    # cumulative probability distribution
+    distribution = np.cumsum( histogram ) / max( 1, np.sum( histogram ) )
+    return [ float( np.searchsorted( distribution, p / 100.0 ) ) for p in percentiles ]
+
+
+def getPercentiles( pathname, band_idxs=[1,2,3], percentiles=[2.0, 98.0], histograms=None, approx=False ):
 
     """
     compute percentile from image histogram - use to rescale 16bit to 8bit
     """
 
-    results = []
+    # compute histograms once - reused across percentile requests
+    if histograms is None:
+        histograms = getHistograms( pathname, band_idxs, approx=approx )
 
-    # open image dataset and band 
-    src = gdal.Open( pathname )
-    for idx in band_idxs: 
-        
-        # Use GDAL to find the min and max
-        band = src.GetRasterBand( idx )
-        (lo, hi, avg, std) = band.GetStatistics(True, True)
+    return [ getPercentileValues( histograms[ idx ], percentiles ) for idx in band_idxs ]
+
+
+def getLookupTable( nodata, offset, scale ):
+
+    """
+    map every 16-bit input value to rescaled 8-bit value - identical to per-pixel rescale
+    """
 
-        # Use GDAL to calculate a big histogram
-        rawhist = band.GetHistogram(min=lo, max=hi, buckets=nbuckets)
-        binEdges = np.linspace(lo, hi, nbuckets+1)
+    # rescale, round and clip all possible values once
+    values = np.arange( 65536, dtype=np.float64 )
+    lut = np.uint8( np.clip( np.around( ( values - offset ) / scale ), 0.0, 255.0 ) )
 
-        # Probability mass function. Trapezoidal-integration of this should yield 1.0.
-        pmf = rawhist / (np.sum(rawhist) * np.diff(binEdges[:2]))
+    # nodata pixels map to zero
+    if nodata is not None and float( nodata ).is_integer() and 0 <= nodata < 65536:
+        lut[ int( nodata ) ] = 0
 
-        # Cumulative probability distribution. Starts at 0, ends at 1.0.
-        distribution = np.cumsum(pmf) * np.diff(binEdges[:2])
+    return lut
+
+
+def rescaleBlock( data, nodata, offset, scale ):
+
+    """
+    rescale block of non 16-bit data to 8-bit
+    """
 
-        # Which histogram buckets are close to the percentiles requested?
-        bucket_idxs = [np.sum(distribution < p / 100.0) for p in percentiles]
+    result = np.zeros( data.shape )
 
-        # record result in dict
-        results.append (  [binEdges[i] for i in bucket_idxs] )
+    # rescale data to 8-bit - float arithmetic avoids wrap of integer types below offset
+    idx = ( data != nodata )
+    result[ idx ] = ( data[ idx ].astype( np.float64 ) - offset ) / scale
 
-    return results
+    # clip data
+    result[ idx ] = np.clip( np.around( result[ idx ] ), 0.0, 255.0 )
+    return np.uint8( result )
 
 
-def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_data=0 ):
+def getWindows( nRows, block_rows, nCols, window_mb=64 ):
+
+    """
+    get full width row windows aligned to native block height
+    """
+
+    # whole number of blocks per window - approx window_mb of 16-bit data
+    rows = max( 1, ( window_mb * 1024 * 1024 ) // ( nCols * 2 * block_rows ) ) * block_rows
+
+    return [ ( row, min( rows, nRows - row ) ) for row in range( 0, nRows, rows ) ]
+
+
+def rescaleBand( pathname, src_idx, out_band, mask_band=None, threads=1, lock=None ):
+
+    """
+    rescale source band into 8-bit output band using lookup table and reused buffers
+    """
+
+    # band constants read once
+    src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+    src_band = src_ds.GetRasterBand( src_idx )
+
+    nCols = src_band.XSize
+    nodata = src_band.GetNoDataValue()
+    offset = out_band.GetOffset(); scale = out_band.GetScale()
+
+    # lookup table for integer data up to 16 bits
+    lut = None
+    if src_band.DataType in [ gdal.GDT_Byte, gdal.GDT_UInt16 ]:
+        lut = getLookupTable( nodata, offset, scale )
+
+    windows = getWindows( src_band.YSize, src_band.GetBlockSize()[ 1 ], nCols )
+    local = threading.local()
+    lock = lock if lock is not None else threading.Lock()
+
+    def rescaleWindow( window ):
+
+        """
+        read, rescale and write single window - dataset handle and buffers per thread
+        """
+
+        row, rows = window
+        if not hasattr( local, 'band' ):
+            local.ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+            local.band = local.ds.GetRasterBand( src_idx )
+            local.buffers = {}
+
+        # reuse buffers of same window height
+        if rows not in local.buffers:
+            local.buffers[ rows ] = ( None, np.empty( ( rows, nCols ), dtype=np.uint8 ) )
+
+        data, result = local.buffers[ rows ]
+        data = local.band.ReadAsArray( 0, row, nCols, rows, buf_obj=data )
+        local.buffers[ rows ] = ( data, result )
+
+        # rescale via table lookup
+        if lut is not None:
+            np.take( lut, data, out=result )
+        else:
+            result = rescaleBlock( data, nodata, offset, scale )
+
+        # write data and optional internal mask
+        with lock:
+            out_band.WriteArray( result, 0, row )
+            if mask_band is not None:
+                out_band.GetMaskBand().WriteArray( mask_band.ReadAsArray( 0, row, nCols, rows ), 0, row ) 
+
+        return
+
+    # optionally split windows across threads
+    if threads > 1:
+        with ThreadPoolExecutor( max_workers=threads ) as executor:
+            list( executor.map( rescaleWindow, windows ) )
+    else:
+        for window in windows:
+            rescaleWindow( window )
+
+    return
+
+
+def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_data=0, threads=1, approx=False, histogram_pathname=None ):
 
     """
     convert image to COG with gdal translate functionality
@@ -76,19 +256,19 @@ def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_
     if not os.path.exists( out_path ):
         os.makedirs( out_path )
 
+    # single histogram pass - percentile search below costs no further image access
+    histograms = getHistograms( pathname, bands, approx=approx, cache_pathname=histogram_pathname )
+
     # get percentiles to computing 16bit to 8bit scaling  
     step = 1.0
-    while step < 10.0:
+    while True:
 
         # iteratively reduce percentile range until 256 values accommodated
-        results = getPercentiles( pathname, percentiles=[ step, 100.0 - step ] )
-        for result in results:        
-            
-            if result[ 1 ] - result[ 0 ] > 255:
-                step += 1.0
-                continue
+        results = getPercentiles( pathname, bands, percentiles=[ step, 100.0 - step ], histograms=histograms )
+        if step >= 9.0 or all( result[ 1 ] - result[ 0 ] <= 255 for result in results ):
+            break
 
-        break
+        step += 1.0
 
     # open existing image
     src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
@@ -116,6 +296,9 @@ def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_
 
         out_ds = driver.Create( out_pathname, nCols, nRows, len( bands ), gdal.GDT_Byte )
         if out_ds is not None:
+
+            # serialise writes to output and mask datasets
+            lock = threading.Lock()
             
             for out_idx, src_idx in enumerate( bands ): 
 
@@ -139,24 +322,13 @@ def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_
                 out_band.SetScale ( ( max_value - min_value ) / 255.0 )
                 out_band.SetOffset ( min_value )
 
-                # for each row
-                rowRange = range( nRows )
-                for row in rowRange:
-
-                    data = src_band.ReadAsArray( 0, row, nCols, 1 )
-                    result = np.zeros( (1, nCols) )
-
-                    # rescale data to 8-bit
-                    idx = ( data != src_band.GetNoDataValue() )
-                    result[ idx ] = ( data[ idx ] - out_band.GetOffset() ) / out_band.GetScale()
-
-                    # clip and write data to band 
-                    result[ idx ] = np.clip( np.around( result[ idx ] ), 0.0, 255.0 )
-                    out_band.WriteArray( np.uint8( result ), 0, row )
-
-                    # write internal mask if 1st iteration
-                    if out_idx == 0:                    
-                        out_band.GetMaskBand().WriteArray( mask_ds.GetRasterBand(1).ReadAsArray( 0, row, nCols, 1 ), 0, row ) 
+                # rescale band in block-aligned windows
+                rescaleBand(    pathname, 
+                                src_idx, 
+                                out_band, 
+                                mask_ds.GetRasterBand(1) if out_idx == 0 else None,
+                                threads=threads,
+                                lock=lock )
 
             # saves to disk!!
             out_ds.FlushCache() 
@@ -165,27 +337,28 @@ def rescaleTo8Bit( pathname, mask_pathname, out_pathname, bands=[ 1, 2, 3 ], no_
     return
 
 
-def checkOutputExists( blobs, client ):
+def getHistogramPathname( path, record, approx=False ):
 
     """
-    remove blobs whose output directory + files already exist
+    get persistent histogram cache pathname keyed on source blob md5 - none when md5 unknown
     """
- 
-    # for each blob name
-    results = []
-    for blob in blobs:
-
-        # get blobs in output directory
-        path = os.path.dirname( blob ).replace( 'ard', 'wms' )
-        out_blobs = client.getBlobNameList( path, '.*_MS_.*TIF' )
-
-        # no blobs - no output
-        if len ( out_blobs ) == 0:
-            results.append( blob )
-        else:
-            print ( 'output exists: {}', path )
 
-    return results
+    if path is None or record is None or record[ 'md5' ] is None:
+        return None
+
+    # md5 base64 made filename safe
+    key = record[ 'md5' ].replace( '/', '_' ).replace( '+', '-' ).rstrip( '=' )
+    return os.path.join( path, '{}{}.npz'.format( key, '_approx' if approx else '' ) )
+
+
+def checkOutputExists( blobs, client, compare=None, records=None ):
+
+    """
+    remove blobs whose output directory + files already exist - records of input listing reused for compare
+    """
+
+    # single listing of output prefix replaces per-blob listing
+    return client.getMissingOutputs( blobs, 'ard', 'wms', '.*_MS_.*TIF$', compare=compare, inputs=records )
 
 
 def parseArguments(args=None):
@@ -201,6 +374,14 @@ def parseArguments(args=None):
     parser.add_argument( 'download_path', action="store" )
     parser.add_argument('-t','--tles', nargs='+', help='tles', type=int, required=True )
     parser.add_argument('-chunk_size', default=None, action="store", type=int )
+    parser.add_argument('-cache_ttl', default=None, action="store", type=int )
+    parser.add_argument('-endpoint', default=None, action="store", help='local directory or emulator url - google cloud storage by default' )
+    parser.add_argument('-compare', default=None, choices=[ 'md5', 'updated' ], action="store" )
+    parser.add_argument('-threads', default=1, action="store", type=int )
+    parser.add_argument('-approx', action="store_true", help='percentiles from overview histograms' )
+    parser.add_argument('-histogram_path', default=os.path.join( os.path.expanduser( '~' ), '.gla', 'histograms' ), action="store" )
+    parser.add_argument('-profiles', default=None, action="store", help='repository or profiles yaml with cog-profiles section' )
+    parser.add_argument('-profile', default='wms', action="store" )
 
     return parser.parse_args(args)
 
@@ -218,21 +399,27 @@ def main():
     bucket, prefix = GsClient.parseUri( args.uri )
     if bucket is not None:
 
-        # update credentials
-        if os.path.exists( args.key_pathname ):
-            GsClient.updateCredentials( args.key_pathname )
+        # explicit client credentials - environment also updated for ogr /vsigs/ mask reads
+        credentials = args.key_pathname if os.path.exists( args.key_pathname ) else None
+        if credentials is not None:
+            GsClient.updateCredentials( credentials )
+
+        # open shared client
+        client = GsClient.getClient( bucket, credentials=credentials, chunk_size=args.chunk_size, cache_ttl=args.cache_ttl, endpoint=args.endpoint )
 
-        # open client
-        client = GsClient( bucket, chunk_size=args.chunk_size )
+        # named cog encoding profiles
+        profiles = converter.getProfiles( args.profiles )
+        converter.setCacheMax( profiles )
         for tle in args.tles:
 
-            # retrieve list of blobs in prefix + tle directory            
+            # single listing of prefix + tle directory - names, compare metadata and source md5
             bucket_path = '{}/{}'.format( prefix, str( tle ) ).lstrip('/')
-            blobs = client.getBlobNameList( bucket_path, '.*_MS_.*TIF' )
+            records = { record[ 'name' ] : record for record in client.getBlobRecords( bucket_path ) }
+            blobs = GsClient.getRecordNames( records.values(), '.*_MS_.*TIF$' )
             print( 'blobs found: {}'.format( str( len( blobs ) ) ) )
 
             # check output files already exist
-            blobs = checkOutputExists( blobs, client )
+            blobs = checkOutputExists( blobs, client, compare=args.compare, records=records )
             print( 'blobs after output check: {}'.format( str( len( blobs ) ) ) )
 
             for blob in blobs:
@@ -248,19 +435,20 @@ def main():
 
                 # rescale to 8bit
                 tmp_pathname = pathname.replace( 'ard', 'tmp' )  
-                rescaleTo8Bit( pathname, mask_pathname, tmp_pathname )
+                rescaleTo8Bit( pathname, mask_pathname, tmp_pathname, threads=args.threads, approx=args.approx,
+                                histogram_pathname=getHistogramPathname( args.histogram_path, records.get( blob ), args.approx ) )
 
-                # convert to cog with jpeg compression
+                # convert to cog with wms profile - jpeg compression by default
                 out_pathname = tmp_pathname.replace( 'tmp', 'wms' )
-                convertToCog(   tmp_pathname, 
-                                out_pathname,
-                                ['BIGTIFF=YES', 'COMPRESS=JPEG', 'NUM_THREADS=ALL_CPUS' ] )
+                converter.convertToCog( tmp_pathname, 
+                                        out_pathname,
+                                        profiles[ args.profile ] )
 
                 # upload cog to bucket                       
                 upload_path = '{}/{}'.format( bucket_path.replace( 'ard', 'wms' ), parser.getDateTimeString( out_pathname ) )
 
                 print( 'uploading: {}'.format( out_pathname ) )
-                client.uploadFile( out_pathname, prefix=upload_path, flatten=True )
+                client.uploadFile( out_pathname, prefix=upload_path, flatten=True, metadata=GsClient.getSourceMetadata( records.get( blob ) ) )
                 
                 # remove download directory
                 shutil.rmtree( args.download_path )
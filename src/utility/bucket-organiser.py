@@ -1,35 +1,76 @@
 import os
+import argparse
 
 from spot import Spot
 from pleiades import Pleiades
 from src.utility.gsclient import GsClient
 
-GsClient.updateCredentials( 'C:\\Users\\Chris.Williams\\.gcs\\gla001-232b82940cbf.json' )
-client = GsClient( 'gla-datastore001' )
 
-"""
-blob_names = client.getBlobNameList( 'pleiades', [ '.zip' ] )
-root_path = 'ssgp/raw'
+def getRelocationPairs( client, prefix, product, root_path ):
 
-for name in blob_names:
+    """
+    get ( src, dst ) pairs and listing records for zips under prefix
+    """
 
-    obj = Pleiades( name )    
+    # single listing supplies names, sizes and generations
+    records = [ record for record in client.getBlobRecords( prefix ) if record[ 'name' ].endswith( '.zip' ) ]
 
-    path = os.path.join ( root_path, obj.getSubPath() )
-    pathname = os.path.join ( path, os.path.basename( name ) )
+    pairs = []
+    for record in records:
 
-    blob = client.moveBlob( name, dst_name=pathname )
-"""
+        obj = product( record[ 'name' ] )
 
-blob_names = client.getBlobNameList( 'spot', [ '.zip' ] )
-root_path = 'ssgp/raw'
+        path = os.path.join ( root_path, obj.getSubPath() )
+        pairs.append( ( record[ 'name' ], os.path.join ( path, os.path.basename( record[ 'name' ] ) ) ) )
 
-for name in blob_names:
+    return pairs, records
 
-    obj = Spot( name )    
 
-    path = os.path.join ( root_path, obj.getSubPath() )
-    pathname = os.path.join ( path, os.path.basename( name ) )
+def parseArguments(args=None):
 
-    blob = client.moveBlob( name, dst_name=pathname )
+    """
+    parse command line arguments
+    """
 
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='bucket-organiser')
+    parser.add_argument('-products', nargs='+', default=[ 'spot' ], choices=[ 'spot', 'pleiades' ] )
+    parser.add_argument('-root_path', default='ssgp/raw', action="store" )
+    parser.add_argument('-checkpoint', default=None, action="store", help='resume file - no checkpoint by default' )
+    parser.add_argument('-workers', default=16, action="store", type=int )
+    parser.add_argument('-dry_run', default=False, action="store_true" )
+
+    return parser.parse_args(args)
+
+
+def main():
+
+    """
+    main path of execution
+    """
+
+    # parse arguments
+    args = parseArguments()
+
+    client = GsClient.getClient( 'gla-datastore001', credentials='C:\\Users\\Chris.Williams\\.gcs\\gla001-232b82940cbf.json' )
+
+    products = { 'spot' : Spot, 'pleiades' : Pleiades }
+    for name in args.products:
+
+        # server-side relocation - resumes from checkpoint
+        pairs, records = getRelocationPairs( client, name, products[ name ], args.root_path )
+        plan = client.relocateBlobs( pairs,
+                                        records=records,
+                                        dry_run=args.dry_run,
+                                        checkpoint=args.checkpoint,
+                                        workers=args.workers )
+
+        failures = [ entry for entry in plan if entry[ 'status' ] == 'failed' ]
+        print ( '{}: {} objects, {} failed'.format( name, len( plan ), len( failures ) ) )
+
+    return
+
+
+# execute main
+if __name__ == '__main__':
+    main()
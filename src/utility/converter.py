@@ -0,0 +1,233 @@
+import os
+import time
+import yaml
+import gdal
+import random
+import argparse
+import tempfile
+import numpy as np
+
+
+# default cog encoding profiles - overridden by -profiles yaml or repository yaml cog-profiles section
+profiles = {    'pan' : {   'BIGTIFF' : 'YES',
+                            'COMPRESS' : 'DEFLATE',
+                            'PREDICTOR' : 'YES',
+                            'LEVEL' : 6,
+                            'BLOCKSIZE' : 512,
+                            'OVERVIEW_RESAMPLING' : 'AVERAGE',
+                            'NUM_THREADS' : 'ALL_CPUS',
+                            'GDAL_CACHEMAX' : 1024 },
+
+                'ms' : {    'BIGTIFF' : 'YES',
+                            'COMPRESS' : 'DEFLATE',
+                            'PREDICTOR' : 'YES',
+                            'LEVEL' : 6,
+                            'BLOCKSIZE' : 512,
+                            'OVERVIEW_RESAMPLING' : 'AVERAGE',
+                            'NUM_THREADS' : 'ALL_CPUS',
+                            'GDAL_CACHEMAX' : 1024 },
+
+                'wms' : {   'BIGTIFF' : 'YES',
+                            'COMPRESS' : 'JPEG',
+                            'QUALITY' : 85,
+                            'BLOCKSIZE' : 256,
+                            'OVERVIEW_RESAMPLING' : 'AVERAGE',
+                            'NUM_THREADS' : 'ALL_CPUS',
+                            'GDAL_CACHEMAX' : 512 } }
+
+
+def getProfiles( obj=None ):
+
+    """
+    get named cog profiles - obj is profiles dict or pathname of repository / profiles yaml
+    """
+
+    # load yaml file - repository section optional
+    if isinstance( obj, str ):
+        with open( obj, 'r' ) as f:
+            obj = yaml.safe_load( f )
+
+        if 'repository' in obj:
+            obj = obj[ 'repository' ].get( 'cog-profiles', {} )
+        elif 'cog-profiles' in obj:
+            obj = obj[ 'cog-profiles' ]
+
+    # merge overrides onto defaults - new profile names allowed
+    result = { name : dict( options ) for name, options in profiles.items() }
+    for name, options in ( obj or {} ).items():
+        result.setdefault( name, {} ).update( options )
+
+    return result
+
+
+def setCacheMax( profiles ):
+
+    """
+    size process-wide gdal block cache once for largest GDAL_CACHEMAX in mb of profiles
+    """
+
+    sizes = [ int( profile[ 'GDAL_CACHEMAX' ] ) for profile in profiles.values() if 'GDAL_CACHEMAX' in profile ]
+    if len( sizes ) > 0:
+        gdal.SetCacheMax( max( sizes ) * 1024 * 1024 )
+
+    return
+
+
+def getCreationOptions( profile ):
+
+    """
+    get gdal creation options from profile - gdal config options excluded
+    """
+
+    return [ '{}={}'.format( key, value ) for key, value in profile.items() if not key.startswith( 'GDAL_' ) ]
+
+
+def convertToCog( pathname, out_pathname, profile ):
+
+    """
+    convert image to COG with gdal translate functionality - profile dict or creation option list
+    """
+
+    # legacy creation option list
+    if isinstance( profile, ( list, tuple ) ):
+        profile = dict( option.split( '=', 1 ) for option in profile )
+
+    # open existing image
+    src_ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+    if src_ds is not None:
+
+        # create out path if required - not for gdal virtual file systems
+        out_path = os.path.dirname( out_pathname )
+        if not out_pathname.startswith( '/vsi' ) and not os.path.exists( out_path ):
+            os.makedirs( out_path )
+
+        # gdal keys applied to calling thread only - block cache sized once by setCacheMax
+        config = { key : str( value ) for key, value in profile.items() if key.startswith( 'GDAL_' ) and key != 'GDAL_CACHEMAX' }
+        previous = { key : gdal.GetThreadLocalConfigOption( key, None ) for key in config }
+        for key, value in config.items():
+            gdal.SetThreadLocalConfigOption( key, value )
+
+        try:
+            # execute translation - report error to log
+            gdal.Translate( out_pathname, src_ds, format='COG', creationOptions=getCreationOptions( profile ) )
+
+        finally:
+            for key, value in previous.items():
+                gdal.SetThreadLocalConfigOption( key, value )
+
+    return
+
+
+def getTileLatency( pathname, samples=64, level=None ):
+
+    """
+    get read latencies in milliseconds of random whole tiles - full resolution or overview level
+    """
+
+    ds = gdal.Open( pathname, gdal.GA_ReadOnly )
+    bands = [ ds.GetRasterBand( idx ) for idx in range( 1, ds.RasterCount + 1 ) ]
+
+    # overview bands - none when level not generated
+    if level is not None:
+        if bands[ 0 ].GetOverviewCount() <= level:
+            return []
+        bands = [ band.GetOverview( level ) for band in bands ]
+
+    # distinct tiles - block cache never serves repeat reads
+    block_x, block_y = bands[ 0 ].GetBlockSize()
+    width = bands[ 0 ].XSize; height = bands[ 0 ].YSize
+
+    tiles = [ ( x, y ) for y in range( 0, height, block_y ) for x in range( 0, width, block_x ) ]
+    tiles = random.sample( tiles, min( samples, len( tiles ) ) )
+
+    latencies = []
+    for x, y in tiles:
+
+        # read tile across all bands
+        start = time.perf_counter()
+        for band in bands:
+            band.ReadRaster( x, y, min( block_x, width - x ), min( block_y, height - y ) )
+
+        latencies.append( ( time.perf_counter() - start ) * 1000.0 )
+
+    return latencies
+
+
+def benchmarkProfiles( pathname, profiles, out_path, samples=64 ):
+
+    """
+    report encode time, output size and tile read latency per profile
+    """
+
+    results = []
+    for name, profile in profiles.items():
+
+        out_pathname = os.path.join( out_path, '{}.tif'.format( name ) )
+
+        # encode - serial so block cache sized per profile
+        setCacheMax( { name : profile } )
+        start = time.perf_counter()
+        convertToCog( pathname, out_pathname, profile )
+        encode = time.perf_counter() - start
+
+        # full resolution and first overview tile reads
+        latencies = getTileLatency( out_pathname, samples=samples )
+        overview = getTileLatency( out_pathname, samples=samples, level=0 )
+
+        results.append( {   'profile' : name,
+                            'encode_s' : encode,
+                            'size_mb' : os.path.getsize( out_pathname ) / ( 1024 * 1024 ),
+                            'tile_ms' : float( np.mean( latencies ) ),
+                            'tile_p95_ms' : float( np.percentile( latencies, 95 ) ),
+                            'overview_ms' : float( np.mean( overview ) ) if len( overview ) > 0 else float( 'nan' ) } )
+
+        os.remove( out_pathname )
+
+    return results
+
+
+def parseArguments(args=None):
+
+    """
+    parse command line arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='cog-benchmark')
+    parser.add_argument( 'pathname', action="store" )
+    parser.add_argument('-profiles', default=None, action="store", help='repository or profiles yaml' )
+    parser.add_argument('-names', nargs='+', default=None, help='profile names - all by default' )
+    parser.add_argument('-samples', default=64, action="store", type=int )
+    parser.add_argument('-out_path', default=None, action="store" )
+
+    return parser.parse_args(args)
+
+
+def main():
+
+    """
+    main path of execution
+    """
+
+    # parse arguments
+    args = parseArguments()
+
+    # select named profiles
+    obj = getProfiles( args.profiles )
+    if args.names is not None:
+        obj = { name : obj[ name ] for name in args.names }
+
+    out_path = args.out_path if args.out_path is not None else tempfile.mkdtemp()
+    results = benchmarkProfiles( args.pathname, obj, out_path, samples=args.samples )
+
+    # report table
+    print ( '{:<12}{:>12}{:>12}{:>12}{:>14}{:>14}'.format( 'profile', 'encode (s)', 'size (MB)', 'tile (ms)', 'tile p95 (ms)', 'overview (ms)' ) )
+    for result in results:
+        print ( '{profile:<12}{encode_s:>12.2f}{size_mb:>12.1f}{tile_ms:>12.2f}{tile_p95_ms:>14.2f}{overview_ms:>14.2f}'.format( **result ) )
+
+    return
+
+
+# execute main
+if __name__ == '__main__':
+    main()
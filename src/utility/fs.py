@@ -1,61 +1,173 @@
 import os
 import re
 import fnmatch
+import itertools
+import threading
 
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 
-def getPathNameList ( path, pattern ):
+
+def scanTree ( path, threads=8, prefix=None ):
 
     """
-    apply regexp to filter file list
+    lazily yield ( directory, file names ) - directories scanned concurrently with os.scandir
     """
 
-    # get pattern matched file list
-    result = []
-    for root, dirs, files in os.walk(path):
-                
+    queue = Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [ 1 ]
+
+    def keep( directory ):
+
+        """
+        prune directories unable to contain prefix
+        """
+
+        return prefix is None or directory.startswith( prefix ) or prefix.startswith( directory + os.sep )
+
+    def scan( directory ):
+
+        """
+        list directory - submit sub-directories to pool
+        """
+
+        try:
+            if not stop.is_set():
+
+                files = []; subdirs = []
+                with os.scandir( directory ) as entries:
+                    for entry in entries:
+
+                        # symlinked directories neither followed nor reported as files - as os.walk
+                        # files of ancestor directories of prefix only reported when under prefix
+                        if entry.is_dir():
+                            if not entry.is_symlink() and keep( entry.path ):
+                                subdirs.append( entry.path )
+                        elif prefix is None or entry.path.startswith( prefix ):
+                            files.append( entry.name )
+
+                queue.put( ( directory, files ) )
+
+                # count children before releasing parent
+                with lock:
+                    pending[ 0 ] += len( subdirs )
+
+                for subdir in subdirs:
+                    executor.submit( scan, subdir )
+
+        # unreadable directories skipped - as os.walk
+        except OSError:
+            pass
+
+        finally:
+            with lock:
+                pending[ 0 ] -= 1
+                if pending[ 0 ] == 0:
+                    queue.put( None )
+
+        return
+
+    executor = ThreadPoolExecutor( max_workers=threads )
+    executor.submit( scan, path )
+
+    try:
+        # yield directories as scanned until traversal complete
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+
+            yield item
+
+    finally:
+        # early exit - abandon outstanding scans
+        stop.set()
+        executor.shutdown( wait=False, cancel_futures=True )
+
+    return
+
+
+def iterPathNames ( path, pattern, threads=8, prefix=None ):
+
+    """
+    lazily yield pathnames matching regexp
+    """
+
+    # compile pattern once
+    regex = re.compile( pattern )
+    for root, files in scanTree( path, threads=threads, prefix=prefix ):
         for name in files:
 
             pathname = os.path.join( root, name )
-            x = re.search( pattern, pathname )
+            if regex.search( pathname ) is not None:
+                yield pathname
 
-            if x is not None:
-                result.append( os.path.join(root, name) )
+    return
 
-    return result
 
+def iterFiles ( path, pattern, threads=8, prefix=None ):
+
+    """
+    lazily yield pathnames whose file name matches regexp
+    """
+
+    # compile pattern once
+    regex = re.compile( pattern )
+    for root, files in scanTree( path, threads=threads, prefix=prefix ):
+        for name in files:
+
+            if regex.search( name ) is not None:
+                yield os.path.join( root, name )
+
+    return
+
+
+def iterPaths ( path, pattern, threads=8, prefix=None ):
+
+    """
+    lazily yield directories matching regexp
+    """
+
+    # compile pattern once
+    regex = re.compile( pattern )
+    for root, files in scanTree( path, threads=threads, prefix=prefix ):
+
+        if regex.search( root ) is not None:
+            yield root
+
+    return
 
-def getFileList ( path, pattern ):
+
+def getPathNameList ( path, pattern, threads=8, prefix=None ):
 
     """
     apply regexp to filter file list
     """
 
     # get pattern matched file list
-    result = []
-    for root, dirs, files in os.walk(path):
-        for name in files:
-            x = re.search( pattern, name )
-            if x is not None:                
-                result.append( os.path.join(root, name) )
+    return list( iterPathNames( path, pattern, threads=threads, prefix=prefix ) )
 
-    return result
 
+def getFileList ( path, pattern, threads=8, prefix=None ):
 
-def getPathList ( path, pattern ):
+    """
+    apply regexp to filter file list
+    """
+
+    # get pattern matched file list
+    return list( iterFiles( path, pattern, threads=threads, prefix=prefix ) )
+
+
+def getPathList ( path, pattern, threads=8, prefix=None ):
 
     """
     apply regexp to filter path list
     """
 
     # get pattern matched sub-folder list
-    result = []
-    for root, dirs, files in os.walk(path):
-
-        x = re.search( pattern, root )
-        if x is not None:
-            result.append( root )
-
-    return result
+    return list( iterPaths( path, pattern, threads=threads, prefix=prefix ) )
 
 
 def getFile ( path, pattern ):
@@ -64,9 +176,9 @@ def getFile ( path, pattern ):
     validate single file satisfies reg exp
     """
 
-    # get uniquely named file in path
+    # stop traversal once second match found
     result = None
-    filelist = getFileList( path, pattern )
+    filelist = list( itertools.islice( iterFiles( path, pattern ), 2 ) )
 
     if len ( filelist ) == 1:
         result = filelist[ 0 ]
@@ -80,9 +192,9 @@ def getPath ( path, pattern ):
     validate single path satisfies reg exp
     """
 
-    # get uniquely named file in path
+    # stop traversal once second match found
     result = None
-    pathlist = getPathList( path, pattern )
+    pathlist = list( itertools.islice( iterPaths( path, pattern ), 2 ) )
 
     if len ( pathlist ) == 1:
         result = pathlist[ 0 ]
@@ -0,0 +1,238 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utility.gsclient import GsClient
+from src.utility.pipeline import Pipeline
+
+
+def timeIt( function, *args, **kwargs ):
+
+    """
+    execute function - return elapsed seconds and result
+    """
+
+    start = time.perf_counter()
+    result = function( *args, **kwargs )
+
+    return time.perf_counter() - start, result
+
+
+def populate( client, prefix, count, size, folders=10, threads=8 ):
+
+    """
+    upload synthetic objects spread across tle-like sub-prefixes
+    """
+
+    def upload( idx ):
+
+        # deterministic payload per object
+        data = hashlib.sha256( str( idx ).encode() ).digest() * ( size // 32 + 1 )
+        name = '{}/{}/object_{:06d}.TIF'.format( prefix, 100 + ( idx % folders ), idx )
+
+        client.uploadStream( io.BytesIO( data[ : size ] ), name, size=size )
+        return name
+
+    with ThreadPoolExecutor( max_workers=threads ) as executor:
+        names = list( executor.map( upload, range( count ) ) )
+
+    return names
+
+
+def benchmarkListing( client, prefix, threads ):
+
+    """
+    measure listing throughput - serial and concurrent sub-prefix listing
+    """
+
+    results = {}
+
+    for count in [ 1, threads ]:
+        elapsed, names = timeIt( lambda: list( client.iterBlobNames( prefix, threads=count ) ) )
+        results[ 'list_names_{}t'.format( count ) ] = ( len( names ) / elapsed, 'objects/s' )
+
+    elapsed, records = timeIt( client.getBlobRecords, prefix, threads=threads )
+    results[ 'list_records' ] = ( len( records ) / elapsed, 'objects/s' )
+
+    elapsed, uris = timeIt( client.getImageUriList, prefix, pattern='.*TIF$' )
+    results[ 'image_uri_list' ] = ( len( uris ) / elapsed, 'objects/s' )
+
+    return results
+
+
+def benchmarkTransfer( client, parallel, prefix, scratch, size ):
+
+    """
+    measure upload and download throughput - single stream and parallel parts
+    """
+
+    results = {}
+
+    # local source file
+    pathname = os.path.join( scratch, 'transfer.bin' )
+    with open( pathname, 'wb' ) as fp:
+        for idx in range( 0, size, 1024 * 1024 ):
+            fp.write( os.urandom( min( 1024 * 1024, size - idx ) ) )
+
+    mb = size / ( 1024 * 1024 )
+    for name, obj in [ ( 'single', client ), ( 'parallel', parallel ) ]:
+
+        elapsed, url = timeIt( obj.uploadFile, pathname, prefix='{}/{}'.format( prefix, name ), flatten=True )
+        results[ 'upload_{}'.format( name ) ] = ( mb / elapsed, 'MB/s' )
+
+        out_path = os.path.join( scratch, name )
+        elapsed, out_pathname = timeIt( obj.downloadBlob, '{}/{}/transfer.bin'.format( prefix, name ), out_path, flatten=True, overwrite=True )
+        results[ 'download_{}'.format( name ) ] = ( mb / elapsed, 'MB/s' )
+
+    os.remove( pathname )
+    return results
+
+
+def benchmarkRelocate( client, names, prefix, threads ):
+
+    """
+    measure server-side bulk copy and move throughput
+    """
+
+    results = {}
+
+    # copy then move copies to second prefix
+    pairs = [ ( name, '{}/copy/{}'.format( prefix, os.path.basename( name ) ) ) for name in names ]
+    elapsed, plan = timeIt( client.relocateBlobs, pairs, copy=True, workers=threads )
+    results[ 'relocate_copy' ] = ( len( plan ) / elapsed, 'objects/s' )
+
+    pairs = [ ( dst, '{}/move/{}'.format( prefix, os.path.basename( dst ) ) ) for src, dst in pairs ]
+    elapsed, plan = timeIt( client.relocateBlobs, pairs, workers=threads )
+    results[ 'relocate_move' ] = ( len( plan ) / elapsed, 'objects/s' )
+
+    return results
+
+
+def benchmarkPipeline( client, names, prefix, scratch, threads ):
+
+    """
+    measure staged download, process and upload throughput
+    """
+
+    def download( item ):
+        item[ 'pathname' ] = client.downloadBlob( item[ 'blob' ], scratch, overwrite=True )
+        return item
+
+    def process( item ):
+
+        # checksum stands in for conversion cpu work
+        with open( item[ 'pathname' ], 'rb' ) as fp:
+            item[ 'digest' ] = hashlib.sha256( fp.read() ).hexdigest()
+        return item
+
+    def upload( item ):
+        client.uploadFile( item[ 'pathname' ], prefix='{}/pipeline'.format( prefix ), flatten=True )
+        os.remove( item[ 'pathname' ] )
+        return item
+
+    pipeline = Pipeline( [ ( 'download', download, threads ), ( 'process', process, 2 ), ( 'upload', upload, threads ) ] )
+    elapsed, result = timeIt( pipeline.run, ( { 'blob' : name } for name in names ) )
+
+    completed, failures = result
+    return { 'pipeline' : ( len( completed ) / elapsed, 'objects/s' ) }
+
+
+def compareBaseline( results, pathname, tolerance ):
+
+    """
+    report metrics slower than baseline by more than tolerance
+    """
+
+    with open( pathname ) as fp:
+        baseline = json.load( fp )
+
+    regressions = []
+    for key, ( value, unit ) in results.items():
+        if key in baseline and value < baseline[ key ][ 0 ] * ( 1.0 - tolerance ):
+            regressions.append( key )
+            print ( 'REGRESSION {}: {:.1f} {} (baseline {:.1f})'.format( key, value, unit, baseline[ key ][ 0 ] ) )
+
+    return regressions
+
+
+def parseArguments(args=None):
+
+    """
+    parse command line arguments
+    """
+
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description='gsclient-benchmark')
+    parser.add_argument('-endpoint', default=None, action="store", help='local directory or emulator url - temporary directory by default' )
+    parser.add_argument('-bucket', default='gla-datastore001', action="store" )
+    parser.add_argument('-prefix', default='benchmark', action="store" )
+    parser.add_argument('-objects', default=2000, action="store", type=int )
+    parser.add_argument('-object_kb', default=64, action="store", type=int )
+    parser.add_argument('-transfer_mb', default=256, action="store", type=int )
+    parser.add_argument('-threads', default=8, action="store", type=int )
+    parser.add_argument('-output', default=None, action="store" )
+    parser.add_argument('-baseline', default=None, action="store" )
+    parser.add_argument('-tolerance', default=0.2, action="store", type=float )
+
+    return parser.parse_args(args)
+
+
+def main():
+
+    """
+    main path of execution
+    """
+
+    # parse arguments
+    args = parseArguments()
+
+    # temporary local bucket unless endpoint given
+    scratch = tempfile.mkdtemp()
+    endpoint = args.endpoint if args.endpoint is not None else os.path.join( scratch, 'storage' )
+    if not endpoint.startswith( ( 'http://', 'https://' ) ):
+        os.makedirs( os.path.join( endpoint, args.bucket ), exist_ok=True )
+
+    # default and low threshold clients - parts sized so transfer splits across workers
+    client = GsClient( args.bucket, endpoint=endpoint, parallel_threshold=sys.maxsize )
+    parallel = GsClient( args.bucket, endpoint=endpoint, parallel_threshold=0, part_size=max( 1, args.transfer_mb // args.threads ) * 1024 * 1024, transfer_workers=args.threads )
+
+    try:
+        results = {}
+
+        print ( 'populating: {} objects'.format( args.objects ) )
+        names = populate( client, '{}/ard'.format( args.prefix ), args.objects, args.object_kb * 1024, threads=args.threads )
+
+        results.update( benchmarkListing( client, '{}/ard'.format( args.prefix ), args.threads ) )
+        results.update( benchmarkTransfer( client, parallel, '{}/transfer'.format( args.prefix ), scratch, args.transfer_mb * 1024 * 1024 ) )
+        results.update( benchmarkPipeline( client, names, args.prefix, os.path.join( scratch, 'pipeline' ), args.threads ) )
+        results.update( benchmarkRelocate( client, names, args.prefix, args.threads ) )
+
+        for key, ( value, unit ) in results.items():
+            print ( '{}: {:.1f} {}'.format( key, value, unit ) )
+
+        # save results as baseline for later runs
+        if args.output is not None:
+            with open( args.output, 'w' ) as fp:
+                json.dump( results, fp, indent=4 )
+
+        # non-zero exit on regression
+        if args.baseline is not None and len( compareBaseline( results, args.baseline, args.tolerance ) ) > 0:
+            sys.exit( 1 )
+
+    finally:
+        shutil.rmtree( scratch, ignore_errors=True )
+
+    return
+
+
+# execute main
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,295 @@
 import os
 import re
+import json
+import time
+import base64
+import hashlib
+import sqlite3
+import posixpath
+import threading
+import requests
 
 from pathlib import Path
+from queue import Queue, Full
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import google_crc32c
+
 from google.cloud import storage
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from google.auth.credentials import AnonymousCredentials
+
+from src.utility.localstorage import LocalClient, LocalBucket, compileGlob
+
+
+class ListingCache:
+
+    def __init__( self, pathname=None, ttl=3600 ):
+
+        """
+        constructor - sqlite store of blob listings keyed on bucket + prefix
+        """
+
+        # default cache location in user home
+        if pathname is None:
+            pathname = os.path.join( os.path.expanduser( '~' ), '.gla', 'gscache.db' )
+
+        if not os.path.exists( os.path.dirname( pathname ) ):
+            os.makedirs( os.path.dirname( pathname ) )
+
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect( pathname, check_same_thread=False )
+
+        # create tables
+        with self._lock, self._conn:
+            self._conn.execute( 'CREATE TABLE IF NOT EXISTS prefixes ( bucket TEXT, prefix TEXT, refreshed REAL, PRIMARY KEY ( bucket, prefix ) )' )
+            self._conn.execute( 'CREATE TABLE IF NOT EXISTS blobs ( bucket TEXT, prefix TEXT, name TEXT, size INTEGER, generation INTEGER, md5 TEXT, updated TEXT, source TEXT, PRIMARY KEY ( bucket, prefix, name ) )' )
+
+            # add source column to caches created by earlier versions
+            columns = [ row[ 1 ] for row in self._conn.execute( 'PRAGMA table_info( blobs )' ).fetchall() ]
+            if 'source' not in columns:
+                self._conn.execute( 'ALTER TABLE blobs ADD COLUMN source TEXT' )
+
+        return
+
+
+    def getCoveringPrefix( self, bucket, prefix ):
+
+        """
+        get longest unexpired cached prefix containing requested prefix
+        """
+
+        with self._lock:
+            rows = self._conn.execute( 'SELECT prefix, refreshed FROM prefixes WHERE bucket = ?', ( bucket, ) ).fetchall()
+
+        covering = None
+        for cached, refreshed in rows:
+
+            # entries expire by ttl
+            if prefix.startswith( cached ) and time.time() - refreshed < self._ttl:
+                if covering is None or len( cached ) > len( covering ):
+                    covering = cached
+
+        return covering
+
+
+    def getBlobs( self, bucket, prefix ):
+
+        """
+        get cached blob records under prefix - none when missing or expired
+        """
+
+        covering = self.getCoveringPrefix( bucket, prefix )
+        if covering is None:
+            return None
+
+        # select records of covering listing under requested prefix
+        with self._lock:
+            rows = self._conn.execute( """
+                                        SELECT name, size, generation, md5, updated, source FROM blobs 
+                                            WHERE bucket = ? AND prefix = ? AND substr( name, 1, ? ) = ? ORDER BY name
+                                        """, ( bucket, covering, len( prefix ), prefix ) ).fetchall()
+
+        return [ { 'name' : row[ 0 ], 'size' : row[ 1 ], 'generation' : row[ 2 ], 'md5' : row[ 3 ], 'updated' : row[ 4 ], 'source' : row[ 5 ] } for row in rows ]
+
+
+    def refresh( self, bucket, prefix, records ):
+
+        """
+        incrementally update cached listing - only new or changed generations written
+        """
+
+        with self._lock:
+            existing = dict( self._conn.execute( 'SELECT name, generation FROM blobs WHERE bucket = ? AND prefix = ?', ( bucket, prefix ) ).fetchall() )
+
+        # diff listing against cache on generation
+        upserts = []; names = set()
+        for record in records:
+
+            names.add( record[ 'name' ] )
+            if existing.get( record[ 'name' ] ) != record[ 'generation' ]:
+                upserts.append( ( bucket, prefix, record[ 'name' ], record[ 'size' ], record[ 'generation' ], record[ 'md5' ], record[ 'updated' ], record[ 'source' ] ) )
+
+        deletes = [ ( bucket, prefix, name ) for name in existing if name not in names ]
+
+        # apply changes in single transaction
+        with self._lock, self._conn:
+            self._conn.executemany( 'INSERT OR REPLACE INTO blobs ( bucket, prefix, name, size, generation, md5, updated, source ) VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )', upserts )
+            self._conn.executemany( 'DELETE FROM blobs WHERE bucket = ? AND prefix = ? AND name = ?', deletes )
+            self._conn.execute( 'INSERT OR REPLACE INTO prefixes VALUES ( ?, ?, ? )', ( bucket, prefix, time.time() ) )
+
+        return len( upserts ), len( deletes )
+
+
+    def invalidate( self, bucket, names ):
+
+        """
+        expire cached prefixes covering written or deleted blob names
+        """
+
+        with self._lock:
+            rows = self._conn.execute( 'SELECT prefix FROM prefixes WHERE bucket = ?', ( bucket, ) ).fetchall()
+
+        # records retained - next refresh diffs against them
+        stale = [ ( bucket, row[ 0 ] ) for row in rows if any( name.startswith( row[ 0 ] ) for name in names ) ]
+        with self._lock, self._conn:
+            self._conn.executemany( 'UPDATE prefixes SET refreshed = 0 WHERE bucket = ? AND prefix = ?', stale )
+
+        return len( stale )
+
+
+class ChainReader:
+
+
+    def __init__( self, head, fp, tail ):
+
+        """
+        constructor - sequential reader over head bytes, file-like body and tail bytes
+        """
+
+        self._parts = [ head, fp, tail ]
+        self._position = 0
+        return
+
+
+    def read( self, size=-1 ):
+
+        """
+        read across parts in order
+        """
+
+        chunks = []
+        while len( self._parts ) > 0 and ( size < 0 or size > 0 ):
+
+            part = self._parts[ 0 ]
+            if isinstance( part, bytes ):
+                chunk = part if size < 0 else part[ : size ]
+                self._parts[ 0 ] = part[ len( chunk ) : ]
+                exhausted = len( self._parts[ 0 ] ) == 0
+            else:
+                chunk = part.read( size )
+                exhausted = len( chunk ) == 0 or size < 0
+
+            if exhausted:
+                self._parts.pop( 0 )
+
+            chunks.append( chunk )
+            if size > 0:
+                size -= len( chunk )
+
+        data = b''.join( chunks )
+        self._position += len( data )
+        return data
+
+
+    def tell( self ):
+
+        """
+        get bytes read
+        """
+
+        return self._position
+
 
 class GsClient:
 
-    def __init__( self, name, chunk_size=None ):
+    # per-process registries - storage clients keyed on credentials, gs clients on credentials and bucket
+    _storage_clients = {}
+    _clients = {}
+    _lock = threading.RLock()
+
+    def __init__( self, name, chunk_size=None, cache_ttl=None, cache_pathname=None, 
+                    part_size=32 * 1024 * 1024, parallel_threshold=128 * 1024 * 1024, transfer_workers=8, credentials=None, endpoint=None ):
 
         """
         constructor
         """
 
-        # initialise sdk attributes
+        # initialise sdk attributes - bucket handle created lazily without metadata round trip
         self._name = name
-        self._client = storage.Client()
-        self._bucket = self._client.get_bucket( name )
+        self._client = GsClient.getStorageClient( credentials, endpoint=endpoint )
+        self._bucket = self._client.bucket( name )
+
+        # optional persistent listing cache
+        self._cache = None
+        if cache_ttl is not None:
+            self._cache = ListingCache( cache_pathname, ttl=cache_ttl )
 
-        # set default chunk size
-        if chunk_size is not None:
-            storage.blob._DEFAULT_CHUNKSIZE = chunk_size 
-            storage.blob._MAX_MULTIPART_SIZE = chunk_size 
+        # per-client transfer settings - chunk size applied to each blob, not module globals
+        self._chunk_size = chunk_size
+        self._part_size = part_size
+        self._parallel_threshold = parallel_threshold
+        self._transfer_workers = transfer_workers
 
         return
 
+    @staticmethod
+    def getStorageClient( credentials=None, endpoint=None, pool_size=32 ):
+
+        """
+        get shared storage client for credentials - one authorised session per process
+        """
+
+        # key on process id - sessions are not shared across forked workers
+        key = ( os.getpid(), credentials, endpoint )
+        with GsClient._lock:
+
+            if key not in GsClient._storage_clients:
+
+                # local directory stand-in - buckets are sub-directories
+                if endpoint is not None and not endpoint.startswith( ( 'http://', 'https://' ) ):
+                    client = LocalClient( endpoint[ len( 'file://' ) : ] if endpoint.startswith( 'file://' ) else endpoint )
+
+                else:
+
+                    # fake-gcs-server compatible emulator - anonymous access
+                    if endpoint is not None:
+                        client = storage.Client( project='local', credentials=AnonymousCredentials(), client_options={ 'api_endpoint' : endpoint } )
+
+                    # explicit service account key - otherwise default credentials
+                    elif credentials is not None:
+                        client = storage.Client.from_service_account_json( credentials )
+                    else:
+                        client = storage.Client()
+
+                    # size connection pool for concurrent listing and transfer threads
+                    adapter = requests.adapters.HTTPAdapter( pool_connections=pool_size, pool_maxsize=pool_size )
+                    for scheme in [ 'http://', 'https://' ]:
+                        client._http.mount( scheme, adapter )
+
+                GsClient._storage_clients[ key ] = client
+
+            return GsClient._storage_clients[ key ]
+
+
+    @staticmethod
+    def getClient( name, credentials=None, **kwargs ):
+
+        """
+        get cached client for credentials, bucket and settings - created on first request
+        """
+
+        key = ( os.getpid(), credentials, name, tuple( sorted( kwargs.items() ) ) )
+        with GsClient._lock:
+
+            if key not in GsClient._clients:
+                GsClient._clients[ key ] = GsClient( name, credentials=credentials, **kwargs )
+
+            return GsClient._clients[ key ]
+
+
     @staticmethod
     def updateCredentials( pathname ):
 
         """
-        update environmental variable
+        update environmental variable - only required by gdal /vsigs/ and subprocess readers
         """
 
-        # add credentials to environment
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"]=pathname
+        # add credentials to environment when changed
+        if os.environ.get( "GOOGLE_APPLICATION_CREDENTIALS" ) != pathname:
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"]=pathname
+
         return
 
 
@@ -74,7 +331,7 @@ class GsClient:
         return bucket, prefix        
 
 
-    def uploadFile( self, pathname, prefix=None, flatten=False ):
+    def uploadFile( self, pathname, prefix=None, flatten=False, metadata=None ):
 
         """
         update environmental variable
@@ -97,13 +354,290 @@ class GsClient:
             if prefix is not None:
                 blob_name = '{}/{}'.format( prefix, blob_name )
 
+        # large files uploaded as parallel composite
+        if os.path.getsize( pathname ) >= self._parallel_threshold:
+            url = self.uploadParallel( pathname, blob_name.lstrip('/'), metadata=metadata )
+
+        else:
+
+            # create blob in cloud
+            blob = self._bucket.blob( blob_name.lstrip('/'), chunk_size=self._chunk_size )
+            blob.metadata = metadata
+            blob.upload_from_filename( pathname )
+            url = blob.public_url
+
+        self.invalidateCache( [ blob_name.lstrip('/') ] )
+        return url
+
+
+    def invalidateCache( self, names, bucket=None ):
+
+        """
+        expire cached listings covering blobs written or deleted by this client
+        """
+
+        if self._cache is not None and len( names ) > 0:
+            self._cache.invalidate( bucket if bucket is not None else self._name, names )
+
+        return
+
+
+    @staticmethod
+    def getCrc32c( data=None, pathname=None, chunk_size=8 * 1024 * 1024 ):
+
+        """
+        get base64 crc32c of bytes or file - gcs checksum format
+        """
+
+        checksum = google_crc32c.Checksum()
+        if data is not None:
+            checksum.update( data )
+
+        # stream file in chunks
+        if pathname is not None:
+            with open( pathname, 'rb' ) as fp:
+                for chunk in iter( lambda: fp.read( chunk_size ), b'' ):
+                    checksum.update( chunk )
+
+        return base64.b64encode( checksum.digest() ).decode()
+
+
+    @staticmethod
+    def getChecksums( pathname, chunk_size=8 * 1024 * 1024 ):
+
+        """
+        get base64 md5 and crc32c of file in single pass - gcs checksum format
+        """
+
+        md5 = hashlib.md5(); crc32c = google_crc32c.Checksum()
+        with open( pathname, 'rb' ) as fp:
+            for chunk in iter( lambda: fp.read( chunk_size ), b'' ):
+                md5.update( chunk ); crc32c.update( chunk )
+
+        return base64.b64encode( md5.digest() ).decode(), base64.b64encode( crc32c.digest() ).decode()
+
+
+    def getRanges( self, size ):
+
+        """
+        get inclusive byte ranges of transfer parts
+        """
+
+        return [ ( start, min( start + self._part_size, size ) - 1 ) for start in range( 0, size, self._part_size ) ]
+
+
+    def uploadParallel( self, pathname, blob_name, metadata=None ):
+
+        """
+        upload file as parallel parts composed into blob - parts already uploaded are reused on resume
+        """
+
+        size = os.path.getsize( pathname )
+        ranges = self.getRanges( size )
+
+        # hidden parts prefix keyed on file identity and destination - survives interruption, never under product listings
+        stat = os.stat( pathname )
+        key = hashlib.md5( '{}:{}:{}:{}'.format( os.path.abspath( pathname ), size, stat.st_mtime, blob_name ).encode() ).hexdigest()
+        parts_prefix = '.uploads/{}/'.format( key )
+
+        existing = { blob.name : blob for blob in self._bucket.list_blobs( prefix=parts_prefix ) }
+
+        def uploadPart( idx ):
+
+            """
+            upload single byte range as part object
+            """
+
+            start, end = ranges[ idx ]
+            with open( pathname, 'rb' ) as fp:
+                fp.seek( start )
+                data = fp.read( end - start + 1 )
+
+            # resume - skip part with matching checksum
+            name = '{}{:05d}'.format( parts_prefix, idx )
+            crc32c = self.getCrc32c( data )
+            if name in existing and existing[ name ].crc32c == crc32c:
+                return existing[ name ]
+
+            part = self._bucket.blob( name )
+            part.upload_from_string( data )
+            if part.crc32c != crc32c:
+                raise ValueError( 'Checksum mismatch: {}'.format( name ) )
+
+            return part
+
+        with ThreadPoolExecutor( max_workers=self._transfer_workers ) as executor:
+            parts = list( executor.map( uploadPart, range( len( ranges ) ) ) )
+
+        # compose limited to 32 sources - reduce in levels
+        intermediates = []; level = 0
+        while len( parts ) > 32:
+
+            groups = [ parts[ idx : idx + 32 ] for idx in range( 0, len( parts ), 32 ) ]
+            composed = []
+            for idx, group in enumerate( groups ):
+                blob = self._bucket.blob( '{}c{}_{:05d}'.format( parts_prefix, level, idx ) )
+                blob.compose( group )
+                composed.append( blob )
+
+            intermediates.extend( parts )
+            parts = composed; level += 1
+
+        # composite objects have no md5 hash - file md5 recorded in metadata for md5 comparisons
+        md5, crc32c = self.getChecksums( pathname )
+        blob = self._bucket.blob( blob_name )
+        blob.metadata = dict( metadata or {}, **{ 'md5' : md5 } )
+        blob.compose( parts )
+        intermediates.extend( parts )
+
+        # verify composed object against local file
+        blob.reload()
+        if blob.crc32c != crc32c:
+            raise ValueError( 'Checksum mismatch: {}'.format( blob_name ) )
+
+        # remove part objects in batched requests
+        self.deleteBlobs( [ part.name for part in intermediates ] )
+        return blob.public_url
+
+
+    def downloadParallel( self, blob, pathname ):
+
+        """
+        download blob as parallel byte ranges - completed ranges recorded for resume
+        """
+
+        ranges = self.getRanges( blob.size )
+        part_pathname = pathname + '.part'
+        state_pathname = pathname + '.part.json'
+
+        # resume only against same object generation
+        state = { 'generation' : blob.generation, 'done' : [] }
+        if os.path.exists( state_pathname ) and os.path.exists( part_pathname ):
+            with open( state_pathname ) as fp:
+                previous = json.load( fp )
+            if previous[ 'generation' ] == blob.generation:
+                state = previous
+
+        # preallocate output
+        if len( state[ 'done' ] ) == 0:
+            with open( part_pathname, 'wb' ) as fp:
+                fp.truncate( blob.size )
+
+        lock = threading.Lock()
+        def downloadPart( idx ):
+
+            """
+            download single byte range into place
+            """
+
+            start, end = ranges[ idx ]
+            data = blob.download_as_bytes( start=start, end=end )
+
+            with open( part_pathname, 'r+b' ) as fp:
+                fp.seek( start )
+                fp.write( data )
+
+            # record completed range
+            with lock:
+                state[ 'done' ].append( idx )
+                with open( state_pathname, 'w' ) as fp:
+                    json.dump( state, fp )
+
+            return
+
+        done = set( state[ 'done' ] )
+        with ThreadPoolExecutor( max_workers=self._transfer_workers ) as executor:
+            list( executor.map( downloadPart, [ idx for idx in range( len( ranges ) ) if idx not in done ] ) )
+
+        # verify checksum before exposing file
+        if blob.crc32c is not None and blob.crc32c != self.getCrc32c( pathname=part_pathname ):
+            os.remove( state_pathname )
+            raise ValueError( 'Checksum mismatch: {}'.format( blob.name ) )
+
+        os.replace( part_pathname, pathname )
+        os.remove( state_pathname )
+
+        return pathname
+
+
+    def deleteBlobs( self, names, batch_size=100, generations=None ):
+
+        """
+        delete blobs in batched requests - optional generations make deletes conditional
+        """
+
+        # gcs limits batch requests to 100 calls
+        batch_size = max( 1, min( batch_size, 100 ) )
+        generations = generations if generations is not None else {}
+        try:
+            for idx in range( 0, len( names ), batch_size ):
+                with self._client.batch():
+                    for name in names[ idx : idx + batch_size ]:
+                        self._bucket.blob( name ).delete( if_generation_match=generations.get( name ) )
+
+        # partial batches may have deleted blobs
+        finally:
+            self.invalidateCache( names )
+
+        return
+
+
+    def uploadStream( self, fp, blob_name, size=None, metadata=None ):
+
+        """
+        upload file-like object to blob - read sequentially without local copy
+        """
+
         # create blob in cloud
-        blob = self._bucket.blob( blob_name.lstrip('/') )
-        blob.upload_from_filename( pathname )
+        blob = self._bucket.blob( blob_name.lstrip('/'), chunk_size=self._chunk_size )
+        blob.metadata = metadata
+        blob.upload_from_file( fp, size=size, rewind=False )
 
+        self.invalidateCache( [ blob.name ] )
         return blob.public_url
 
 
+    def setMetadata( self, name, metadata ):
+
+        """
+        replace custom metadata of existing blob - objects written outside client, e.g. by gdal
+        """
+
+        blob = self._bucket.blob( name )
+        blob.metadata = metadata
+        blob.patch()
+
+        self.invalidateCache( [ name ] )
+        return
+
+
+    def readRange( self, name, offset, size ):
+
+        """
+        read byte range of blob
+        """
+
+        return self.getBlob( name ).download_as_bytes( start=offset, end=offset + size - 1 )
+
+
+    def patchBlob( self, name, head, tail=b'', dst_name=None, metadata=None ):
+
+        """
+        write blob as patched head bytes + remainder of original + tail - streamed without local copy
+        """
+
+        blob = self._bucket.get_blob( name )
+
+        # ranged streaming reader positioned after patched head
+        fp = blob.open( 'rb' )
+        fp.seek( len( head ) )
+
+        url = self.uploadStream( ChainReader( head, fp, tail ), dst_name if dst_name is not None else name, size=blob.size + len( tail ), metadata=metadata )
+        fp.close()
+
+        return url
+
+
     def downloadBlob( self, uri, out_path, flatten=False, overwrite=False ):
 
         """
@@ -112,9 +646,9 @@ class GsClient:
 
         pathname = None
 
-        # grab blob
-        blob = storage.blob.Blob( uri, self._bucket )
-        if blob.exists():
+        # grab blob with metadata - none if missing
+        blob = self._bucket.get_blob( uri )
+        if blob is not None:
 
             # copy all files to out path
             if flatten:
@@ -129,38 +663,178 @@ class GsClient:
                 if not os.path.exists ( os.path.dirname( pathname ) ):
                     os.makedirs( os.path.dirname( pathname ) )
 
+                # large blobs downloaded as parallel ranges
+                if blob.size >= self._parallel_threshold:
+                    return self.downloadParallel( blob, pathname )
+
                 # stream blob to file
+                blob.chunk_size = self._chunk_size
                 with open( pathname, 'w+b' ) as z:
                     blob.download_to_file( z )            
 
         return pathname
 
 
-    def getBlobNameList( self, prefix, pattern='.*' ):
+    def iterBlobs( self, prefix, match_glob=None, fields=None, threads=8 ):
 
         """
-        get blob names matching regexp
+        lazily yield blobs under prefix - sub-prefixes listed concurrently
+        """
+
+        # restrict response to requested blob fields
+        kwargs = {}
+        if fields is not None:
+            kwargs[ 'fields' ] = 'items({}),prefixes,nextPageToken'.format( ','.join( fields ) )
+
+        # gcs glob semantics applied client side - * does not cross /
+        glob = compileGlob( match_glob ) if match_glob is not None else None
+
+        # shallow listing splits prefix into sub-prefixes by delimiter - descend while single sub-prefix
+        prefixes = [ prefix ]
+        while len( prefixes ) == 1:
+
+            level = prefixes[ 0 ]; prefixes = []
+            blobs = self._bucket.list_blobs( prefix=level, delimiter='/', **kwargs )
+            for page in blobs.pages:
+
+                # objects directly under prefix
+                for blob in page:
+                    if glob is None or glob.match( blob.name ) is not None:
+                        yield blob
+
+                prefixes.extend( page.prefixes )
+
+            # prefix without trailing delimiter collapses to itself - fan out below it
+            prefixes = sorted( prefixes )
+
+        # server-side glob filtering for deep listings
+        if match_glob is not None:
+            kwargs[ 'match_glob' ] = match_glob
+
+        queue = Queue( maxsize=10000 )
+        stop = threading.Event()
+
+        def listPrefix( sub_prefix ):
+
+            """
+            list sub-prefix into shared queue - sentinel marks completion
+            """
+
+            try:
+                for blob in self._bucket.list_blobs( prefix=sub_prefix, **kwargs ):
+
+                    # bounded queue - give up when consumer stops iterating
+                    while not stop.is_set():
+                        try:
+                            queue.put( blob, timeout=1.0 )
+                            break
+                        except Full:
+                            continue
+
+                    if stop.is_set():
+                        break
+            finally:
+
+                # completion sentinel - dropped once consumer has stopped
+                while not stop.is_set():
+                    try:
+                        queue.put( None, timeout=1.0 )
+                        break
+                    except Full:
+                        continue
+
+            return
+
+        executor = ThreadPoolExecutor( max_workers=threads )
+        futures = [ executor.submit( listPrefix, sub_prefix ) for sub_prefix in prefixes ]
+
+        try:
+            # yield blobs as they arrive until every sub-prefix listing completes
+            remaining = len( futures )
+            while remaining > 0:
+
+                blob = queue.get()
+                if blob is None:
+                    remaining -= 1
+                else:
+                    yield blob
+
+            # surface listing errors
+            for future in futures:
+                future.result()
+
+        finally:
+            stop.set()
+            executor.shutdown( wait=False )
+
+        return
+
+
+    def getBlobRecords( self, prefix, threads=8 ):
+
+        """
+        get name, size, generation, md5 and source md5 records under prefix - md5 of composite objects from metadata
+        """
+
+        # cache hit
+        if self._cache is not None:
+            records = self._cache.getBlobs( self._name, prefix )
+            if records is not None:
+                return records
+
+        # list minimal fields
+        records = []
+        for blob in self.iterBlobs( prefix, fields=[ 'name', 'size', 'generation', 'md5Hash', 'updated', 'metadata' ], threads=threads ):
+            records.append( {   'name' : blob.name, 
+                                'size' : blob.size, 
+                                'generation' : blob.generation, 
+                                'md5' : blob.md5_hash if blob.md5_hash is not None else ( blob.metadata or {} ).get( 'md5' ), 
+                                'updated' : blob.updated.isoformat() if blob.updated is not None else None,
+                                'source' : ( blob.metadata or {} ).get( 'source-md5' ) } )
+
+        # refresh cache with new listing
+        if self._cache is not None:
+            self._cache.refresh( self._name, prefix, records )
+
+        return records
+
+
+    def iterBlobNames( self, prefix, pattern=None, match_glob=None, threads=8 ):
+
+        """
+        lazily yield blob names matching regexp - name field only requested
         """
 
-        match_names = []
+        # compile pattern once
+        regex = re.compile( pattern ) if pattern is not None else None
 
-        # get filelist in bucket prefix subfolder
-        blobs = self._bucket.list_blobs(prefix=prefix, delimiter=None)
-        for blob in blobs:
+        # cached listing - glob applied client side
+        glob = compileGlob( match_glob ) if match_glob is not None else None
+        if self._cache is not None:
+            names = ( record[ 'name' ] for record in self.getBlobRecords( prefix, threads=threads ) 
+                        if glob is None or glob.match( record[ 'name' ] ) is not None )
+        else:
+            names = ( blob.name for blob in self.iterBlobs( prefix, match_glob=match_glob, fields=[ 'name' ], threads=threads ) )
 
-            # convert blob to dict
-            d = self.getBlobAsDict( blob )
+        for name in names:
 
             # apply regexp match to key
-            x = re.search( pattern,  d[ 'name' ] )
-            if x is not None:                
-                match_names.append( d[ 'name' ] )
+            if regex is None or regex.search( name ) is not None:
+                yield name
 
-        
-        return match_names
+        return
+
+
+    def getBlobNameList( self, prefix, pattern='.*', match_glob=None ):
+
+        """
+        get blob names matching regexp
+        """
 
+        return list( self.iterBlobNames( prefix, pattern=pattern, match_glob=match_glob ) )
 
-    def getBlobList( self, prefix, pattern='.*' ):
+
+    def getBlobList( self, prefix, pattern='.*', match_glob=None ):
 
         """
         get blobs whose name matching regexp
@@ -168,21 +842,98 @@ class GsClient:
 
         match_blobs = []
 
-        # get filelist in bucket prefix subfolder
-        blobs = self._bucket.list_blobs(prefix=prefix, delimiter=None)
-        for blob in blobs:
-
-            # apply match to bucket files
-            d = self.getBlobAsDict( blob )
+        # compile pattern once - convert to dict only on match
+        regex = re.compile( pattern )
+        for blob in self.iterBlobs( prefix, match_glob=match_glob ):
 
-            # apply regexp match to key
-            x = re.search( pattern,  d[ 'name' ] )
-            if x is not None:                
-                match_blobs.append( d )
+            if regex.search( blob.name ) is not None:
+                match_blobs.append( self.getBlobAsDict( blob ) )
 
         return match_blobs
 
 
+    @staticmethod
+    def getRecordNames( records, pattern='.*' ):
+
+        """
+        get names of listing records matching regexp
+        """
+
+        regex = re.compile( pattern )
+        return [ record[ 'name' ] for record in records if regex.search( record[ 'name' ] ) is not None ]
+
+
+    @staticmethod
+    def getSourceMetadata( record ):
+
+        """
+        get output blob metadata recording md5 of input record
+        """
+
+        return { 'source-md5' : record[ 'md5' ] } if record is not None and record[ 'md5' ] is not None else None
+
+
+    def getMissingOutputs( self, names, src, dst, pattern='.*', compare=None, inputs=None ):
+
+        """
+        filter input blob names whose output directory holds no matching blobs - output prefix listed once, inputs reused when given
+        """
+
+        # map input blobs to output directories
+        paths = { name : posixpath.dirname( name ).replace( src, dst ) for name in names }
+        if len( paths ) == 0:
+            return []
+
+        # single listing of common output prefix - group matching outputs by directory
+        regex = re.compile( pattern )
+        outputs = defaultdict( dict )
+        for record in self.getBlobRecords( os.path.commonprefix( list( paths.values() ) ) ):
+            if regex.search( record[ 'name' ] ) is not None:
+                outputs[ posixpath.dirname( record[ 'name' ] ) ][ posixpath.basename( record[ 'name' ] ) ] = record
+
+        # input records only required to detect stale outputs
+        if compare is not None and inputs is None:
+            inputs = { record[ 'name' ] : record for record in self.getBlobRecords( os.path.commonprefix( list( paths.keys() ) ) ) }
+
+        results = []
+        for name, path in paths.items():
+
+            # no output or stale output
+            if len( outputs[ path ] ) == 0 or ( compare is not None and self.isStale( inputs.get( name ), outputs[ path ], compare ) ):
+                results.append( name )
+            else:
+                print ( 'output exists: {}'.format( path ) )
+
+        return results
+
+
+    def isStale( self, record, outputs, compare ):
+
+        """
+        compare input record against output records - source md5 / copy checksum or updated timestamp
+        """
+
+        # input unknown - regenerate
+        if record is None:
+            return True
+
+        if compare == 'md5':
+
+            # derived output records md5 of input it was generated from
+            if record[ 'md5' ] is not None and any( output.get( 'source' ) == record[ 'md5' ] for output in outputs.values() ):
+                return False
+
+            # copied output must match checksum and size of identically named input
+            output = outputs.get( posixpath.basename( record[ 'name' ] ) )
+            return output is None or output[ 'md5' ] is None or output[ 'md5' ] != record[ 'md5' ] or output[ 'size' ] != record[ 'size' ]
+
+        # outputs must be newer than input
+        if compare == 'updated':
+            return any( output[ 'updated' ] is None or output[ 'updated' ] < record[ 'updated' ] for output in outputs.values() )
+
+        return False
+
+
     def moveBlob( self, name, **kwargs):
                 
         """
@@ -210,6 +961,9 @@ class GsClient:
             # delete src if dst exists
             if new_blob is not None and new_blob.exists():
                 src_blob.delete()
+
+            self.invalidateCache( [ name ] )
+            self.invalidateCache( [ dst[ 'name' ] ], bucket=dst[ 'bucket' ].name )
         
         else:
             # source and dstination are the same
@@ -232,12 +986,13 @@ class GsClient:
                         
         # check src and dst are different
         dst[ 'name' ] = dst[ 'name' ].lstrip( '/' )
-        if self._bucket != dst[ 'bucket' ] or name != dst[ 'name ']:
+        if self._bucket != dst[ 'bucket' ] or name != dst[ 'name' ]:
         
             # grab src and copy to dst
             src_blob = self.getBlob( name )
             if src_blob is not None:
                 new_blob = self._bucket.copy_blob( src_blob, dst[ 'bucket' ], dst[ 'name' ] )
+                self.invalidateCache( [ dst[ 'name' ] ], bucket=dst[ 'bucket' ].name )
             else:
                 # source and dstination are the same
                 print ( 'Blob does not exist: {}'.format( name ) )
@@ -249,13 +1004,182 @@ class GsClient:
         return new_blob
 
 
+    def relocateBlobs( self, pairs, records=None, dst_bucket=None, copy=False, dry_run=False, 
+                        checkpoint=None, workers=16, rewrite_threshold=256 * 1024 * 1024, batch_size=100 ):
+
+        """
+        server-side move / copy of ( src, dst ) name pairs - checkpointed for resume
+        """
+
+        dst_bucket = dst_bucket if dst_bucket is not None else self._bucket
+
+        # source metadata from listing records avoids per-object round trips
+        records = { record[ 'name' ] : record for record in records } if records is not None else {}
+
+        # completed states from previous run - keyed on source, destination and source generation
+        states = {}
+        if checkpoint is not None and os.path.exists( checkpoint ):
+            with open( checkpoint ) as fp:
+                for line in fp:
+                    entry = json.loads( line )
+                    states[ ( entry[ 'src' ], entry[ 'dst' ], entry.get( 'generation' ) ) ] = entry
+
+        # build plan - skip identical and completed relocations
+        plan = []
+        for src, dst in pairs:
+
+            dst = str( Path( dst ).as_posix() ).lstrip( '/' )
+            entry = { 'src' : src, 'dst' : dst, 'size' : None, 'generation' : None, 'source_generation' : None, 'method' : 'copy', 'status' : 'planned' }
+
+            if src in records:
+                entry[ 'size' ] = records[ src ][ 'size' ]
+                entry[ 'generation' ] = records[ src ][ 'generation' ]
+                if entry[ 'size' ] is not None and int( entry[ 'size' ] ) >= rewrite_threshold:
+                    entry[ 'method' ] = 'rewrite'
+
+            previous = states.get( ( src, dst, entry[ 'generation' ] ), {} )
+            if dst_bucket == self._bucket and src == dst:
+                entry[ 'status' ] = 'skipped'
+            elif previous.get( 'state' ) == ( 'copied' if copy else 'deleted' ):
+                entry[ 'status' ] = 'done'
+            elif previous.get( 'state' ) == 'copied':
+
+                # delete only generation copied by previous run
+                entry[ 'method' ] = 'delete'
+                entry[ 'source_generation' ] = previous.get( 'source_generation', entry[ 'generation' ] )
+
+            plan.append( entry )
+
+        # report plan without touching bucket
+        if dry_run:
+            for entry in plan:
+                print ( '{}: {} {} -> {} ({} bytes)'.format( entry[ 'status' ], entry[ 'method' ], entry[ 'src' ], entry[ 'dst' ], entry[ 'size' ] ) )
+            return plan
+
+        lock = threading.Lock()
+        def record( entries, state ):
+
+            """
+            append completed states to checkpoint file
+            """
+
+            if checkpoint is not None:
+                with lock, open( checkpoint, 'a' ) as fp:
+                    for entry in entries:
+                        fp.write( json.dumps( { 'src' : entry[ 'src' ], 'dst' : entry[ 'dst' ], 'generation' : entry[ 'generation' ], 
+                                                'source_generation' : entry[ 'source_generation' ], 'state' : state } ) + '\n' )
+            return
+
+        def relocate( entry ):
+
+            """
+            copy single object server-side - rewrite loop for large objects
+            """
+
+            try:
+                # pin source generation when known from listing
+                if entry[ 'src' ] in records:
+                    src_blob = self._bucket.blob( entry[ 'src' ], generation=entry[ 'generation' ] )
+                else:
+                    src_blob = self._bucket.get_blob( entry[ 'src' ] )
+                    if src_blob is None:
+                        raise NotFound( 'Blob does not exist: {}'.format( entry[ 'src' ] ) )
+
+                    if src_blob.size >= rewrite_threshold:
+                        entry[ 'method' ] = 'rewrite'
+
+                if entry[ 'method' ] == 'rewrite':
+
+                    # large objects copied in resumable rewrite steps
+                    dst_blob = dst_bucket.blob( entry[ 'dst' ] )
+                    token, written, total = dst_blob.rewrite( src_blob )
+                    while token is not None:
+                        token, written, total = dst_blob.rewrite( src_blob, token=token )
+
+                else:
+                    self._bucket.copy_blob( src_blob, dst_bucket, entry[ 'dst' ], source_generation=src_blob.generation )
+
+                # source delete conditional on copied generation
+                entry[ 'source_generation' ] = src_blob.generation
+                entry[ 'status' ] = 'copied'
+                record( [ entry ], 'copied' )
+
+            except Exception as e:
+                print ( 'Relocate error: {} {}'.format( entry[ 'src' ], e ) )
+                entry[ 'status' ] = 'failed'
+
+            return entry
+
+        # copy in batches - sources of each batch deleted in single batch request
+        pending = [ entry for entry in plan if entry[ 'status' ] == 'planned' ]
+        try:
+            with ThreadPoolExecutor( max_workers=workers ) as executor:
+
+                for idx in range( 0, len( pending ), batch_size ):
+
+                    batch = pending[ idx : idx + batch_size ]
+                    copies = [ entry for entry in batch if entry[ 'method' ] != 'delete' ]
+                    list( executor.map( relocate, copies ) )
+
+                    if copy:
+                        for entry in copies:
+                            if entry[ 'status' ] == 'copied':
+                                entry[ 'status' ] = 'done'
+                        continue
+
+                    # delete sources once copy confirmed
+                    deletes = [ entry for entry in batch if entry[ 'method' ] == 'delete' or entry[ 'status' ] == 'copied' ]
+                    self.deleteSources( deletes )
+                    record( [ entry for entry in deletes if entry[ 'status' ] == 'done' ], 'deleted' )
+
+        # expire cached listings of destinations - sources expired by batch delete
+        finally:
+            self.invalidateCache( [ entry[ 'dst' ] for entry in pending ], bucket=dst_bucket.name )
+
+        return plan
+
+
+    def deleteSources( self, entries ):
+
+        """
+        delete relocated sources in batch requests - only copied generation deleted, fall back to single deletes on failure
+        """
+
+        generations = { entry[ 'src' ] : entry[ 'source_generation' ] for entry in entries }
+        try:
+            self.deleteBlobs( [ entry[ 'src' ] for entry in entries ], generations=generations )
+            for entry in entries:
+                entry[ 'status' ] = 'done'
+
+        except Exception as e:
+
+            # retry individually - missing source already removed
+            print ( 'Batch delete error: {}'.format( e ) )
+            for entry in entries:
+                try:
+                    self._bucket.blob( entry[ 'src' ] ).delete( if_generation_match=entry[ 'source_generation' ] )
+                    entry[ 'status' ] = 'done'
+                except NotFound:
+                    entry[ 'status' ] = 'done'
+                except PreconditionFailed:
+                    print ( 'Source changed since copy: {}'.format( entry[ 'src' ] ) )
+                    entry[ 'status' ] = 'failed'
+                except Exception as e:
+                    print ( 'Delete error: {} {}'.format( entry[ 'src' ], e ) )
+                    entry[ 'status' ] = 'failed'
+
+            self.invalidateCache( [ entry[ 'src' ] for entry in entries ] )
+
+        return
+
+
     def getBlob( self, name ):
         
         """
         get blob
         """
 
-        return storage.blob.Blob( name, self._bucket )
+        return self._bucket.blob( name )
 
 
     def getBlobAsDict( self, blob ):
@@ -281,7 +1205,7 @@ class GsClient:
         }
 
 
-    def getImageUriList( self, prefix, pattern=None ):
+    def getImageUriList( self, prefix, pattern=None, match_glob=None ):
 
         """
         get blob
@@ -289,9 +1213,20 @@ class GsClient:
 
         uris = []
 
-        # convert matching blob names to gdal virtual fs uris
-        keys = self.getBlobNameList( prefix, pattern=pattern )
-        for key in keys:
-            uris.append( '/vsigs/{}/{}'.format( self._name, key ) )
+        # convert matching blob names to gdal readable uris
+        for key in self.iterBlobNames( prefix, pattern=pattern, match_glob=match_glob ):
+            uris.append( self.getUri( key ) )
 
         return uris
+
+
+    def getUri( self, name ):
+
+        """
+        get gdal readable uri of blob - local pathname for directory backend
+        """
+
+        if isinstance( self._bucket, LocalBucket ):
+            return self._bucket.blob( name ).pathname
+
+        return '/vsigs/{}/{}'.format( self._name, name )
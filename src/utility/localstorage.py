@@ -0,0 +1,580 @@
+import os
+import io
+import json
+import re
+import base64
+import shutil
+import hashlib
+import tempfile
+import threading
+import posixpath
+import google_crc32c
+
+from datetime import datetime, timezone
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+
+def compileGlob( pattern ):
+
+    """
+    compile gcs match_glob pattern to regex - * and ? stop at /, ** spans directories
+    """
+
+    regex = ''; idx = 0
+    while idx < len( pattern ):
+
+        char = pattern[ idx ]
+        if pattern.startswith( '**', idx ):
+            regex += '.*'; idx += 2
+            continue
+
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[' and ']' in pattern[ idx + 1 : ]:
+
+            # character class - negation as gcs / fnmatch
+            end = pattern.index( ']', idx + 1 )
+            body = pattern[ idx + 1 : end ]
+            regex += '[' + ( '^' + body[ 1 : ] if body.startswith( '!' ) else body ) + ']'
+            idx = end
+
+        elif char == '{' and '}' in pattern[ idx + 1 : ]:
+
+            # brace alternation
+            end = pattern.index( '}', idx + 1 )
+            regex += '(?:' + '|'.join( re.escape( item ) for item in pattern[ idx + 1 : end ].split( ',' ) ) + ')'
+            idx = end
+
+        else:
+            regex += re.escape( char )
+
+        idx += 1
+
+    return re.compile( regex + r'\Z', re.DOTALL )
+
+
+class LocalClient:
+
+
+    def __init__( self, root ):
+
+        """
+        constructor - buckets stored as sub-directories of root
+        """
+
+        self._root = root
+        return
+
+
+    def bucket( self, name ):
+
+        """
+        get bucket handle
+        """
+
+        return LocalBucket( self, name )
+
+
+    def batch( self ):
+
+        """
+        batch context - local requests executed immediately
+        """
+
+        return LocalBatch()
+
+
+class LocalBatch:
+
+
+    def __enter__( self ):
+        return self
+
+
+    def __exit__( self, *args ):
+        return False
+
+
+class LocalPage( list ):
+
+
+    def __init__( self, blobs, prefixes ):
+
+        """
+        constructor - page of blobs with delimiter prefixes
+        """
+
+        super().__init__( blobs )
+        self.prefixes = prefixes
+        return
+
+
+class LocalIterator:
+
+
+    def __init__( self, blobs, prefixes, page_size=1000 ):
+
+        """
+        constructor - mirrors page iterator returned by list_blobs
+        """
+
+        self._blobs = blobs
+        self.prefixes = prefixes
+        self._page_size = page_size
+        return
+
+
+    @property
+    def pages( self ):
+
+        """
+        yield pages of blobs - prefixes reported on first page
+        """
+
+        if len( self._blobs ) == 0:
+            yield LocalPage( [], self.prefixes )
+
+        for idx in range( 0, len( self._blobs ), self._page_size ):
+            yield LocalPage( self._blobs[ idx : idx + self._page_size ], self.prefixes if idx == 0 else set() )
+
+        return
+
+
+    def __iter__( self ):
+        return iter( self._blobs )
+
+
+class LocalBucket:
+
+    # checksums cached on path, size and modification time
+    _checksums = {}
+    _lock = threading.Lock()
+
+
+    def __init__( self, client, name ):
+
+        """
+        constructor
+        """
+
+        self.name = name
+        self.path = os.path.join( client._root, name )
+        self._client = client
+        return
+
+
+    def __eq__( self, other ):
+        return isinstance( other, LocalBucket ) and self.path == other.path
+
+
+    def __hash__( self ):
+        return hash( self.path )
+
+
+    def blob( self, name, chunk_size=None, generation=None ):
+
+        """
+        get blob handle - no filesystem access
+        """
+
+        return LocalBlob( self, name, chunk_size=chunk_size, generation=generation )
+
+
+    def get_blob( self, name ):
+
+        """
+        get blob with metadata - none if missing
+        """
+
+        blob = self.blob( name )
+        if not blob.exists():
+            return None
+
+        blob.reload()
+        return blob
+
+
+    def list_blobs( self, prefix=None, delimiter=None, fields=None, match_glob=None, page_size=1000 ):
+
+        """
+        list blobs in lexicographic order - delimiter collapses sub-directories into prefixes
+        """
+
+        prefix = prefix if prefix is not None else ''
+
+        # walk directory containing prefix
+        start = posixpath.dirname( prefix )
+        names = []
+        for root, dirs, files in os.walk( os.path.join( self.path, start ) ):
+            for name in files:
+                key = posixpath.join( start, os.path.relpath( os.path.join( root, name ), os.path.join( self.path, start ) ).replace( os.sep, '/' ) )
+                if key.startswith( prefix ) and not name.startswith( ( '.tmp', '.meta.' ) ):
+                    names.append( key )
+
+        glob = compileGlob( match_glob ) if match_glob is not None else None
+
+        blobs = []; prefixes = set()
+        for key in sorted( names ):
+
+            # collapse keys beyond delimiter into prefixes
+            if delimiter is not None and delimiter in key[ len( prefix ) : ]:
+                prefixes.add( key[ : key.index( delimiter, len( prefix ) ) + 1 ] )
+                continue
+
+            if glob is None or glob.match( key ) is not None:
+                blob = self.blob( key )
+                blob.reload()
+                blobs.append( blob )
+
+        return LocalIterator( blobs, prefixes, page_size=page_size )
+
+
+    def copy_blob( self, blob, destination_bucket, new_name=None, source_generation=None ):
+
+        """
+        copy blob to destination bucket - optionally pinned to source generation
+        """
+
+        if source_generation is not None:
+            blob = self.blob( blob.name, generation=source_generation )
+
+        new_blob = destination_bucket.blob( new_name if new_name is not None else blob.name )
+        new_blob.rewrite( blob )
+
+        return new_blob
+
+
+    def getChecksums( self, pathname, stat ):
+
+        """
+        get base64 md5 and crc32c of file - cached until file changes
+        """
+
+        key = ( pathname, stat.st_size, stat.st_mtime_ns )
+        with LocalBucket._lock:
+            if key in LocalBucket._checksums:
+                return LocalBucket._checksums[ key ]
+
+        md5 = hashlib.md5(); crc32c = google_crc32c.Checksum()
+        with open( pathname, 'rb' ) as fp:
+            for chunk in iter( lambda: fp.read( 8 * 1024 * 1024 ), b'' ):
+                md5.update( chunk ); crc32c.update( chunk )
+
+        value = ( base64.b64encode( md5.digest() ).decode(), base64.b64encode( crc32c.digest() ).decode() )
+        with LocalBucket._lock:
+            LocalBucket._checksums[ key ] = value
+
+        return value
+
+
+class LocalBlob:
+
+
+    def __init__( self, bucket, name, chunk_size=None, generation=None ):
+
+        """
+        constructor - attributes populated by reload
+        """
+
+        self.name = name
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.generation = generation
+
+        self.size = None
+        self.updated = None
+        self.time_created = None
+        self.time_deleted = None
+        self.content_type = None
+        self.owner = None
+        self.metadata = None
+        self._properties = {}
+        self._pinned = generation is not None
+        self._stat = None
+        return
+
+
+    @property
+    def pathname( self ):
+        return os.path.join( self.bucket.path, *self.name.split( '/' ) )
+
+
+    @property
+    def meta_pathname( self ):
+        return os.path.join( os.path.dirname( self.pathname ), '.meta.{}.json'.format( os.path.basename( self.pathname ) ) )
+
+
+    @property
+    def public_url( self ):
+        return 'file://{}'.format( os.path.abspath( self.pathname ) )
+
+
+    @property
+    def md5_hash( self ):
+        return self.bucket.getChecksums( self.pathname, self._stat )[ 0 ] if self._stat is not None else None
+
+
+    @property
+    def crc32c( self ):
+        return self.bucket.getChecksums( self.pathname, self._stat )[ 1 ] if self._stat is not None else None
+
+
+    def exists( self ):
+
+        """
+        check blob exists
+        """
+
+        return os.path.isfile( self.pathname )
+
+
+    def reload( self ):
+
+        """
+        refresh metadata from file - generation taken from modification time
+        """
+
+        try:
+            self._stat = os.stat( self.pathname )
+        except FileNotFoundError:
+            raise NotFound( 'No such object: {}/{}'.format( self.bucket.name, self.name ) )
+
+        # pinned generation must match current object
+        generation = self._stat.st_mtime_ns
+        if self._pinned and int( self.generation ) != generation:
+            raise NotFound( 'No such object generation: {}/{}#{}'.format( self.bucket.name, self.name, self.generation ) )
+
+        self.generation = generation
+        self.size = self._stat.st_size
+        self.updated = datetime.fromtimestamp( self._stat.st_mtime, tz=timezone.utc )
+        self.time_created = self.updated
+
+        # custom metadata held in hidden sidecar
+        self.metadata = None
+        if os.path.exists( self.meta_pathname ):
+            with open( self.meta_pathname ) as fp:
+                self.metadata = json.load( fp )
+
+        return
+
+
+    def patch( self ):
+
+        """
+        write custom metadata to sidecar - object unchanged
+        """
+
+        metadata = self.metadata
+        if not self.exists():
+            raise NotFound( 'No such object: {}/{}'.format( self.bucket.name, self.name ) )
+
+        if metadata is not None:
+            with open( self.meta_pathname, 'w' ) as fp:
+                json.dump( metadata, fp )
+        elif os.path.exists( self.meta_pathname ):
+            os.remove( self.meta_pathname )
+
+        self.reload()
+        return
+
+
+    def delete( self, if_generation_match=None ):
+
+        """
+        delete blob - optionally only when current generation matches
+        """
+
+        try:
+            if if_generation_match is not None and os.stat( self.pathname ).st_mtime_ns != int( if_generation_match ):
+                raise PreconditionFailed( 'Generation mismatch: {}/{}#{}'.format( self.bucket.name, self.name, if_generation_match ) )
+
+            os.remove( self.pathname )
+        except FileNotFoundError:
+            raise NotFound( 'No such object: {}/{}'.format( self.bucket.name, self.name ) )
+
+        if os.path.exists( self.meta_pathname ):
+            os.remove( self.meta_pathname )
+
+        return
+
+
+    def write( self, source ):
+
+        """
+        atomically replace blob with contents of readable source
+        """
+
+        os.makedirs( os.path.dirname( self.pathname ), exist_ok=True )
+
+        # metadata replaced with object as gcs upload
+        metadata = self.metadata
+        if metadata is not None:
+            with open( self.meta_pathname, 'w' ) as fp:
+                json.dump( metadata, fp )
+        elif os.path.exists( self.meta_pathname ):
+            os.remove( self.meta_pathname )
+
+        # temporary file in same directory - renamed into place when complete
+        fd, tmp_pathname = tempfile.mkstemp( prefix='.tmp', dir=os.path.dirname( self.pathname ) )
+        try:
+            with os.fdopen( fd, 'wb' ) as fp:
+                shutil.copyfileobj( source, fp, 8 * 1024 * 1024 )
+            os.replace( tmp_pathname, self.pathname )
+
+        except Exception:
+            os.remove( tmp_pathname )
+            raise
+
+        self._pinned = False
+        self.reload()
+        return
+
+
+    def upload_from_filename( self, pathname ):
+
+        """
+        upload local file
+        """
+
+        with open( pathname, 'rb' ) as fp:
+            self.write( fp )
+
+        return
+
+
+    def upload_from_file( self, fp, size=None, rewind=False ):
+
+        """
+        upload file-like object
+        """
+
+        if rewind:
+            fp.seek( 0 )
+
+        self.write( fp )
+        return
+
+
+    def upload_from_string( self, data ):
+
+        """
+        upload bytes or string
+        """
+
+        self.write( io.BytesIO( data if isinstance( data, bytes ) else data.encode() ) )
+        return
+
+
+    def download_to_file( self, fp ):
+
+        """
+        copy blob into file-like object
+        """
+
+        self.reload()
+        with open( self.pathname, 'rb' ) as src:
+            shutil.copyfileobj( src, fp, 8 * 1024 * 1024 )
+
+        return
+
+
+    def download_to_filename( self, pathname ):
+
+        """
+        copy blob to local file
+        """
+
+        with open( pathname, 'wb' ) as fp:
+            self.download_to_file( fp )
+
+        return
+
+
+    def download_as_bytes( self, start=None, end=None ):
+
+        """
+        read blob or inclusive byte range
+        """
+
+        self.reload()
+        with open( self.pathname, 'rb' ) as fp:
+
+            start = start if start is not None else 0
+            fp.seek( start )
+            return fp.read( end - start + 1 if end is not None else -1 )
+
+
+    def open( self, mode='rb' ):
+
+        """
+        open blob for reading
+        """
+
+        self.reload()
+        return open( self.pathname, mode )
+
+
+    def compose( self, sources ):
+
+        """
+        concatenate source blobs into blob
+        """
+
+        handles = [ source.open( 'rb' ) for source in sources ]
+        try:
+            self.write( ChainFile( handles ) )
+        finally:
+            for fp in handles:
+                fp.close()
+
+        return
+
+
+    def rewrite( self, source, token=None ):
+
+        """
+        copy source into blob in single step - returns ( token, bytes rewritten, total bytes )
+        """
+
+        # metadata copied with object
+        with source.open( 'rb' ) as fp:
+            self.metadata = source.metadata
+            self.write( fp )
+
+        return None, self.size, self.size
+
+
+class ChainFile:
+
+
+    def __init__( self, handles ):
+
+        """
+        constructor - sequential reader over list of open files
+        """
+
+        self._handles = handles
+        self._idx = 0
+        return
+
+
+    def read( self, size=-1 ):
+
+        """
+        read across file boundaries
+        """
+
+        chunks = []
+        while self._idx < len( self._handles ) and size != 0:
+
+            chunk = self._handles[ self._idx ].read( size )
+            if len( chunk ) == 0 or size < 0:
+                self._idx += 1
+
+            chunks.append( chunk )
+            if size > 0:
+                size -= len( chunk )
+
+        return b''.join( chunks )
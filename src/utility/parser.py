@@ -2,8 +2,15 @@ import os
 import re
 
 from datetime import datetime
+from functools import lru_cache
 
 
+# precompiled patterns
+datetime_pattern = re.compile( '[0-9]{8}_[0-9]{6}' )
+tle_pattern = re.compile( r'\d{5}' )
+
+
+@lru_cache( maxsize=65536 )
 def getDateTimeString( pathname ):
 
     """
@@ -13,13 +20,14 @@ def getDateTimeString( pathname ):
     dt = None
 
     # parse for date time sub directory
-    m = re.search( '[0-9]{8}_[0-9]{6}', pathname )
+    m = datetime_pattern.search( pathname )
     if m:
         dt = str(m.group(0) )
 
     return dt
 
 
+@lru_cache( maxsize=65536 )
 def getDateTime( pathname ):
 
     """
@@ -29,13 +37,14 @@ def getDateTime( pathname ):
     dt = None
 
     # parse for date time sub directory
-    m = re.search( '[0-9]{8}_[0-9]{6}', pathname )
-    if m:
-        dt = datetime.strptime( str(m.group(0) ), '%Y%m%d_%H%M%S')
+    dt_string = getDateTimeString( pathname )
+    if dt_string:
+        dt = datetime.strptime( dt_string, '%Y%m%d_%H%M%S')
 
     return dt
 
 
+@lru_cache( maxsize=65536 )
 def getTle( pathname ):
 
     """
@@ -45,9 +54,53 @@ def getTle( pathname ):
     tle = None
 
     # parse for date time sub directory
-    m = re.search( '\d{5}', pathname )
+    m = tle_pattern.search( pathname )
     if m:
         tle = str( m.group(0) )
 
     return tle
 
+
+def getSeries( pathnames ):
+
+    """
+    convert list of pathnames to pandas string series
+    """
+
+    # pandas only required by batch api
+    import pandas as pd
+
+    if isinstance( pathnames, pd.Series ):
+        return pathnames.astype( str )
+
+    return pd.Series( list( pathnames ), dtype=str )
+
+
+def getDateTimeStrings( pathnames ):
+
+    """
+    parse date time sub-folder names from list or series of pathnames - nan where absent
+    """
+
+    return getSeries( pathnames ).str.extract( '({})'.format( datetime_pattern.pattern ), expand=False )
+
+
+def getDateTimes( pathnames ):
+
+    """
+    parse date times from list or series of pathnames - nat where absent
+    """
+
+    import pandas as pd
+
+    # vectorised parse with fixed format
+    return pd.to_datetime( getDateTimeStrings( pathnames ), format='%Y%m%d_%H%M%S', errors='coerce' )
+
+
+def getTles( pathnames ):
+
+    """
+    parse tles from list or series of pathnames - nan where absent
+    """
+
+    return getSeries( pathnames ).str.extract( '({})'.format( tle_pattern.pattern ), expand=False )
@@ -0,0 +1,149 @@
+import threading
+
+from queue import Queue
+
+
+class ScratchBudget:
+
+
+    def __init__( self, capacity ):
+
+        """
+        constructor - capacity in bytes of local scratch space
+        """
+
+        self._capacity = capacity
+        self._used = 0
+        self._condition = threading.Condition()
+        return
+
+
+    def acquire( self, size ):
+
+        """
+        block until size bytes of scratch space available - oversize items admitted when idle
+        """
+
+        with self._condition:
+            while self._used > 0 and self._used + size > self._capacity:
+                self._condition.wait()
+
+            self._used += size
+
+        return size
+
+
+    def release( self, size ):
+
+        """
+        return scratch space to budget
+        """
+
+        with self._condition:
+            self._used -= size
+            self._condition.notify_all()
+
+        return
+
+
+class Pipeline:
+
+
+    def __init__( self, stages, queue_size=2, on_drop=None ):
+
+        """
+        constructor - stages defined as list of ( name, function, workers ) tuples
+        """
+
+        # stage functions return item for next stage - none drops item
+        self._stages = stages
+        self._queue_size = queue_size
+        self._on_drop = on_drop
+        return
+
+
+    def run( self, items ):
+
+        """
+        push items through stages - stages overlap via bounded queues
+        """
+
+        sentinel = object()
+        queues = [ Queue( maxsize=self._queue_size ) for stage in self._stages ]
+        failures = []; completed = []
+
+        # count of live workers per stage - last worker out signals next stage
+        live = [ stage[ 2 ] for stage in self._stages ]
+        lock = threading.Lock()
+
+        def worker( index ):
+
+            """
+            consume stage queue until sentinel received
+            """
+
+            name, function, workers = self._stages[ index ]
+            while True:
+
+                item = queues[ index ].get()
+                if item is sentinel:
+                    break
+
+                try:
+                    # execute stage - drop item on failure
+                    result = function( item )
+
+                except Exception as e:
+                    print ( '{} error: {}'.format( name, e ) )
+                    failures.append( ( name, item, e ) )
+                    result = None
+
+                if result is None:
+
+                    # cleanup failure recorded - worker keeps consuming so shutdown accounting holds
+                    if self._on_drop is not None:
+                        try:
+                            self._on_drop( item )
+                        except Exception as e:
+                            print ( '{} drop error: {}'.format( name, e ) )
+                            failures.append( ( name, item, e ) )
+
+                    continue
+
+                # hand to next stage or record completion
+                if index + 1 < len( self._stages ):
+                    queues[ index + 1 ].put( result )
+                else:
+                    completed.append( result )
+
+            # propagate shutdown once all workers of this stage have finished
+            with lock:
+                live[ index ] -= 1
+                last = live[ index ] == 0
+
+            if last and index + 1 < len( self._stages ):
+                for count in range( self._stages[ index + 1 ][ 2 ] ):
+                    queues[ index + 1 ].put( sentinel )
+
+            return
+
+        # start stage workers
+        threads = []
+        for index, stage in enumerate( self._stages ):
+            for count in range( stage[ 2 ] ):
+                thread = threading.Thread( target=worker, args=[ index ] )
+                thread.start()
+                threads.append( thread )
+
+        # feed first stage - blocks while queue full
+        for item in items:
+            queues[ 0 ].put( item )
+
+        for count in range( self._stages[ 0 ][ 2 ] ):
+            queues[ 0 ].put( sentinel )
+
+        # wait for pipeline to drain
+        for thread in threads:
+            thread.join()
+
+        return completed, failures
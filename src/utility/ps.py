@@ -1,7 +1,16 @@
 import sys
 import os
+import time
+import asyncio
 import subprocess
 
+from collections import namedtuple
+from contextlib import nullcontext
+
+
+# structured sub-process result - output buffers empty when streamed to handlers
+Result = namedtuple( 'Result', [ 'name', 'arguments', 'out', 'err', 'code', 'elapsed', 'timed_out' ] )
+
 
 def execute( name, arguments, logger = None ):
 
@@ -17,6 +26,87 @@ def execute( name, arguments, logger = None ):
     return out, err, code
 
 
+def stream( name, arguments ):
+
+    """
+    create sub-process with piped output for incremental consumption
+    """
+
+    # caller reads stdout / stderr and waits on process
+    return subprocess.Popen( [name] + arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE )
+
+
+async def executeAsync( name, arguments, on_stdout=None, on_stderr=None, timeout=None, semaphore=None, chunk_size=65536 ):
+
+    """
+    execute sub-process asynchronously - output streamed to optional handlers in chunks
+    """
+
+    # optional bound on concurrent processes
+    async with semaphore if semaphore is not None else nullcontext():
+
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec( name, *arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE )
+
+        out = []; err = []
+        async def pump( stream, handler, buffer ):
+
+            # hand chunks to handler or buffer when no handler supplied
+            while True:
+                chunk = await stream.read( chunk_size )
+                if not chunk:
+                    break
+
+                if handler is not None:
+                    handler( chunk )
+                else:
+                    buffer.append( chunk )
+
+            return
+
+        timed_out = False
+        try:
+            await asyncio.wait_for( asyncio.gather( pump( process.stdout, on_stdout, out ), 
+                                                    pump( process.stderr, on_stderr, err ), 
+                                                    process.wait() ), timeout )
+
+        # kill process on timeout
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            timed_out = True
+
+    return Result( name, arguments, b''.join( out ), b''.join( err ), process.returncode, time.monotonic() - start, timed_out )
+
+
+async def executeManyAsync( commands, concurrency=4, timeout=None ):
+
+    """
+    execute list of ( name, arguments ) commands with bounded concurrency
+    """
+
+    semaphore = asyncio.Semaphore( concurrency )
+    return await asyncio.gather( *[ executeAsync( name, arguments, timeout=timeout, semaphore=semaphore ) for name, arguments in commands ] )
+
+
+def executeStreaming( name, arguments, on_stdout=None, on_stderr=None, timeout=None ):
+
+    """
+    synchronous wrapper - execute sub-process with streamed output handlers
+    """
+
+    return asyncio.run( executeAsync( name, arguments, on_stdout=on_stdout, on_stderr=on_stderr, timeout=timeout ) )
+
+
+def executeMany( commands, concurrency=4, timeout=None ):
+
+    """
+    synchronous wrapper - execute commands concurrently and return results in order
+    """
+
+    return asyncio.run( executeManyAsync( commands, concurrency=concurrency, timeout=timeout ) )
+
+
 def extractZip( pathname, out_path, overwrite=True ):
 
     """
@@ -0,0 +1,126 @@
+import struct
+
+
+# gdal private tiff tags
+GDAL_NODATA = 42113
+SAMPLES_PER_PIXEL = 277
+
+# tiff field type sizes
+type_sizes = { 1 : 1, 2 : 1, 3 : 2, 4 : 4, 5 : 8, 6 : 1, 7 : 1, 8 : 2, 9 : 4, 10 : 8, 11 : 4, 12 : 8, 16 : 8, 17 : 8, 18 : 8 }
+
+
+def getLayout( header ):
+
+    """
+    parse tiff header - byte order, bigtiff flag and first ifd offset
+    """
+
+    # byte order
+    if header[ 0 : 2 ] == b'II':
+        order = '<'
+    elif header[ 0 : 2 ] == b'MM':
+        order = '>'
+    else:
+        raise ValueError( 'Not a tiff file' )
+
+    # classic tiff (42) or bigtiff (43)
+    version = struct.unpack( order + 'H', header[ 2 : 4 ] )[ 0 ]
+    if version == 42:
+        return { 'order' : order, 'bigtiff' : False, 'offset' : struct.unpack( order + 'I', header[ 4 : 8 ] )[ 0 ] }
+
+    if version == 43:
+        return { 'order' : order, 'bigtiff' : True, 'offset' : struct.unpack( order + 'Q', header[ 8 : 16 ] )[ 0 ] }
+
+    raise ValueError( 'Unknown tiff version: {}'.format( version ) )
+
+
+def getEntryFormat( layout ):
+
+    """
+    get struct formats for ifd count, entry and next ifd offset
+    """
+
+    order = layout[ 'order' ]
+    if layout[ 'bigtiff' ]:
+        return order + 'Q', order + 'HHQ8s', order + 'Q'
+
+    return order + 'H', order + 'HHI4s', order + 'I'
+
+
+def readIfd( layout, read ):
+
+    """
+    read first ifd using ranged read function read( offset, size )
+    """
+
+    count_fmt, entry_fmt, next_fmt = getEntryFormat( layout )
+
+    # entry count then entries + next ifd offset
+    offset = layout[ 'offset' ]
+    count = struct.unpack( count_fmt, read( offset, struct.calcsize( count_fmt ) ) )[ 0 ]
+
+    offset += struct.calcsize( count_fmt )
+    size = count * struct.calcsize( entry_fmt )
+    buffer = read( offset, size + struct.calcsize( next_fmt ) )
+
+    entries = []
+    for idx in range( count ):
+        entries.append( list( struct.unpack_from( entry_fmt, buffer, idx * struct.calcsize( entry_fmt ) ) ) )
+
+    next_offset = struct.unpack_from( next_fmt, buffer, size )[ 0 ]
+    return entries, next_offset
+
+
+def getInlineValue( layout, entry ):
+
+    """
+    get inline short / long value of ifd entry
+    """
+
+    tag, field_type, count, value = entry
+    fmt = layout[ 'order' ] + ( 'H' if field_type == 3 else 'I' )
+
+    return struct.unpack_from( fmt, value )[ 0 ]
+
+
+def getNoDataPatch( layout, entries, next_offset, file_size, nodata ):
+
+    """
+    get patched header and appended ifd setting gdal nodata tag - original ifd left untouched
+    """
+
+    count_fmt, entry_fmt, next_fmt = getEntryFormat( layout )
+    inline_size = 8 if layout[ 'bigtiff' ] else 4
+
+    # nodata stored as null-terminated ascii
+    text = '{}'.format( nodata ).encode() + b'\x00'
+
+    # new ifd appended at word boundary after original file
+    ifd_offset = file_size + ( file_size % 2 )
+    ifd_size = struct.calcsize( count_fmt ) + ( len( entries ) + 1 ) * struct.calcsize( entry_fmt ) + struct.calcsize( next_fmt )
+
+    # small values inline - otherwise appended after new ifd
+    if len( text ) <= inline_size:
+        value = text.ljust( inline_size, b'\x00' ); extra = b''
+    else:
+        value = struct.pack( layout[ 'order' ] + ( 'Q' if layout[ 'bigtiff' ] else 'I' ), ifd_offset + ifd_size ); extra = text
+
+    # replace or insert nodata entry - entries sorted by tag
+    entries = [ entry for entry in entries if entry[ 0 ] != GDAL_NODATA ]
+    entries.append( [ GDAL_NODATA, 2, len( text ), value ] )
+    entries.sort( key=lambda entry: entry[ 0 ] )
+
+    ifd = struct.pack( count_fmt, len( entries ) )
+    for entry in entries:
+        ifd += struct.pack( entry_fmt, *entry )
+
+    # keep chain to overview and mask ifds
+    ifd += struct.pack( next_fmt, next_offset )
+
+    # header points at new ifd
+    if layout[ 'bigtiff' ]:
+        header = ( b'II' if layout[ 'order' ] == '<' else b'MM' ) + struct.pack( layout[ 'order' ] + 'HHHQ', 43, 8, 0, ifd_offset )
+    else:
+        header = ( b'II' if layout[ 'order' ] == '<' else b'MM' ) + struct.pack( layout[ 'order' ] + 'HI', 42, ifd_offset )
+
+    return header, b'\x00' * ( file_size % 2 ) + ifd + extra
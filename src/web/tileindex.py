@@ -1,14 +1,17 @@
 import os 
+import re
 import pdb
 import operator 
 import argparse
 import numpy as np
+import pandas as pd
 import geopandas as gpd
 
 from osgeo import gdal, osr
 from datetime import datetime
 from shapely.geometry import box
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from src.utility import parser
 from src.utility.gsclient import GsClient
@@ -29,20 +32,90 @@ def getRasterBounds( path ):
     return box( lrx, lry, ulx, uly ) 
 
 
+def setHeaderOptions():
+
+    """
+    limit gdal open to header bytes - no sidecar probing or directory listing
+    """
+
+    gdal.SetConfigOption( 'GDAL_DISABLE_READDIR_ON_OPEN', 'EMPTY_DIR' )
+    gdal.SetConfigOption( 'GDAL_INGESTED_BYTES_AT_OPEN', '32768' )
+    gdal.SetConfigOption( 'CPL_VSIL_CURL_ALLOWED_EXTENSIONS', '.TIF,.tif,.tiff' )
+    gdal.SetConfigOption( 'GDAL_HTTP_MULTIRANGE', 'YES' )
+
+    return
+
+
+def getRasterBoundsList( locations, workers=16, backend='thread' ):
+
+    """
+    get extents of rasters opened concurrently
+    """
+
+    # process pool workers configure gdal on start
+    if backend == 'process':
+        executor = ProcessPoolExecutor( max_workers=workers, initializer=setHeaderOptions )
+    else:
+        setHeaderOptions()
+        executor = ThreadPoolExecutor( max_workers=workers )
+
+    with executor:
+        bounds = list( executor.map( getRasterBounds, locations ) )
+
+    return bounds
+
+
+def getDriver( pathname ):
+
+    """
+    get ogr driver name and spatial index options from output file extension - single-file formats only
+    """
+
+    drivers = { '.gpkg' : ( 'GPKG', { 'SPATIAL_INDEX' : 'YES' } ),
+                '.fgb' : ( 'FlatGeobuf', { 'SPATIAL_INDEX' : 'YES' } ) }
+
+    # multi-file shapefile parts cannot be replaced in one rename
+    ext = os.path.splitext( pathname )[ 1 ].lower()
+    if ext not in drivers:
+        raise ValueError( 'Unsupported index format: {} - use .gpkg or .fgb'.format( pathname ) )
+
+    return drivers[ ext ]
+
+
+def writeIndex( gdf, pathname ):
+
+    """
+    write index to temporary file alongside output then atomically rename into place
+    """
+
+    driver, options = getDriver( pathname )
+    root, ext = os.path.splitext( pathname )
+
+    # temporary file in output directory - rename never crosses filesystems
+    tmp_pathname = '{}.tmp{}{}'.format( root, os.getpid(), ext )
+    try:
+        gdf.to_file( tmp_pathname, driver=driver, **options )
+        os.replace( tmp_pathname, pathname )
+
+    finally:
+        if os.path.exists( tmp_pathname ):
+            os.remove( tmp_pathname )
+
+    return
+
+
 def getTimeIndexList( images ):
 
     """
     generate list of dates mapped to pathnames
     """
 
+    # create date time keys in single vectorised parse
+    keys = parser.getDateTimes( images ).dt.strftime( '%Y-%m-%dT00:00:00Z' )
+
     # get index list
     indexList = defaultdict(list)
-    for image in images:
-
-        # create date time key
-        dt = parser.getDateTime( image )
-        key = dt.strftime( '%Y-%m-%dT00:00:00Z' )
-
+    for image, key in zip( images, keys ):
         indexList[ key ].append( image )
 
     return indexList
@@ -58,10 +131,15 @@ def parseArguments(args=None):
     parser = argparse.ArgumentParser(description='process-ard')
     parser.add_argument( 'uri', action="store" )
     parser.add_argument( 'key_pathname', action="store" )
-    parser.add_argument( 'out_pathname', action="store" )
+    parser.add_argument( 'out_pathname', action="store", help='.gpkg or .fgb index' )
     parser.add_argument('-t','--tles', nargs='+', help='tles', type=int, required=True )
     parser.add_argument('-chunk_size', default=None, action="store", type=int )
-    parser.add_argument('-pattern', default='.*TIF', action="store" )
+    parser.add_argument('-cache_ttl', default=None, action="store", type=int )
+    parser.add_argument('-endpoint', default=None, action="store", help='local directory or emulator url - google cloud storage by default' )
+    parser.add_argument('-pattern', default='.*TIF$', action="store" )
+    parser.add_argument('-workers', default=16, action="store", type=int )
+    parser.add_argument('-backend', default='thread', choices=[ 'thread', 'process' ], action="store" )
+    parser.add_argument('-incremental', action="store_true", help='only open new or changed images - remove deleted' )
 
     return parser.parse_args(args)
 
@@ -72,54 +150,89 @@ def main():
     main path of execution
     """
 
-    # parse arguments
+    # parse arguments - reject unsupported index format before opening rasters
     args = parseArguments()
+    getDriver( args.out_pathname )
 
     # parse uri
     bucket, prefix = GsClient.parseUri( args.uri )
     if bucket is not None:
 
-        # update credentials
-        if os.path.exists( args.key_pathname ):
-            GsClient.updateCredentials( args.key_pathname )
+        # explicit client credentials - environment also updated for gdal /vsigs/ reads
+        credentials = args.key_pathname if os.path.exists( args.key_pathname ) else None
+        if credentials is not None:
+            GsClient.updateCredentials( credentials )
 
-        # open client
-        client = GsClient( bucket, chunk_size=args.chunk_size )
+        # open shared client
+        client = GsClient.getClient( bucket, credentials=credentials, chunk_size=args.chunk_size, cache_ttl=args.cache_ttl, endpoint=args.endpoint )
 
-        images =  []
+        # list images with generation - keyed on gdal readable uri
+        regex = re.compile( args.pattern )
+        generations = {}; prefixes = []
         for tle in args.tles:
 
             # retrieve list of blobs in prefix + tle directory            
             bucket_path = '{}/{}'.format( prefix, str( tle ) ).lstrip('/')
-            images.extend( client.getImageUriList( bucket_path, pattern=args.pattern ) )
+            prefixes.append( client.getUri( bucket_path + '/' ) )
+
+            for record in client.getBlobRecords( bucket_path ):
+                if regex.search( record[ 'name' ] ) is not None:
+                    generations[ client.getUri( record[ 'name' ] ) ] = str( record[ 'generation' ] )
 
+        images = list( generations.keys() )
         print( 'images found: {}'.format( len( images )  ) )
 
+        # incremental update - keep rows whose blob generation is unchanged
+        existing = None
+        if args.incremental and os.path.exists( args.out_pathname ):
+
+            existing = gpd.read_file( args.out_pathname )
+            if 'generation' not in existing.columns:
+                existing[ 'generation' ] = None
+
+            # rows outside listed tles are left alone - listed rows kept only if unchanged
+            listed = existing[ 'location' ].map( lambda location: any( location.startswith( p ) for p in prefixes ) )
+            unchanged = pd.Series( [ generations.get( location ) == generation for location, generation in zip( existing[ 'location' ], existing[ 'generation' ] ) ],
+                                    index=existing.index )
+
+            keep = ~listed | unchanged
+            print( 'removed or changed: {}'.format( int( ( ~keep ).sum() ) ) )
+            existing = existing[ keep ]
+
+            # open new or changed images only
+            locations = set( existing[ 'location' ] )
+            images = [ image for image in images if image not in locations ]
+            print( 'new or changed images: {}'.format( len( images ) ) )
+
         # sort into time ascending order
         indexList = getTimeIndexList( images )
         sortList = sorted( indexList.items(), key=operator.itemgetter(0) )
 
-        # shape file attributes - time default
-        gdf = gpd.GeoDataFrame(columns=['location','geometry','time'])
-        gdf.crs = {'init' :'epsg:27700'}
-
-        # for each item in sort list
+        # gather rows into lists
+        locations = []; times = []
         for entry in sortList:
-            datetime = entry[ 0 ]
-
-            # insert datetime and associated raster pathnames into index file
             for location in entry[ 1 ]:
-                gdf = gdf.append({  'location': location, 
-                                    'geometry': getRasterBounds( location ), 
-                                    'time': datetime }, 
-                                    ignore_index=True )
+                locations.append( location )
+                times.append( entry[ 0 ] )
+
+        # single construction of geodataframe from concurrently computed footprints
+        gdf = gpd.GeoDataFrame( {   'location' : locations, 
+                                    'time' : times,
+                                    'generation' : [ generations[ location ] for location in locations ] }, 
+                                    geometry=getRasterBoundsList( locations, workers=args.workers, backend=args.backend ), 
+                                    crs='epsg:27700' )
+
+        # merge with retained rows
+        if existing is not None:
+            gdf = gpd.GeoDataFrame( pd.concat( [ existing, gdf ], ignore_index=True ), crs=gdf.crs )
+            gdf = gdf.sort_values( 'time', kind='stable' )
 
         # save to shape file
         if not os.path.exists( os.path.dirname( args.out_pathname ) ):
             os.makedirs( os.path.dirname( args.out_pathname ) )
 
-        print( 'created: {}'.format( args.out_pathname ) )
-        gdf.to_file( args.out_pathname )
+        print( '{}: {}'.format( 'updated' if existing is not None else 'created', args.out_pathname ) )
+        writeIndex( gdf, args.out_pathname )
 
     return
 
@@ -0,0 +1,74 @@
+import io
+
+from src.utility.gsclient import GsClient, ListingCache
+
+
+def getRecord( name, generation=1 ):
+    return { 'name' : name, 'size' : 1, 'generation' : generation, 'md5' : None, 'updated' : None, 'source' : None }
+
+
+def test_cacheServesCoveredPrefix( tmp_path ):
+
+    cache = ListingCache( str( tmp_path / 'cache.db' ), ttl=3600 )
+    assert cache.getBlobs( 'bucket', 'ard/1' ) is None
+
+    cache.refresh( 'bucket', 'ard', [ getRecord( 'ard/1/a' ), getRecord( 'ard/2/b' ) ] )
+    assert [ record[ 'name' ] for record in cache.getBlobs( 'bucket', 'ard/1' ) ] == [ 'ard/1/a' ]
+    assert cache.getBlobs( 'other', 'ard/1' ) is None
+
+
+def test_cacheRefreshWritesOnlyChanges( tmp_path ):
+
+    cache = ListingCache( str( tmp_path / 'cache.db' ), ttl=3600 )
+    assert cache.refresh( 'bucket', 'ard', [ getRecord( 'ard/a' ), getRecord( 'ard/b' ) ] ) == ( 2, 0 )
+    assert cache.refresh( 'bucket', 'ard', [ getRecord( 'ard/a' ), getRecord( 'ard/b', generation=2 ) ] ) == ( 1, 0 )
+    assert cache.refresh( 'bucket', 'ard', [ getRecord( 'ard/a' ) ] ) == ( 0, 1 )
+
+
+def test_cacheExpiresByTtl( tmp_path ):
+
+    cache = ListingCache( str( tmp_path / 'cache.db' ), ttl=0 )
+    cache.refresh( 'bucket', 'ard', [ getRecord( 'ard/a' ) ] )
+    assert cache.getBlobs( 'bucket', 'ard' ) is None
+
+
+def test_cacheInvalidatesCoveringPrefixes( tmp_path ):
+
+    cache = ListingCache( str( tmp_path / 'cache.db' ), ttl=3600 )
+    cache.refresh( 'bucket', 'ard', [] )
+    cache.refresh( 'bucket', 'ard/1', [] )
+    cache.refresh( 'bucket', 'cog', [] )
+
+    assert cache.invalidate( 'bucket', [ 'ard/1/a' ] ) == 2
+    assert cache.getBlobs( 'bucket', 'ard' ) is None
+    assert cache.getBlobs( 'bucket', 'cog' ) == []
+
+
+def test_clientWritesExpireCachedListing( tmp_path ):
+
+    ( tmp_path / 'storage' / 'bucket' ).mkdir( parents=True )
+    client = GsClient( 'bucket', endpoint=str( tmp_path / 'storage' ), cache_ttl=3600, cache_pathname=str( tmp_path / 'cache.db' ) )
+
+    client.uploadStream( io.BytesIO( b'a' ), 'ard/a' )
+    assert [ record[ 'name' ] for record in client.getBlobRecords( 'ard' ) ] == [ 'ard/a' ]
+
+    # upload, copy and delete all visible on next listing
+    client.uploadStream( io.BytesIO( b'b' ), 'ard/b' )
+    assert [ record[ 'name' ] for record in client.getBlobRecords( 'ard' ) ] == [ 'ard/a', 'ard/b' ]
+
+    client.copyBlob( 'ard/a', dst_name='ard/c' )
+    assert [ record[ 'name' ] for record in client.getBlobRecords( 'ard' ) ] == [ 'ard/a', 'ard/b', 'ard/c' ]
+
+    client.deleteBlobs( [ 'ard/a', 'ard/b' ] )
+    assert [ record[ 'name' ] for record in client.getBlobRecords( 'ard' ) ] == [ 'ard/c' ]
+
+
+def test_cachedNamesFilteredByGlob( tmp_path ):
+
+    ( tmp_path / 'storage' / 'bucket' ).mkdir( parents=True )
+    client = GsClient( 'bucket', endpoint=str( tmp_path / 'storage' ), cache_ttl=3600, cache_pathname=str( tmp_path / 'cache.db' ) )
+
+    for name in [ 'ard/a.TIF', 'ard/1/b.TIF' ]:
+        client.uploadStream( io.BytesIO( b'x' ), name )
+
+    assert list( client.iterBlobNames( 'ard', match_glob='ard/*.TIF' ) ) == [ 'ard/a.TIF' ]
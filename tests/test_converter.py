@@ -0,0 +1,50 @@
+import yaml
+import pytest
+
+gdal = pytest.importorskip( 'gdal' )
+
+from src.utility import converter
+
+
+def test_defaultProfiles():
+
+    profiles = converter.getProfiles()
+
+    assert sorted( profiles ) == [ 'ms', 'pan', 'wms' ]
+    assert profiles[ 'wms' ][ 'COMPRESS' ] == 'JPEG' and profiles[ 'pan' ][ 'BLOCKSIZE' ] == 512
+
+    # defaults not mutated by callers
+    profiles[ 'pan' ][ 'LEVEL' ] = 1
+    assert converter.getProfiles()[ 'pan' ][ 'LEVEL' ] == 6
+
+
+@pytest.mark.parametrize( 'document', [ { 'repository' : { 'cog-profiles' : { 'pan' : { 'LEVEL' : 9 }, 'dem' : { 'COMPRESS' : 'LZW' } } } },
+                                        { 'cog-profiles' : { 'pan' : { 'LEVEL' : 9 }, 'dem' : { 'COMPRESS' : 'LZW' } } } ] )
+def test_profilesMergedFromYaml( tmp_path, document ):
+
+    pathname = str( tmp_path / 'profiles.yml' )
+    with open( pathname, 'w' ) as fp:
+        yaml.safe_dump( document, fp )
+
+    profiles = converter.getProfiles( pathname )
+
+    # overrides merged onto defaults - new profiles added
+    assert profiles[ 'pan' ][ 'LEVEL' ] == 9 and profiles[ 'pan' ][ 'COMPRESS' ] == 'DEFLATE'
+    assert profiles[ 'dem' ] == { 'COMPRESS' : 'LZW' }
+
+
+def test_repositoryWithoutProfiles( tmp_path ):
+
+    pathname = str( tmp_path / 'repository.yml' )
+    with open( pathname, 'w' ) as fp:
+        yaml.safe_dump( { 'repository' : { 'name' : 'gla' } }, fp )
+
+    assert converter.getProfiles( pathname ) == converter.getProfiles()
+
+
+def test_creationOptionsExcludeConfig():
+
+    options = converter.getCreationOptions( converter.getProfiles()[ 'wms' ] )
+
+    assert 'QUALITY=85' in options
+    assert not any( option.startswith( 'GDAL_' ) for option in options )
@@ -0,0 +1,62 @@
+import os
+
+from src.utility import fs
+
+
+def makeTree( root, names ):
+
+    for name in names:
+        pathname = os.path.join( str( root ), name )
+        os.makedirs( os.path.dirname( pathname ), exist_ok=True )
+        open( pathname, 'w' ).close()
+
+    return str( root )
+
+
+def getTree( root, **kwargs ):
+    return { os.path.relpath( pathname, root ) for pathname in fs.getFileList( root, '.*', **kwargs ) }
+
+
+def test_matchesWalk( tmp_path ):
+
+    names = [ 'a.TIF', 'x/b.TIF', 'x/y/c.txt', 'z/d.TIF' ]
+    root = makeTree( tmp_path, names )
+
+    walked = { os.path.relpath( os.path.join( path, name ), root ) for path, dirs, files in os.walk( root ) for name in files }
+    assert getTree( root ) == walked == set( names )
+    assert fs.getPathNameList( root, r'\.TIF$' ) and all( name.endswith( '.TIF' ) for name in fs.getPathNameList( root, r'\.TIF$' ) )
+
+
+def test_prefixPrunesSiblings( tmp_path ):
+
+    root = makeTree( tmp_path, [ 'top.TIF', 'x/b.TIF', 'x/y/c.TIF', 'x/yz/d.TIF', 'z/e.TIF' ] )
+    prefix = os.path.join( root, 'x', 'y' )
+
+    # prefix matched on path string - siblings sharing stem kept, ancestor files dropped
+    assert getTree( root, prefix=prefix ) == { 'x/y/c.TIF', 'x/yz/d.TIF' }
+
+    visited = [ os.path.relpath( path, root ) for path, files in fs.scanTree( root, prefix=prefix ) ]
+    assert 'z' not in visited
+
+
+def test_symlinkedDirectoriesSkipped( tmp_path ):
+
+    root = makeTree( tmp_path / 'root', [ 'x/a.TIF' ] )
+    os.symlink( os.path.join( root, 'x' ), os.path.join( root, 'link' ) )
+    os.symlink( root, os.path.join( root, 'x', 'loop' ) )
+
+    assert getTree( root ) == { 'x/a.TIF' }
+
+
+def test_singleMatch( tmp_path ):
+
+    root = makeTree( tmp_path, [ 'x/a.TIF', 'x/b.TIF', 'y/c.xml' ] )
+
+    assert fs.getFile( root, r'\.xml$' ) == os.path.join( root, 'y', 'c.xml' )
+    assert fs.getFile( root, r'\.TIF$' ) is None
+    assert fs.getPath( root, r'y$' ) == os.path.join( root, 'y' )
+
+
+def test_missingRoot( tmp_path ):
+
+    assert fs.getFileList( str( tmp_path / 'missing' ), '.*' ) == []
@@ -0,0 +1,82 @@
+from src.utility.localstorage import compileGlob
+
+
+def test_globStarStopsAtDelimiter():
+
+    glob = compileGlob( 'ard/*.TIF' )
+    assert glob.match( 'ard/a.TIF' ) is not None
+    assert glob.match( 'ard/1/a.TIF' ) is None
+
+
+def test_globDoubleStarSpansDirectories():
+
+    glob = compileGlob( 'ard/**.TIF' )
+    assert glob.match( 'ard/1/2/a.TIF' ) is not None
+    assert glob.match( 'ard/1/2/a.TIF.aux.xml' ) is None
+
+
+def test_globClassesAndAlternation():
+
+    assert compileGlob( 'a[!0-9].{TIF,tif}' ).match( 'ab.tif' ) is not None
+    assert compileGlob( 'a[!0-9].{TIF,tif}' ).match( 'a1.TIF' ) is None
+    assert compileGlob( 'a?.TIF' ).match( 'a/.TIF' ) is None
+
+
+def test_listingFansOutBelowUndelimitedPrefix( client, put ):
+
+    names = put( [ 'ard/0/a.TIF', 'ard/1/b.TIF', 'ardx/c.TIF', 'ard.TIF', 'other/d.TIF' ] )
+
+    calls = []
+    list_blobs = client._bucket.list_blobs
+    def record( **kwargs ):
+        calls.append( ( kwargs[ 'prefix' ], kwargs.get( 'delimiter' ) ) )
+        return list_blobs( **kwargs )
+
+    client._bucket.list_blobs = record
+
+    assert sorted( blob.name for blob in client.iterBlobs( 'ard' ) ) == sorted( name for name in names if name.startswith( 'ard' ) )
+
+    # shallow listing of prefix then concurrent deep listing of each sub-prefix
+    assert calls[ 0 ] == ( 'ard', '/' )
+    assert sorted( calls[ 1 : ] ) == [ ( 'ard/', None ), ( 'ardx/', None ) ]
+
+
+def test_listingDescendsSingleSubPrefix( client, put ):
+
+    put( [ 'ard/38012/0/a.TIF', 'ard/38012/1/b.TIF' ] )
+
+    calls = []
+    list_blobs = client._bucket.list_blobs
+    def record( **kwargs ):
+        calls.append( ( kwargs[ 'prefix' ], kwargs.get( 'delimiter' ) ) )
+        return list_blobs( **kwargs )
+
+    client._bucket.list_blobs = record
+    assert len( list( client.iterBlobs( 'ard' ) ) ) == 2
+
+    # single sub-prefix levels descended until listing fans out
+    assert calls[ : 3 ] == [ ( 'ard', '/' ), ( 'ard/', '/' ), ( 'ard/38012/', '/' ) ]
+    assert sorted( calls[ 3 : ] ) == [ ( 'ard/38012/0/', None ), ( 'ard/38012/1/', None ) ]
+
+
+def test_listingGlobAppliedAtEveryLevel( client, put ):
+
+    put( [ 'ard/a.TIF', 'ard/1/b.TIF', 'ard/1/b.TIF.aux.xml', 'ard/2/c.tif' ] )
+
+    assert sorted( client.iterBlobNames( 'ard', match_glob='ard/**.TIF' ) ) == [ 'ard/1/b.TIF', 'ard/a.TIF' ]
+    assert sorted( client.iterBlobNames( 'ard', match_glob='ard/*.TIF' ) ) == [ 'ard/a.TIF' ]
+
+
+def test_listingPatternAnchored( client, put ):
+
+    put( [ 'ard/1/x_MS_y.TIF', 'ard/1/x_MS_y.TIF.aux.xml', 'ard/1/x_PAN_y.TIF' ] )
+    assert client.getBlobNameList( 'ard', '.*_MS_.*TIF$' ) == [ 'ard/1/x_MS_y.TIF' ]
+
+
+def test_imageUrisReadableLocally( client, put ):
+
+    put( [ 'ard/1/a.TIF' ] )
+    uris = client.getImageUriList( 'ard', pattern='TIF$' )
+
+    with open( uris[ 0 ], 'rb' ) as fp:
+        assert fp.read() == b'ard/1/a.TIF'
@@ -0,0 +1,25 @@
+import pytest
+import numpy as np
+
+gdal = pytest.importorskip( 'gdal' )
+pytest.importorskip( 'psycopg2' )
+
+from src.database.raster.loader import Loader
+
+
+@pytest.mark.parametrize( 'nodata, dtype, expected', [ ( None, np.uint8, None ),
+                                                         ( -9999.0, np.uint8, 0 ),
+                                                         ( 65535.0, np.uint8, 255 ),
+                                                         ( 12.6, np.int16, 13 ),
+                                                         ( -1e10, np.int32, np.iinfo( np.int32 ).min ),
+                                                         ( float( 'nan' ), np.uint16, None ),
+                                                         ( 1e40, np.float32, float( np.finfo( np.float32 ).max ) ),
+                                                         ( -9999.0, np.float64, -9999.0 ) ] )
+def test_noDataClampedToPixelType( nodata, dtype, expected ):
+
+    assert Loader.getNoDataValue( nodata, dtype ) == expected
+
+
+def test_nanNoDataKeptForFloat():
+
+    assert np.isnan( Loader.getNoDataValue( float( 'nan' ), np.float32 ) )
@@ -0,0 +1,123 @@
+import io
+import os
+import pytest
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from src.utility.localstorage import LocalClient
+
+
+@pytest.fixture
+def bucket( tmp_path ):
+
+    ( tmp_path / 'bucket' ).mkdir()
+    bucket = LocalClient( str( tmp_path ) ).bucket( 'bucket' )
+    for name in [ 'a/1.TIF', 'a/b/2.TIF', 'a/b/c/3.TIF', 'a/d/4.TIF', 'ab.TIF' ]:
+        bucket.blob( name ).upload_from_string( name )
+
+    return bucket
+
+
+def test_listRecursive( bucket ):
+
+    assert [ blob.name for blob in bucket.list_blobs( prefix='a/' ) ] == [ 'a/1.TIF', 'a/b/2.TIF', 'a/b/c/3.TIF', 'a/d/4.TIF' ]
+    assert [ blob.name for blob in bucket.list_blobs( prefix='a' ) ][ -1 ] == 'ab.TIF'
+
+
+def test_listDelimiter( bucket ):
+
+    blobs = bucket.list_blobs( prefix='a/', delimiter='/' )
+    pages = list( blobs.pages )
+
+    assert [ blob.name for blob in pages[ 0 ] ] == [ 'a/1.TIF' ]
+    assert pages[ 0 ].prefixes == { 'a/b/', 'a/d/' }
+
+
+def test_listHidesInternalFiles( bucket ):
+
+    blob = bucket.blob( 'a/e.TIF' ); blob.metadata = { 'key' : 'value' }
+    blob.upload_from_string( b'e' )
+
+    assert os.path.exists( blob.meta_pathname )
+    assert [ blob.name for blob in bucket.list_blobs( prefix='a/e' ) ] == [ 'a/e.TIF' ]
+
+
+def test_metadataAndChecksums( bucket ):
+
+    blob = bucket.get_blob( 'a/1.TIF' )
+    assert blob.size == len( 'a/1.TIF' ) and blob.md5_hash is not None and blob.crc32c is not None
+    assert bucket.get_blob( 'missing' ) is None
+
+    with pytest.raises( NotFound ):
+        bucket.blob( 'missing' ).reload()
+
+
+def test_generationPinning( bucket ):
+
+    generation = bucket.get_blob( 'a/1.TIF' ).generation
+    pathname = bucket.blob( 'a/1.TIF' ).pathname
+    os.utime( pathname, ns=( generation, generation + 10 ** 9 ) )
+
+    # stale generation no longer readable or deletable
+    with pytest.raises( NotFound ):
+        bucket.blob( 'a/1.TIF', generation=generation ).reload()
+
+    with pytest.raises( NotFound ):
+        bucket.copy_blob( bucket.blob( 'a/1.TIF' ), bucket, 'copy.TIF', source_generation=generation )
+
+    with pytest.raises( PreconditionFailed ):
+        bucket.blob( 'a/1.TIF' ).delete( if_generation_match=generation )
+
+    bucket.blob( 'a/1.TIF' ).delete( if_generation_match=generation + 10 ** 9 )
+    assert not bucket.blob( 'a/1.TIF' ).exists()
+
+    with pytest.raises( NotFound ):
+        bucket.blob( 'a/1.TIF' ).delete()
+
+
+def test_composeAndRanges( bucket ):
+
+    blob = bucket.blob( 'composed.TIF' )
+    blob.compose( [ bucket.blob( 'a/1.TIF' ), bucket.blob( 'ab.TIF' ) ] )
+
+    assert blob.download_as_bytes() == b'a/1.TIFab.TIF'
+    assert blob.download_as_bytes( start=2, end=6 ) == b'1.TIF'
+
+
+def test_copyAndRewriteCarryMetadata( bucket ):
+
+    src = bucket.blob( 'src.TIF' ); src.metadata = { 'source-md5' : 'abc' }
+    src.upload_from_string( b'data' )
+
+    bucket.copy_blob( bucket.get_blob( 'src.TIF' ), bucket, 'copy.TIF' )
+    assert bucket.get_blob( 'copy.TIF' ).metadata == { 'source-md5' : 'abc' }
+
+    dst = bucket.blob( 'rewrite.TIF' )
+    token, written, total = dst.rewrite( bucket.get_blob( 'src.TIF' ) )
+    assert token is None and written == total == 4
+    assert bucket.get_blob( 'rewrite.TIF' ).metadata == { 'source-md5' : 'abc' }
+
+
+def test_patchMetadata( bucket ):
+
+    blob = bucket.blob( 'a/1.TIF' ); blob.metadata = { 'key' : 'value' }
+    blob.patch()
+    assert bucket.get_blob( 'a/1.TIF' ).metadata == { 'key' : 'value' }
+
+    blob.metadata = None; blob.patch()
+    assert bucket.get_blob( 'a/1.TIF' ).metadata is None
+
+    with pytest.raises( NotFound ):
+        bucket.blob( 'missing' ).patch()
+
+
+def test_failedWriteKeepsObject( bucket ):
+
+    class Broken( io.RawIOBase ):
+        def readinto( self, buffer ):
+            raise IOError( 'connection reset' )
+
+    with pytest.raises( IOError ):
+        bucket.blob( 'a/1.TIF' ).upload_from_file( Broken() )
+
+    assert bucket.blob( 'a/1.TIF' ).download_as_bytes() == b'a/1.TIF'
+    assert [ name for name in os.listdir( os.path.join( bucket.path, 'a' ) ) if name.startswith( '.tmp' ) ] == []
@@ -0,0 +1,70 @@
+import io
+
+from src.utility.gsclient import GsClient
+
+
+def getRecords( client, prefix ):
+    return { record[ 'name' ] : record for record in client.getBlobRecords( prefix ) }
+
+
+def test_recordNamesFiltered():
+
+    records = [ { 'name' : 'ard/1/a_MS_1.TIF' }, { 'name' : 'ard/1/a_MS_1.TIF.aux.xml' }, { 'name' : 'ard/1/a_PAN_1.TIF' } ]
+    assert GsClient.getRecordNames( records, '.*_MS_.*TIF$' ) == [ 'ard/1/a_MS_1.TIF' ]
+
+
+def test_missingOutputsByDirectory( client, put ):
+
+    names = put( [ 'ard/1/x/a.TIF', 'ard/1/y/b.TIF' ] )
+    put( [ 'cog/1/x/a.TIF' ] )
+
+    assert client.getMissingOutputs( names, 'ard', 'cog', '.*TIF$' ) == [ 'ard/1/y/b.TIF' ]
+
+
+def test_derivedOutputFreshWhileSourceUnchanged( client, put ):
+
+    names = put( [ 'ard/1/x/a.TIF' ] )
+    records = getRecords( client, 'ard' )
+    put( [ 'cog/1/x/a.TIF' ], metadata=GsClient.getSourceMetadata( records[ names[ 0 ] ] ) )
+
+    assert client.getMissingOutputs( names, 'ard', 'cog', '.*TIF$', compare='md5', inputs=records ) == []
+
+    # input replaced - output generated from previous md5 now stale
+    client.uploadStream( io.BytesIO( b'changed' ), names[ 0 ] )
+    assert client.getMissingOutputs( names, 'ard', 'cog', '.*TIF$', compare='md5' ) == names
+
+
+def test_copiedOutputComparedByChecksum( client, put ):
+
+    names = put( [ 'ard/1/x/a.TIF' ] )
+    client.uploadStream( io.BytesIO( b'ard/1/x/a.TIF' ), 'cog/1/x/a.TIF' )
+    assert client.getMissingOutputs( names, 'ard', 'cog', '.*TIF$', compare='md5' ) == []
+
+    client.uploadStream( io.BytesIO( b'different' ), 'cog/1/x/a.TIF' )
+    assert client.getMissingOutputs( names, 'ard', 'cog', '.*TIF$', compare='md5' ) == names
+
+
+def test_staleWithoutChecksums( client ):
+
+    record = { 'name' : 'ard/a.TIF', 'size' : 1, 'md5' : None, 'updated' : '2020-01-01' }
+    outputs = { 'a.TIF' : { 'name' : 'cog/a.TIF', 'size' : 1, 'md5' : None, 'source' : None, 'updated' : '2021-01-01' } }
+
+    assert client.isStale( record, outputs, 'md5' )
+    assert not client.isStale( record, outputs, 'updated' )
+    assert client.isStale( None, outputs, 'updated' )
+
+
+def test_metadataRoundTrip( client, put ):
+
+    put( [ 'cog/a.TIF' ], metadata={ 'source-md5' : 'abc' } )
+    assert getRecords( client, 'cog' )[ 'cog/a.TIF' ][ 'source' ] == 'abc'
+
+    # copies carry metadata, plain overwrite clears it
+    client.copyBlob( 'cog/a.TIF', dst_name='cog/b.TIF' )
+    assert getRecords( client, 'cog' )[ 'cog/b.TIF' ][ 'source' ] == 'abc'
+
+    client.uploadStream( io.BytesIO( b'x' ), 'cog/a.TIF' )
+    assert getRecords( client, 'cog' )[ 'cog/a.TIF' ][ 'source' ] is None
+
+    client.setMetadata( 'cog/a.TIF', { 'source-md5' : 'def' } )
+    assert getRecords( client, 'cog' )[ 'cog/a.TIF' ][ 'source' ] == 'def'
@@ -0,0 +1,34 @@
+import pytest
+
+from datetime import datetime
+from src.utility import parser
+
+pd = pytest.importorskip( 'pandas' )
+
+
+pathnames = [ 'ard/36012/20200115_101010/image_MS_1.TIF', 'ard/36013/20201231_235959/image_PAN_1.TIF', 'ard/misc/readme.txt' ]
+
+
+def test_scalarParse():
+
+    assert parser.getDateTimeString( pathnames[ 0 ] ) == '20200115_101010'
+    assert parser.getDateTime( pathnames[ 1 ] ) == datetime( 2020, 12, 31, 23, 59, 59 )
+    assert parser.getTle( pathnames[ 0 ] ) == '36012'
+
+    assert parser.getDateTime( pathnames[ 2 ] ) is None
+    assert parser.getTle( pathnames[ 2 ] ) is None
+
+
+@pytest.mark.parametrize( 'values', [ pathnames, pd.Series( pathnames ) ] )
+def test_batchMatchesScalar( values ):
+
+    datetimes = parser.getDateTimes( values )
+    tles = parser.getTles( values )
+
+    for idx, pathname in enumerate( pathnames[ : 2 ] ):
+        assert datetimes[ idx ].to_pydatetime() == parser.getDateTime( pathname )
+        assert tles[ idx ] == parser.getTle( pathname )
+
+    # missing components reported as nat / nan
+    assert pd.isna( datetimes[ 2 ] ) and pd.isna( tles[ 2 ] )
+    assert list( parser.getDateTimeStrings( values )[ : 2 ] ) == [ '20200115_101010', '20201231_235959' ]
@@ -0,0 +1,66 @@
+import threading
+
+from src.utility.pipeline import Pipeline, ScratchBudget
+
+
+def test_itemsFlowThroughStages():
+
+    stages = [ ( 'double', lambda x : x * 2, 2 ), ( 'increment', lambda x : x + 1, 3 ) ]
+    completed, failures = Pipeline( stages ).run( range( 20 ) )
+
+    assert sorted( completed ) == [ x * 2 + 1 for x in range( 20 ) ]
+    assert failures == []
+
+
+def test_failuresRecordedAndDropped():
+
+    def check( x ):
+        if x % 3 == 0:
+            raise ValueError( x )
+        return x
+
+    dropped = []
+    completed, failures = Pipeline( [ ( 'check', check, 2 ), ( 'keep', lambda x : x, 1 ) ], on_drop=dropped.append ).run( range( 9 ) )
+
+    assert sorted( completed ) == [ 1, 2, 4, 5, 7, 8 ]
+    assert sorted( item for name, item, e in failures ) == [ 0, 3, 6 ]
+    assert sorted( dropped ) == [ 0, 3, 6 ]
+
+
+def test_drainsWhenDropHandlerRaises():
+
+    def drop( item ):
+        raise RuntimeError( 'cleanup' )
+
+    # more items than queue capacity - dead workers would block the feed
+    pipeline = Pipeline( [ ( 'none', lambda x : None, 1 ), ( 'keep', lambda x : x, 1 ) ], queue_size=1, on_drop=drop )
+
+    result = []
+    thread = threading.Thread( target=lambda : result.append( pipeline.run( range( 10 ) ) ) )
+    thread.start(); thread.join( 10 )
+
+    assert not thread.is_alive()
+    completed, failures = result[ 0 ]
+    assert completed == [] and len( failures ) == 10
+
+
+def test_scratchBudgetBlocksUntilReleased():
+
+    budget = ScratchBudget( 10 )
+    budget.acquire( 8 )
+
+    acquired = threading.Event()
+    thread = threading.Thread( target=lambda : ( budget.acquire( 5 ), acquired.set() ) )
+    thread.start()
+
+    assert not acquired.wait( 0.2 )
+    budget.release( 8 )
+    assert acquired.wait( 5 )
+    thread.join()
+
+
+def test_scratchBudgetAdmitsOversizeWhenIdle():
+
+    budget = ScratchBudget( 10 )
+    assert budget.acquire( 50 ) == 50
+    budget.release( 50 )
@@ -0,0 +1,30 @@
+import sys
+
+from src.utility import ps
+
+
+def test_outputStreamedToHandlers():
+
+    chunks = []
+    result = ps.executeStreaming( sys.executable, [ '-c', 'import sys; print( "out" ); print( "err", file=sys.stderr )' ], on_stdout=chunks.append )
+
+    assert b''.join( chunks ).strip() == b'out'
+    assert result.out == b'' and result.err.strip() == b'err'
+    assert result.code == 0 and not result.timed_out
+
+
+def test_timeoutKillsProcess():
+
+    result = ps.executeStreaming( sys.executable, [ '-c', 'import time; time.sleep( 30 )' ], timeout=0.5 )
+
+    assert result.timed_out
+    assert result.code != 0
+    assert result.elapsed < 10
+
+
+def test_manyResultsInCommandOrder():
+
+    commands = [ ( sys.executable, [ '-c', 'import sys; sys.exit( {} )'.format( code ) ] ) for code in range( 6 ) ]
+    results = ps.executeMany( commands, concurrency=2 )
+
+    assert [ result.code for result in results ] == list( range( 6 ) )
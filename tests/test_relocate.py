@@ -0,0 +1,127 @@
+import io
+import os
+import json
+
+
+def getContent( client, name ):
+
+    blob = client.getBlob( name )
+    return blob.download_as_bytes() if blob.exists() else None
+
+
+def replace( client, name, data ):
+
+    """
+    overwrite blob - generation bumped past any earlier write
+    """
+
+    client.uploadStream( io.BytesIO( data ), name )
+    pathname = client.getBlob( name ).pathname
+    os.utime( pathname, ns=( os.stat( pathname ).st_atime_ns, os.stat( pathname ).st_mtime_ns + 10 ** 9 ) )
+    return
+
+
+def getRecords( client, prefix ):
+    return list( client.getBlobRecords( prefix ) )
+
+
+def test_move( client, put ):
+
+    names = put( [ 'in/a.TIF', 'in/b.TIF' ] )
+    plan = client.relocateBlobs( [ ( name, name.replace( 'in/', 'out/' ) ) for name in names ], records=getRecords( client, 'in' ) )
+
+    assert [ entry[ 'status' ] for entry in plan ] == [ 'done', 'done' ]
+    assert getContent( client, 'out/a.TIF' ) == b'in/a.TIF'
+    assert getContent( client, 'in/a.TIF' ) is None
+
+
+def test_copyKeepsSource( client, put ):
+
+    put( [ 'in/a.TIF' ] )
+    plan = client.relocateBlobs( [ ( 'in/a.TIF', '/out/a.TIF' ) ], copy=True )
+
+    assert plan[ 0 ][ 'status' ] == 'done' and plan[ 0 ][ 'dst' ] == 'out/a.TIF'
+    assert getContent( client, 'out/a.TIF' ) == getContent( client, 'in/a.TIF' ) == b'in/a.TIF'
+
+
+def test_dryRunAndIdentical( client, put ):
+
+    put( [ 'in/a.TIF' ] )
+    plan = client.relocateBlobs( [ ( 'in/a.TIF', 'out/a.TIF' ), ( 'in/a.TIF', 'in/a.TIF' ) ], dry_run=True )
+
+    assert [ entry[ 'status' ] for entry in plan ] == [ 'planned', 'skipped' ]
+    assert getContent( client, 'out/a.TIF' ) is None
+
+
+def test_largeObjectsRewritten( client, put ):
+
+    put( [ 'in/a.TIF' ] )
+    plan = client.relocateBlobs( [ ( 'in/a.TIF', 'out/a.TIF' ) ], records=getRecords( client, 'in' ), rewrite_threshold=1 )
+
+    assert plan[ 0 ][ 'method' ] == 'rewrite' and plan[ 0 ][ 'status' ] == 'done'
+    assert getContent( client, 'out/a.TIF' ) == b'in/a.TIF'
+
+
+def test_checkpointResume( client, put, tmp_path ):
+
+    checkpoint = str( tmp_path / 'checkpoint.jsonl' )
+    put( [ 'in/a.TIF', 'in/b.TIF' ] )
+    records = getRecords( client, 'in' )
+
+    # previous run copied a but was interrupted before source delete
+    generation = { record[ 'name' ] : record[ 'generation' ] for record in records }[ 'in/a.TIF' ]
+    client.copyBlob( 'in/a.TIF', dst_name='out/a.TIF' )
+    with open( checkpoint, 'w' ) as fp:
+        fp.write( json.dumps( { 'src' : 'in/a.TIF', 'dst' : 'out/a.TIF', 'generation' : generation, 'source_generation' : generation, 'state' : 'copied' } ) + '\n' )
+
+    pairs = [ ( 'in/a.TIF', 'out/a.TIF' ), ( 'in/b.TIF', 'out/b.TIF' ) ]
+    plan = client.relocateBlobs( pairs, records=records, checkpoint=checkpoint )
+
+    assert [ entry[ 'method' ] for entry in plan ] == [ 'delete', 'copy' ]
+    assert [ entry[ 'status' ] for entry in plan ] == [ 'done', 'done' ]
+    assert getContent( client, 'in/a.TIF' ) is None and getContent( client, 'out/b.TIF' ) == b'in/b.TIF'
+
+    # completed relocations not repeated
+    plan = client.relocateBlobs( pairs, records=records, checkpoint=checkpoint )
+    assert [ entry[ 'status' ] for entry in plan ] == [ 'done', 'done' ]
+
+
+def test_checkpointIgnoredForNewGeneration( client, put, tmp_path ):
+
+    checkpoint = str( tmp_path / 'checkpoint.jsonl' )
+    put( [ 'in/a.TIF' ] )
+    client.relocateBlobs( [ ( 'in/a.TIF', 'out/a.TIF' ) ], records=getRecords( client, 'in' ), checkpoint=checkpoint )
+
+    # source re-created under same name - relocated again
+    replace( client, 'in/a.TIF', b'new' )
+    plan = client.relocateBlobs( [ ( 'in/a.TIF', 'out/a.TIF' ) ], records=getRecords( client, 'in' ), checkpoint=checkpoint )
+
+    assert plan[ 0 ][ 'status' ] == 'done' and plan[ 0 ][ 'method' ] == 'copy'
+    assert getContent( client, 'out/a.TIF' ) == b'new'
+
+
+def test_changedSourceNotCopied( client, put ):
+
+    put( [ 'in/a.TIF' ] )
+    records = getRecords( client, 'in' )
+
+    # source overwritten after listing - copy pinned to listed generation fails
+    replace( client, 'in/a.TIF', b'new' )
+    plan = client.relocateBlobs( [ ( 'in/a.TIF', 'out/a.TIF' ) ], records=records )
+
+    assert plan[ 0 ][ 'status' ] == 'failed'
+    assert getContent( client, 'in/a.TIF' ) == b'new' and getContent( client, 'out/a.TIF' ) is None
+
+
+def test_deleteSourcesKeepsChangedSource( client, put ):
+
+    put( [ 'in/a.TIF', 'in/b.TIF' ] )
+    generations = { record[ 'name' ] : record[ 'generation' ] for record in getRecords( client, 'in' ) }
+
+    # source rewritten after copy - newer generation survives delete
+    replace( client, 'in/a.TIF', b'new' )
+    entries = [ { 'src' : name, 'source_generation' : generations.get( name ), 'status' : 'copied' } for name in [ 'in/a.TIF', 'in/b.TIF', 'in/c.TIF' ] ]
+    client.deleteSources( entries )
+
+    assert [ entry[ 'status' ] for entry in entries ] == [ 'failed', 'done', 'done' ]
+    assert getContent( client, 'in/a.TIF' ) == b'new' and getContent( client, 'in/b.TIF' ) is None
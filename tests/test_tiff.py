@@ -0,0 +1,138 @@
+import io
+import struct
+import pytest
+
+from src.utility import tiff
+
+
+def getTiff( order='<', bigtiff=False, nodata=None ):
+
+    """
+    build minimal tiff - image data then single ifd with samples per pixel and optional nodata
+    """
+
+    layout = { 'order' : order, 'bigtiff' : bigtiff }
+    count_fmt, entry_fmt, next_fmt = tiff.getEntryFormat( layout )
+    inline_size = 8 if bigtiff else 4
+
+    data = bytes( range( 64 ) )
+    header_size = 16 if bigtiff else 8
+    ifd_offset = header_size + len( data )
+
+    entries = [ [ tiff.SAMPLES_PER_PIXEL, 3, 1, struct.pack( order + 'H', 4 ).ljust( inline_size, b'\x00' ) ] ]
+    if nodata is not None:
+        entries.append( [ tiff.GDAL_NODATA, 2, len( nodata ) + 1, ( nodata.encode() + b'\x00' ).ljust( inline_size, b'\x00' ) ] )
+
+    ifd = struct.pack( count_fmt, len( entries ) )
+    for entry in entries:
+        ifd += struct.pack( entry_fmt, *entry )
+    ifd += struct.pack( next_fmt, 0 )
+
+    magic = b'II' if order == '<' else b'MM'
+    if bigtiff:
+        header = magic + struct.pack( order + 'HHHQ', 43, 8, 0, ifd_offset )
+    else:
+        header = magic + struct.pack( order + 'HI', 42, ifd_offset )
+
+    return header + data + ifd
+
+
+def getReader( buffer ):
+    return lambda offset, size : buffer[ offset : offset + size ]
+
+
+def getNoData( buffer ):
+
+    """
+    parse nodata text from first ifd - inline or by offset
+    """
+
+    layout = tiff.getLayout( buffer[ 0 : 16 ] )
+    entries, next_offset = tiff.readIfd( layout, getReader( buffer ) )
+
+    for tag, field_type, count, value in entries:
+        if tag == tiff.GDAL_NODATA:
+            if count > len( value ):
+                offset = struct.unpack( layout[ 'order' ] + ( 'Q' if layout[ 'bigtiff' ] else 'I' ), value )[ 0 ]
+                value = buffer[ offset : offset + count ]
+            return value[ : count - 1 ].decode()
+
+    return None
+
+
+def patch( buffer, nodata ):
+
+    layout = tiff.getLayout( buffer[ 0 : 16 ] )
+    entries, next_offset = tiff.readIfd( layout, getReader( buffer ) )
+    header, tail = tiff.getNoDataPatch( layout, entries, next_offset, len( buffer ), nodata )
+
+    return header + buffer[ len( header ) : ] + tail
+
+
+@pytest.mark.parametrize( 'order', [ '<', '>' ] )
+@pytest.mark.parametrize( 'bigtiff', [ False, True ] )
+def test_layoutAndIfd( order, bigtiff ):
+
+    buffer = getTiff( order, bigtiff )
+    layout = tiff.getLayout( buffer[ 0 : 16 ] )
+    assert layout[ 'bigtiff' ] == bigtiff and layout[ 'offset' ] == len( buffer ) - ( 36 if bigtiff else 18 )
+
+    entries, next_offset = tiff.readIfd( layout, getReader( buffer ) )
+    assert next_offset == 0
+    assert tiff.getInlineValue( layout, entries[ 0 ] ) == 4
+
+
+def test_notTiff():
+
+    with pytest.raises( ValueError ):
+        tiff.getLayout( b'\x89PNG\r\n\x1a\n' + b'\x00' * 8 )
+
+
+@pytest.mark.parametrize( 'order', [ '<', '>' ] )
+@pytest.mark.parametrize( 'bigtiff', [ False, True ] )
+@pytest.mark.parametrize( 'nodata', [ 0, -9999.5 ] )
+def test_patchPreservesImage( order, bigtiff, nodata ):
+
+    buffer = getTiff( order, bigtiff )
+    patched = patch( buffer, nodata )
+
+    # header redirected - original bytes untouched, new ifd appended
+    header_size = 16 if bigtiff else 8
+    assert patched[ header_size : len( buffer ) ] == buffer[ header_size : ]
+    assert getNoData( patched ) == str( nodata )
+
+    layout = tiff.getLayout( patched[ 0 : 16 ] )
+    entries, next_offset = tiff.readIfd( layout, getReader( patched ) )
+    assert [ entry[ 0 ] for entry in entries ] == [ tiff.SAMPLES_PER_PIXEL, tiff.GDAL_NODATA ]
+
+
+def test_patchReplacesExistingNoData():
+
+    patched = patch( getTiff( nodata='255' ), 0 )
+
+    layout = tiff.getLayout( patched[ 0 : 16 ] )
+    entries, next_offset = tiff.readIfd( layout, getReader( patched ) )
+    assert [ entry[ 0 ] for entry in entries ].count( tiff.GDAL_NODATA ) == 1
+    assert getNoData( patched ) == '0'
+
+
+def test_patchBlobThroughClient( client ):
+
+    # odd length file - appended ifd padded to word boundary
+    buffer = getTiff() + b'\x00'
+    client.uploadStream( io.BytesIO( buffer ), 'ard/a.TIF' )
+
+    read = lambda offset, size : client.readRange( 'ard/a.TIF', offset, size )
+    layout = tiff.getLayout( read( 0, 16 ) )
+    entries, next_offset = tiff.readIfd( layout, read )
+    header, tail = tiff.getNoDataPatch( layout, entries, next_offset, len( buffer ), -32768 )
+
+    client.patchBlob( 'ard/a.TIF', header, tail, dst_name='cog/a.TIF', metadata={ 'source-md5' : 'abc' } )
+
+    patched = client.getBlob( 'cog/a.TIF' ).download_as_bytes()
+    assert tiff.getLayout( patched[ 0 : 16 ] )[ 'offset' ] % 2 == 0
+    assert patched[ 8 : len( buffer ) ] == buffer[ 8 : ]
+    assert getNoData( patched ) == '-32768'
+
+    # source left untouched
+    assert client.getBlob( 'ard/a.TIF' ).download_as_bytes() == buffer
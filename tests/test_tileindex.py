@@ -0,0 +1,35 @@
+import os
+import pytest
+
+gpd = pytest.importorskip( 'geopandas' )
+pytest.importorskip( 'osgeo' )
+
+from shapely.geometry import box
+from src.web import tileindex
+
+
+def test_singleFileFormatsOnly():
+
+    assert tileindex.getDriver( 'index.GPKG' )[ 0 ] == 'GPKG'
+    assert tileindex.getDriver( 'index.fgb' )[ 0 ] == 'FlatGeobuf'
+
+    with pytest.raises( ValueError ):
+        tileindex.getDriver( 'index.shp' )
+
+
+def test_indexReplacedAtomically( tmp_path, monkeypatch ):
+
+    pathname = str( tmp_path / 'index.gpkg' )
+    gdf = gpd.GeoDataFrame( { 'location' : [ 'a.TIF' ] }, geometry=[ box( 0, 0, 1, 1 ) ], crs='EPSG:4326' )
+    tileindex.writeIndex( gdf, pathname )
+
+    # failed write leaves previous index and no temporary file
+    def fail( *args, **kwargs ):
+        raise IOError( 'disk full' )
+
+    monkeypatch.setattr( gpd.GeoDataFrame, 'to_file', fail )
+    with pytest.raises( IOError ):
+        tileindex.writeIndex( gdf, pathname )
+
+    assert os.listdir( str( tmp_path ) ) == [ 'index.gpkg' ]
+    assert list( gpd.read_file( pathname )[ 'location' ] ) == [ 'a.TIF' ]
@@ -0,0 +1,125 @@
+import os
+import io
+import json
+import pytest
+
+from src.utility.gsclient import GsClient
+
+
+@pytest.fixture
+def parallel( tmp_path ):
+
+    """
+    gs client transferring every file as small parallel parts
+    """
+
+    ( tmp_path / 'storage' / 'bucket' ).mkdir( parents=True )
+    return GsClient( 'bucket', endpoint=str( tmp_path / 'storage' ), part_size=4, parallel_threshold=0, transfer_workers=4 )
+
+
+def makeFile( pathname, size ):
+
+    data = bytes( idx % 251 for idx in range( size ) )
+    with open( pathname, 'wb' ) as fp:
+        fp.write( data )
+
+    return str( pathname ), data
+
+
+def test_ranges( parallel ):
+
+    assert parallel.getRanges( 10 ) == [ ( 0, 3 ), ( 4, 7 ), ( 8, 9 ) ]
+    assert parallel.getRanges( 8 ) == [ ( 0, 3 ), ( 4, 7 ) ]
+
+
+@pytest.mark.parametrize( 'size', [ 1, 10, 200 ] )
+def test_compositeUpload( parallel, tmp_path, size ):
+
+    # 200 bytes - 50 parts composed in two levels
+    pathname, data = makeFile( tmp_path / 'a.TIF', size )
+    parallel.uploadFile( pathname, prefix='ard', flatten=True, metadata={ 'source-md5' : 'abc' } )
+
+    assert parallel.getBlob( 'ard/a.TIF' ).download_as_bytes() == data
+
+    # parts removed - checksum and metadata recorded on composite
+    assert [ blob.name for blob in parallel._bucket.list_blobs( prefix='.uploads/' ) ] == []
+
+    records = list( parallel.getBlobRecords( 'ard' ) )
+    assert [ record[ 'name' ] for record in records ] == [ 'ard/a.TIF' ]
+    assert records[ 0 ][ 'md5' ] == GsClient.getChecksums( pathname )[ 0 ]
+    assert records[ 0 ][ 'source' ] == 'abc'
+
+
+def test_uploadReusesMatchingParts( parallel, tmp_path, monkeypatch ):
+
+    pathname, data = makeFile( tmp_path / 'a.TIF', 10 )
+
+    # interrupted upload - parts left under hidden prefix
+    def interrupt( pathname ):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr( parallel, 'getChecksums', interrupt )
+    with pytest.raises( KeyboardInterrupt ):
+        parallel.uploadParallel( pathname, 'ard/a.TIF' )
+
+    monkeypatch.undo()
+    parts = sorted( blob.name for blob in parallel._bucket.list_blobs( prefix='.uploads/' ) )
+    assert len( parts ) == 3
+
+    # corrupt part re-uploaded on resume - matching parts reused
+    parallel._bucket.blob( parts[ 1 ] ).upload_from_string( b'xxxx' )
+
+    uploaded = []
+    upload = type( parallel._bucket.blob( parts[ 0 ] ) ).upload_from_string
+    monkeypatch.setattr( type( parallel._bucket.blob( parts[ 0 ] ) ), 'upload_from_string', lambda blob, data : ( uploaded.append( blob.name ), upload( blob, data ) ) )
+
+    parallel.uploadParallel( pathname, 'ard/a.TIF' )
+    assert uploaded == [ parts[ 1 ] ]
+    assert parallel.getBlob( 'ard/a.TIF' ).download_as_bytes() == data
+    assert list( parallel._bucket.list_blobs( prefix='.uploads/' ) ) == []
+
+
+def test_parallelDownload( parallel, tmp_path ):
+
+    pathname, data = makeFile( tmp_path / 'a.TIF', 30 )
+    parallel.uploadStream( io.BytesIO( data ), 'ard/a.TIF' )
+
+    out = parallel.downloadBlob( 'ard/a.TIF', str( tmp_path / 'out' ), flatten=True )
+    with open( out, 'rb' ) as fp:
+        assert fp.read() == data
+
+    assert sorted( os.listdir( tmp_path / 'out' ) ) == [ 'a.TIF' ]
+
+
+def test_parallelDownloadResumes( parallel, tmp_path ):
+
+    pathname, data = makeFile( tmp_path / 'a.TIF', 30 )
+    parallel.uploadStream( io.BytesIO( data ), 'ard/a.TIF' )
+    blob = parallel._bucket.get_blob( 'ard/a.TIF' )
+
+    # first two ranges completed by interrupted run - marker bytes kept rather than re-fetched
+    out = str( tmp_path / 'out.TIF' )
+    with open( out + '.part', 'wb' ) as fp:
+        fp.write( b'\xff' * 8 + bytes( 22 ) )
+    with open( out + '.part.json', 'w' ) as fp:
+        json.dump( { 'generation' : blob.generation, 'done' : [ 0, 1 ] }, fp )
+
+    # resumed file fails checksum - proves completed ranges were skipped
+    with pytest.raises( ValueError ):
+        parallel.downloadParallel( blob, out )
+
+    # state of other generation discarded
+    with open( out + '.part.json', 'w' ) as fp:
+        json.dump( { 'generation' : -1, 'done' : [ 0, 1 ] }, fp )
+
+    parallel.downloadParallel( blob, out )
+    with open( out, 'rb' ) as fp:
+        assert fp.read() == data
+
+    assert not os.path.exists( out + '.part.json' )
+
+
+def test_readRange( client, put ):
+
+    put( [ 'ard/0123456789' ] )
+    assert client.readRange( 'ard/0123456789', 4, 3 ) == b'012'
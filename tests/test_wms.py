@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip( 'gdal' )
+
+from src.products import wms
+
+
+def test_countsAcrossTypes():
+
+    assert wms.getCounts( np.array( [ [ 0, 1, 1 ], [ 65535, 1, 0 ] ], dtype=np.uint16 ) )[ [ 0, 1, 65535 ] ].tolist() == [ 2, 3, 1 ]
+
+    # signed and float values clipped to 16-bit range - non-finite values ignored
+    counts = wms.getCounts( np.array( [ -5, 3, 70000 ], dtype=np.int32 ) )
+    assert counts[ [ 0, 3, 65535 ] ].tolist() == [ 1, 1, 1 ]
+
+    counts = wms.getCounts( np.array( [ 1.4, 1.6, np.nan, np.inf ], dtype=np.float32 ) )
+    assert counts.sum() == 2 and counts[ [ 1, 2 ] ].tolist() == [ 1, 1 ]
+    assert len( counts ) == 65536
+
+
+def test_lookupTableMatchesBlockRescale():
+
+    data = np.random.default_rng( 0 ).integers( 0, 65536, size=( 64, 64 ), dtype=np.uint16 )
+    data[ 0, : ] = 0
+
+    offset = 1000; scale = ( 4000 - offset ) / 255.0
+    lut = wms.getLookupTable( 0, offset, scale )
+
+    assert np.array_equal( np.take( lut, data ), wms.rescaleBlock( data, 0, offset, scale ) )
+    assert np.all( np.take( lut, data )[ 0 ] == 0 )
+
+
+@pytest.mark.parametrize( 'dtype', [ np.int16, np.uint32, np.float32 ] )
+def test_blockRescaleBelowOffset( dtype ):
+
+    data = np.array( [ 0, 5, 1000, 4000, 30000 ], dtype=dtype )
+    assert wms.rescaleBlock( data, 0, 1000, ( 4000 - 1000 ) / 255.0 ).tolist() == [ 0, 0, 0, 255, 255 ]
+
+
+def test_lookupTableIgnoresUnrepresentableNoData():
+
+    lut = wms.getLookupTable( -9999.0, 0, 1.0 )
+    assert lut[ 0 ] == 0 and lut[ 255 ] == 255 and lut[ 65535 ] == 255
+
+
+def test_windowsAlignedToBlocks():
+
+    windows = wms.getWindows( 1000, 256, 1024, window_mb=1 )
+
+    assert all( row % 256 == 0 for row, rows in windows )
+    assert sum( rows for row, rows in windows ) == 1000
+    assert windows[ 0 ] == ( 0, 512 )
+
+
+def test_percentileValues():
+
+    histogram = np.zeros( 65536, dtype=np.int64 )
+    histogram[ 100 : 200 ] = 1
+
+    assert wms.getPercentileValues( histogram, [ 1.0, 50.0, 100.0 ] ) == [ 100.0, 149.0, 199.0 ]
+
+
+def test_histogramsCachedAndExact( tmp_path ):
+
+    pathname = str( tmp_path / 'image.TIF' )
+    data = np.arange( 100 * 80, dtype=np.uint16 ).reshape( 80, 100 ) % 1000
+
+    ds = gdal.GetDriverByName( 'GTiff' ).Create( pathname, 100, 80, 2, gdal.GDT_UInt16, [ 'TILED=YES', 'BLOCKXSIZE=32', 'BLOCKYSIZE=32' ] )
+    for idx in [ 1, 2 ]:
+        ds.GetRasterBand( idx ).WriteArray( data )
+    ds.GetRasterBand( 2 ).SetNoDataValue( 0 )
+    ds = None
+
+    cache_pathname = str( tmp_path / 'cache' / 'image.npz' )
+    histograms = wms.getHistograms( pathname, [ 1, 2 ], cache_pathname=cache_pathname )
+
+    assert np.array_equal( histograms[ 1 ], np.bincount( data.ravel(), minlength=65536 ) )
+    assert histograms[ 2 ][ 0 ] == 0 and histograms[ 2 ][ 1 : ].sum() == histograms[ 1 ][ 1 : ].sum()
+
+    # approx mode without overviews falls back to exact block pass
+    approx = wms.getHistograms( pathname, [ 1 ], approx=True, cache=False )
+    assert np.array_equal( approx[ 1 ], histograms[ 1 ] )
+
+    # persistent cache used once image removed
+    os.remove( pathname )
+    ds = gdal.GetDriverByName( 'GTiff' ).Create( pathname, 1, 1, 2, gdal.GDT_UInt16 ); ds = None
+    cached = wms.getHistograms( pathname, [ 1, 2 ], cache_pathname=cache_pathname )
+    assert np.array_equal( cached[ 1 ], histograms[ 1 ] )